@@ -15,9 +15,10 @@ from logging.handlers import RotatingFileHandler
 from datetime import datetime, timezone
 import tensorflow as tf
 import json
+from app.services.db_engine import RoutingSession, configure_engine, install_engine_events
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 babel = Babel()
@@ -61,7 +62,9 @@ def create_app(config_name='development'):
     configure_logging(app)
     
     # Initialize extensions with app
+    configure_engine(app)
     db.init_app(app)
+    install_engine_events(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     limiter.init_app(app)
@@ -118,10 +121,13 @@ def create_app(config_name='development'):
     login_manager.login_message = _l('Please log in to access this page.')
     login_manager.login_message_category = 'info'
     
+    from app.services.user_context import load_user_context
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return db.session.get(User, int(user_id))
+        # Loads the user with their farm summary once per request (or from the short-TTL cache)
+        context = load_user_context(int(user_id))
+        return context.user if context else None
     
     # Add security headers
     @app.after_request
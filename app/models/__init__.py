@@ -1,4 +1,6 @@
 from .user import User
 from .farm import Farm
-from .crop import Crop, Activity, DiseaseDetection
+from .crop import Crop, Activity, DiseaseDetection, IrrigationDailyRollup
 from .crop_data import CropInfo, GrowthStage, DiseaseInfo, CropHealthTip
+from .notification import NotificationOutbox, PendingNotice
+from .stats import UserStatCounter, UserDataVersion
@@ -3,13 +3,98 @@ Crop Model - Represents crops planted on farms
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
 from datetime import datetime, date
 from app import db
+import re
+
+# Quantity units are normalized so that numeric columns can be aggregated in SQL.
+# Each entry maps a raw unit to (normalized unit, multiplier).
+QUANTITY_UNITS = {
+    'mm': ('mm', 1.0),
+    'cm': ('mm', 10.0),
+    'kg/acre': ('kg/acre', 1.0),
+    'g/acre': ('kg/acre', 0.001),
+    'kg': ('kg', 1.0),
+    'g': ('kg', 0.001),
+    'quintal': ('kg', 100.0),
+    'quintals': ('kg', 100.0),
+    'qtl': ('kg', 100.0),
+    'ton': ('kg', 1000.0),
+    'tons': ('kg', 1000.0),
+    'tonne': ('kg', 1000.0),
+    'l/acre': ('l/acre', 1.0),
+    'ml/acre': ('l/acre', 0.001),
+    'l': ('l', 1.0),
+    'ml': ('l', 0.001),
+}
+
+_QUANTITY_PATTERN = re.compile(
+    r'(?P<low>\d+(?:\.\d+)?)\s*(?:-\s*(?P<high>\d+(?:\.\d+)?))?\s*(?P<unit>[a-z]+(?:\s*/\s*acre)?)?',
+    re.IGNORECASE
+)
+
+def parse_quantity(quantity):
+    """
+    Parse a free-text quantity into a normalized numeric value.
+    
+    Args:
+        quantity (str): Quantity text, e.g. "25.5mm", "2-3cm depth", "50kg/acre"
+        
+    Returns:
+        tuple: (value, unit) or (None, None) if the text cannot be parsed
+    """
+    if not quantity:
+        return None, None
+    
+    match = _QUANTITY_PATTERN.search(quantity)
+    if not match or not match.group('unit'):
+        return None, None
+    
+    unit = re.sub(r'\s+', '', match.group('unit').lower())
+    if unit not in QUANTITY_UNITS:
+        return None, None
+    
+    value = float(match.group('low'))
+    if match.group('high'):
+        value = (value + float(match.group('high'))) / 2  # Use midpoint of ranges
+    
+    normalized_unit, multiplier = QUANTITY_UNITS[unit]
+    return round(value * multiplier, 3), normalized_unit
+
+def get_crop_owners(connection, crop_ids):
+    """
+    Look up the farm and user owning each crop with one query.
+    
+    Args:
+        connection: Connection to query (the flush connection inside mapper events)
+        crop_ids (iterable): Crop IDs
+        
+    Returns:
+        dict: Crop ID -> (farm_id, user_id)
+    """
+    from sqlalchemy import select
+    from app.models.farm import Farm
+    
+    crop_ids = list(crop_ids)
+    if not crop_ids:
+        return {}
+    
+    rows = connection.execute(
+        select(Crop.id, Crop.farm_id, Farm.user_id)
+        .join(Farm, Farm.id == Crop.farm_id)
+        .where(Crop.id.in_(crop_ids))
+    )
+    return {crop_id: (farm_id, user_id) for crop_id, farm_id, user_id in rows}
+
 
 class Crop(db.Model):
     """Crop model representing crops planted on farms."""
     
     __tablename__ = 'crops'
+    __table_args__ = (
+        db.Index('ix_crops_farm_id_status', 'farm_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     farm_id = db.Column(db.Integer, db.ForeignKey('farms.id'), nullable=False)
@@ -20,6 +105,7 @@ class Crop(db.Model):
     expected_harvest_date = db.Column(db.Date)
     current_stage = db.Column(db.String(50), default='germination')
     status = db.Column(db.String(20), default='active')  # active, harvested, failed
+    last_irrigated_on = db.Column(db.Date)  # Denormalized from completed irrigation activities
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -41,21 +127,32 @@ class Crop(db.Model):
             return (self.expected_harvest_date - date.today()).days
         return None
     
-    def get_growth_stage_info(self):
-        """Get detailed information about current growth stage from database."""
-        from app.models.crop_data import CropInfo, GrowthStage
-        
-        days_planted = self.get_days_since_planting()
-        
-        crop_info = CropInfo.query.filter_by(name=self.crop_type.lower()).first()
-        if not crop_info:
-            return {'stage': 'unknown', 'description': 'अज्ञात'}
+    def get_stage_table(self):
+        """Get the precomputed growth stage table of this crop type (see app.services.stage_timeline)."""
+        from app.services.stage_timeline import get_stage_table
+        return get_stage_table(self.crop_type)
+    
+    def get_growth_stages(self):
+        """Get all growth stages of this crop type, ordered by start day."""
+        return list(self.get_stage_table().stages)
+    
+    def get_current_growth_stage(self, stage_table=None):
+        """
+        Get the growth stage covering the crop's current age.
         
-        current_stage = GrowthStage.query.filter(
-            GrowthStage.crop_info_id == crop_info.id,
-            GrowthStage.start_day <= days_planted,
-            GrowthStage.end_day >= days_planted
-        ).first()
+        Args:
+            stage_table (StageTable): Stage table of this crop type; looked up when not given
+            
+        Returns:
+            Stage: Current stage, or None if the crop type or age is not covered
+        """
+        if stage_table is None:
+            stage_table = self.get_stage_table()
+        return stage_table.current_stage(self.get_days_since_planting())
+    
+    def get_growth_stage_info(self, stage_table=None):
+        """Get detailed information about current growth stage from database."""
+        current_stage = self.get_current_growth_stage(stage_table)
         
         if current_stage:
             return {
@@ -67,32 +164,27 @@ class Crop(db.Model):
     
     def get_recent_activities(self, limit=5):
         """Get recent activities for this crop."""
-        return self.activities.order_by(Activity.scheduled_date.desc()).limit(limit).all()
+        return self.activities.order_by(Activity.scheduled_date.desc(), Activity.id.desc()).limit(limit).all()
     
-    def get_water_requirement(self):
+    def get_water_requirement(self, stage_table=None):
         """Get daily water requirement based on crop type and stage from database."""
-        from app.models.crop_data import CropInfo, GrowthStage
-        
-        days_planted = self.get_days_since_planting()
-        
-        crop_info = CropInfo.query.filter_by(name=self.crop_type.lower()).first()
-        if not crop_info:
-            return 5  # Default value
-        
-        current_stage = GrowthStage.query.filter(
-            GrowthStage.crop_info_id == crop_info.id,
-            GrowthStage.start_day <= days_planted,
-            GrowthStage.end_day >= days_planted
-        ).first()
+        current_stage = self.get_current_growth_stage(stage_table)
         
         if current_stage and current_stage.water_requirement_mm_day:
             return float(current_stage.water_requirement_mm_day)
         
         return 5  # Default value
     
-    def to_dict(self):
-        """Convert crop to dictionary for JSON responses."""
-        stage_info = self.get_growth_stage_info()
+    def to_dict(self, stage_table=None):
+        """
+        Convert crop to dictionary for JSON responses.
+        
+        Args:
+            stage_table (StageTable): Stage table of this crop type; looked up when not given
+        """
+        if stage_table is None:
+            stage_table = self.get_stage_table()
+        stage_info = self.get_growth_stage_info(stage_table)
         
         return {
             'id': self.id,
@@ -104,10 +196,11 @@ class Crop(db.Model):
             'expected_harvest_date': self.expected_harvest_date.isoformat() if self.expected_harvest_date else None,
             'current_stage': self.current_stage,
             'status': self.status,
+            'last_irrigated_on': self.last_irrigated_on.isoformat() if self.last_irrigated_on else None,
             'days_since_planting': self.get_days_since_planting(),
             'days_to_harvest': self.get_days_to_harvest(),
             'growth_stage_info': stage_info,
-            'water_requirement': self.get_water_requirement(),
+            'water_requirement': self.get_water_requirement(stage_table),
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -116,21 +209,108 @@ class Activity(db.Model):
     """Activity model for farming activities (irrigation, fertilization, etc.)."""
     
     __tablename__ = 'activities'
+    __table_args__ = (
+        db.Index('ix_activities_crop_type_status_completed', 'crop_id', 'activity_type', 'status', 'completed_date'),
+        db.Index('ix_activities_crop_id_status_scheduled_date', 'crop_id', 'status', 'scheduled_date'),
+        db.Index('ix_activities_crop_id_scheduled_date', 'crop_id', 'scheduled_date'),
+        db.Index('ix_activities_user_status_scheduled_date', 'user_id', 'status', 'scheduled_date'),
+        db.Index('ix_activities_user_scheduled_date', 'user_id', 'scheduled_date'),
+        db.UniqueConstraint('crop_id', 'template_key', name='uq_activities_crop_template'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     crop_id = db.Column(db.Integer, db.ForeignKey('crops.id'), nullable=False)
+    farm_id = db.Column(db.Integer, db.ForeignKey('farms.id'))  # Denormalized from the crop, kept in sync by events
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # Denormalized from the farm, kept in sync by events
     activity_type = db.Column(db.String(50), nullable=False)  # irrigation, fertilizer, pesticide, etc.
     description = db.Column(db.Text)
     quantity = db.Column(db.String(50))  # e.g., "5mm water", "10kg urea"
+    quantity_value = db.Column(db.Float)  # Numeric part of quantity, normalized to quantity_unit
+    quantity_unit = db.Column(db.String(20))  # mm, kg/acre, l/acre, ...
     scheduled_date = db.Column(db.Date, nullable=False)
     completed_date = db.Column(db.Date)
     status = db.Column(db.String(20), default='pending')  # pending, completed, skipped
     notes = db.Column(db.Text)
+    template_key = db.Column(db.String(64))  # Set for activities generated from a template
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Activity {self.activity_type} - {self.status}>'
     
+    @validates('quantity')
+    def _normalize_quantity(self, key, quantity):
+        """Keep the numeric quantity columns in sync with the quantity text."""
+        self.quantity_value, self.quantity_unit = parse_quantity(quantity)
+        return quantity
+    
+    @classmethod
+    def bulk_insert(cls, rows, ignore_conflicts=False):
+        """
+        Insert many activities with a single executemany statement.
+        
+        Rows bypass ORM attribute and mapper events, so derived columns
+        (quantity value/unit and the denormalized farm_id/user_id) are filled
+        here. The caller is responsible for committing.
+        
+        Args:
+            rows (list): Activity column dicts (crop_id, activity_type, scheduled_date, ...)
+            ignore_conflicts (bool): Skip rows that violate a unique constraint
+                (e.g. a template activity inserted concurrently) instead of failing
+            
+        Returns:
+            int: Number of rows inserted (rows skipped on conflict are not counted)
+        """
+        from sqlalchemy import insert
+        
+        if not rows:
+            return 0
+        
+        owners = get_crop_owners(
+            db.session.connection(),
+            {row['crop_id'] for row in rows if row.get('farm_id') is None or row.get('user_id') is None}
+        )
+        
+        prepared = []
+        for row in rows:
+            row = dict(row)
+            row['quantity_value'], row['quantity_unit'] = parse_quantity(row.get('quantity'))
+            row.setdefault('status', 'pending')
+            if row.get('farm_id') is None or row.get('user_id') is None:
+                row['farm_id'], row['user_id'] = owners.get(row['crop_id'], (None, None))
+            prepared.append(row)
+        
+        statement = insert(cls)
+        if ignore_conflicts:
+            dialect = db.session.get_bind().dialect.name
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                statement = dialect_insert(cls).on_conflict_do_nothing()
+            elif dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                statement = dialect_insert(cls).on_conflict_do_nothing()
+        
+        from collections import defaultdict
+        from app.models.stats import UserStatCounter, UserDataVersion, activity_counters
+        
+        counted = ('user_id', 'activity_type', 'status', 'scheduled_date', 'completed_date')
+        if ignore_conflicts:
+            # Only rows that were not skipped may be counted
+            result = db.session.execute(statement.returning(*(getattr(cls, name) for name in counted)), prepared)
+            inserted = [dict(zip(counted, row)) for row in result]
+        else:
+            db.session.execute(statement, prepared)
+            inserted = [{name: row.get(name) for name in counted} for row in prepared]
+        
+        # Bulk rows skip the mapper events that maintain dashboard counters and expire cached chart responses
+        deltas = defaultdict(lambda: [0, 0.0])
+        for row in inserted:
+            for metric, key, day, count, total in activity_counters(row):
+                deltas[(row['user_id'], metric, key, day)][0] += count
+        UserStatCounter.apply(db.session.connection(), deltas)
+        
+        UserDataVersion.bump(db.session.connection(), {row['user_id'] for row in inserted})
+        return len(inserted)
+    
     def is_overdue(self):
         """Check if activity is overdue."""
         if self.status == 'pending' and self.scheduled_date:
@@ -139,10 +319,23 @@ class Activity(db.Model):
     
     def mark_completed(self, notes=None):
         """Mark activity as completed."""
+        if self.status == 'completed':
+            # Already counted in the irrigation rollup; only take the new notes
+            if notes:
+                self.notes = notes
+                db.session.commit()
+            return
+        
         self.status = 'completed'
         self.completed_date = date.today()
         if notes:
             self.notes = notes
+        
+        if self.activity_type == 'irrigation':
+            IrrigationDailyRollup.record(self)
+            if self.crop and (not self.crop.last_irrigated_on or self.crop.last_irrigated_on < self.completed_date):
+                self.crop.last_irrigated_on = self.completed_date
+        
         db.session.commit()
     
     def to_dict(self):
@@ -153,6 +346,8 @@ class Activity(db.Model):
             'activity_type': self.activity_type,
             'description': self.description,
             'quantity': self.quantity,
+            'quantity_value': self.quantity_value,
+            'quantity_unit': self.quantity_unit,
             'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
             'completed_date': self.completed_date.isoformat() if self.completed_date else None,
             'status': self.status,
@@ -162,13 +357,78 @@ class Activity(db.Model):
         }
 
 
+class IrrigationDailyRollup(db.Model):
+    """Daily irrigation totals per farm, used for rolling water usage reports."""
+    
+    __tablename__ = 'irrigation_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('farm_id', 'day', name='uq_irrigation_rollup_farm_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    farm_id = db.Column(db.Integer, db.ForeignKey('farms.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    water_mm = db.Column(db.Float, nullable=False, default=0.0)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<IrrigationDailyRollup farm {self.farm_id} - {self.day}>'
+    
+    @classmethod
+    def record(cls, activity):
+        """
+        Add a completed irrigation activity to its farm's daily rollup.
+        
+        The row is upserted with events = events + 1 in the caller's transaction,
+        so concurrent completions on the same farm and day are all counted.
+        """
+        from sqlalchemy import insert
+        
+        farm_id = activity.crop.farm_id if activity.crop else None
+        if farm_id is None or activity.completed_date is None:
+            return
+        
+        water_mm = activity.quantity_value if activity.quantity_unit == 'mm' and activity.quantity_value else 0.0
+        row = {'farm_id': farm_id, 'day': activity.completed_date, 'water_mm': water_mm, 'events': 1}
+        
+        table = cls.__table__
+        connection = db.session.connection()
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['farm_id', 'day'],
+                set_={'events': table.c.events + statement.excluded.events,
+                      'water_mm': table.c.water_mm + statement.excluded.water_mm}
+            )
+            connection.execute(statement, [row])
+            return
+        
+        updated = connection.execute(
+            table.update().where((table.c.farm_id == farm_id) & (table.c.day == activity.completed_date))
+            .values(events=table.c.events + 1, water_mm=table.c.water_mm + water_mm)
+        )
+        if updated.rowcount == 0:
+            connection.execute(insert(table), [row])
+
+
 class DiseaseDetection(db.Model):
     """Disease detection model for storing AI detection results."""
     
     __tablename__ = 'disease_detections'
+    __table_args__ = (
+        db.Index('ix_disease_detections_crop_id_detected_at', 'crop_id', 'detected_at'),
+        db.Index('ix_disease_detections_user_detected_at', 'user_id', 'detected_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     crop_id = db.Column(db.Integer, db.ForeignKey('crops.id'), nullable=False)
+    farm_id = db.Column(db.Integer, db.ForeignKey('farms.id'))  # Denormalized from the crop, kept in sync by events
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # Denormalized from the farm, kept in sync by events
     image_path = db.Column(db.String(255), nullable=False)
     predicted_disease = db.Column(db.String(100))
     confidence_score = db.Column(db.Numeric(3, 2))  # 0.00 to 1.00
@@ -203,3 +463,31 @@ class DiseaseDetection(db.Model):
             'is_high_confidence': self.is_high_confidence(),
             'detected_at': self.detected_at.isoformat() if self.detected_at else None
         }
+
+
+@db.event.listens_for(Activity, 'before_insert')
+@db.event.listens_for(Activity, 'before_update')
+@db.event.listens_for(DiseaseDetection, 'before_insert')
+@db.event.listens_for(DiseaseDetection, 'before_update')
+def _sync_owner_ids(mapper, connection, target):
+    """Copy the crop's farm and user onto the row so user-scoped queries need no joins."""
+    if target.crop_id is None:
+        return
+    
+    crop_changed = db.inspect(target).attrs.crop_id.history.has_changes()
+    if target.farm_id is not None and target.user_id is not None and not crop_changed:
+        return
+    
+    target.farm_id, target.user_id = get_crop_owners(connection, [target.crop_id]).get(target.crop_id, (None, None))
+
+@db.event.listens_for(Crop, 'after_update')
+def _propagate_crop_farm(mapper, connection, crop):
+    """Move a crop's activities and detections along when the crop changes farm."""
+    if not db.inspect(crop).attrs.farm_id.history.has_changes():
+        return
+    
+    farm_id, user_id = get_crop_owners(connection, [crop.id]).get(crop.id, (None, None))
+    for table in (Activity.__table__, DiseaseDetection.__table__):
+        connection.execute(
+            table.update().where(table.c.crop_id == crop.id).values(farm_id=farm_id, user_id=user_id)
+        )
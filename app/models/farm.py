@@ -12,12 +12,15 @@ class Farm(db.Model):
     __tablename__ = 'farms'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     farm_name = db.Column(db.String(100), nullable=False)
     area_acres = db.Column(db.Numeric(5, 2), nullable=False)
     soil_type = db.Column(db.String(50))
     latitude = db.Column(db.Numeric(10, 8))
     longitude = db.Column(db.Numeric(11, 8))
+    grid_cell = db.Column(db.String(24), index=True)  # Weather grid cell key, kept in sync with location
+    # Spatial index key, kept in sync with location; byte order so prefix ranges match the index order
+    geohash = db.Column(db.String(12).with_variant(db.String(12, collation='C'), 'postgresql'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -30,17 +33,21 @@ class Farm(db.Model):
         """Get all active crops in this farm."""
         return self.crops.filter_by(status='active').all()
     
-    def get_total_crops_area(self):
-        """Calculate total area under crops."""
+    def get_crop_stats(self):
+        """Get (active crop count, total active crop area) with one aggregate query."""
         from sqlalchemy import func
         from app.models.crop import Crop
         
-        result = db.session.query(func.sum(Crop.area_acres)).filter(
+        count, area = db.session.query(func.count(Crop.id), func.sum(Crop.area_acres)).filter(
             Crop.farm_id == self.id,
             Crop.status == 'active'
-        ).scalar()
+        ).one()
         
-        return float(result) if result else 0.0
+        return count, float(area) if area else 0.0
+    
+    def get_total_crops_area(self):
+        """Calculate total area under crops."""
+        return self.get_crop_stats()[1]
     
     def get_available_area(self):
         """Get available area for new crops."""
@@ -56,8 +63,37 @@ class Farm(db.Model):
         """Check if farm location is set."""
         return self.latitude is not None and self.longitude is not None
     
-    def to_dict(self):
-        """Convert farm to dictionary for JSON responses."""
+    def update_grid_cell(self, resolution=None):
+        """Recompute the weather grid cell key from the farm location."""
+        from flask import current_app, has_app_context
+        from app.services.weather import grid_cell_key, DEFAULT_GRID_RESOLUTION
+        
+        if resolution is None:
+            resolution = DEFAULT_GRID_RESOLUTION
+            if has_app_context():
+                resolution = current_app.config.get('WEATHER_GRID_RESOLUTION', DEFAULT_GRID_RESOLUTION)
+        
+        if self.is_location_set():
+            self.grid_cell = grid_cell_key(self.latitude, self.longitude, resolution)
+        else:
+            self.grid_cell = None
+    
+    def update_geohash(self):
+        """Recompute the geohash from the farm location."""
+        from app.services.geo import geohash_encode
+        
+        self.geohash = geohash_encode(self.latitude, self.longitude) if self.is_location_set() else None
+    
+    def to_dict(self, crop_stats=None):
+        """
+        Convert farm to dictionary for JSON responses.
+        
+        Args:
+            crop_stats (tuple): Preloaded (active crop count, total crop area);
+                queried when not given (see app.services.serializers)
+        """
+        active_crops_count, total_crops_area = crop_stats if crop_stats is not None else self.get_crop_stats()
+        
         return {
             'id': self.id,
             'farm_name': self.farm_name,
@@ -65,8 +101,26 @@ class Farm(db.Model):
             'soil_type': self.soil_type,
             'latitude': float(self.latitude) if self.latitude else None,
             'longitude': float(self.longitude) if self.longitude else None,
-            'active_crops_count': len(self.get_active_crops()),
-            'total_crops_area': self.get_total_crops_area(),
-            'available_area': self.get_available_area(),
+            'active_crops_count': active_crops_count,
+            'total_crops_area': total_crops_area,
+            'available_area': float(self.area_acres) - total_crops_area,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+@db.event.listens_for(Farm, 'before_insert')
+@db.event.listens_for(Farm, 'before_update')
+def _sync_location_keys(mapper, connection, farm):
+    """Keep the grid cell and geohash in sync whenever the farm is saved."""
+    farm.update_grid_cell()
+    farm.update_geohash()
+
+@db.event.listens_for(Farm, 'after_update')
+def _propagate_farm_owner(mapper, connection, farm):
+    """Keep the denormalized user_id of the farm's activities and detections in sync."""
+    from app.models.crop import Activity, DiseaseDetection
+    
+    if not db.inspect(farm).attrs.user_id.history.has_changes():
+        return
+    
+    for table in (Activity.__table__, DiseaseDetection.__table__):
+        connection.execute(table.update().where(table.c.farm_id == farm.id).values(user_id=farm.user_id))
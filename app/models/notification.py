@@ -0,0 +1,74 @@
+"""
+Notification Models - Durable outbox for outbound SMS
+"""
+
+from datetime import datetime
+from app import db
+
+class NotificationOutbox(db.Model):
+    """Outbound notification waiting for (or recording) delivery by the worker pool."""
+    
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    recipient = db.Column(db.String(20), nullable=False)
+    provider = db.Column(db.String(20), nullable=False, default='twilio')
+    notification_type = db.Column(db.String(30))  # irrigation, weather, disease, fertilizer, digest
+    language = db.Column(db.String(10), default='hi')
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)
+    provider_message_id = db.Column(db.String(64), index=True)
+    delivery_status = db.Column(db.String(20))  # Provider callback status: queued, delivered, undelivered, ...
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<NotificationOutbox {self.notification_type} - {self.status}>'
+    
+    def to_dict(self):
+        """Convert outbox entry to dictionary for JSON responses."""
+        return {
+            'id': self.id,
+            'idempotency_key': self.idempotency_key,
+            'recipient': self.recipient,
+            'provider': self.provider,
+            'notification_type': self.notification_type,
+            'status': self.status,
+            'delivery_status': self.delivery_status,
+            'attempts': self.attempts,
+            'provider_message_id': self.provider_message_id,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class PendingNotice(db.Model):
+    """Notice buffered for a user's next digest SMS instead of being sent on its own."""
+    
+    __tablename__ = 'pending_notices'
+    __table_args__ = (
+        db.Index('ix_pending_notices_digest_window', 'digest_key', 'window_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    notice_type = db.Column(db.String(30), nullable=False)  # irrigation, fertilizer, disease, weather
+    params = db.Column(db.JSON, nullable=False)  # Template values, rendered in the user's language at flush
+    dedupe_key = db.Column(db.String(128), unique=True)
+    window_start = db.Column(db.DateTime, nullable=False)
+    digest_key = db.Column(db.String(128))  # Outbox idempotency key once flushed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PendingNotice {self.notice_type} - user {self.user_id}>'
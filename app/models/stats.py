@@ -0,0 +1,342 @@
+"""
+Stats Models - Per-user dashboard counters maintained on every write
+"""
+
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import select, func, insert
+from app import db
+from app.models.user import User
+from app.models.farm import Farm
+from app.models.crop import Crop, Activity, DiseaseDetection
+
+# Day used by counters that are not bucketed by date
+UNDATED = date(1970, 1, 1)
+
+class UserStatCounter(db.Model):
+    """
+    One dashboard counter for a user.
+    
+    Metrics and their keys:
+        farms: '' -> number of farms
+        active_crops: crop type -> active crop count (total = acres)
+        activities: status -> activity count
+        pending: activity type, by scheduled day -> pending activity count
+        completed: activity type, by completed day -> completed activity count
+        scheduled: activity type, by scheduled day -> activity count (any status)
+        detections: 'healthy' / 'diseased' -> disease detection count
+    """
+    
+    __tablename__ = 'user_stat_counters'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'metric', 'key', 'day', name='uq_user_stat_counters'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    metric = db.Column(db.String(20), nullable=False)
+    key = db.Column(db.String(50), nullable=False, default='')
+    day = db.Column(db.Date, nullable=False, default=UNDATED)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<UserStatCounter {self.user_id} {self.metric}:{self.key} {self.day} = {self.count}>'
+    
+    @classmethod
+    def apply(cls, connection, deltas):
+        """
+        Add counter deltas in the caller's transaction.
+        
+        Args:
+            connection: Connection to write with (the flush connection inside mapper events)
+            deltas (dict): (user_id, metric, key, day) -> [count, total]
+        """
+        rows = [
+            {'user_id': user_id, 'metric': metric, 'key': key, 'day': day, 'count': count, 'total': total}
+            for (user_id, metric, key, day), (count, total) in deltas.items()
+            if user_id is not None and (count or total)
+        ]
+        if not rows:
+            return
+        
+        table = cls.__table__
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'metric', 'key', 'day'],
+                set_={'count': table.c.count + statement.excluded.count, 'total': table.c.total + statement.excluded.total}
+            )
+            connection.execute(statement, rows)
+            return
+        
+        for row in rows:
+            match = (
+                (table.c.user_id == row['user_id']) & (table.c.metric == row['metric'])
+                & (table.c.key == row['key']) & (table.c.day == row['day'])
+            )
+            updated = connection.execute(
+                table.update().where(match).values(count=table.c.count + row['count'], total=table.c.total + row['total'])
+            )
+            if updated.rowcount == 0:
+                connection.execute(insert(table), [row])
+    
+    @classmethod
+    def rebuild(cls, connection, user_id):
+        """
+        Recompute all counters for a user from the source tables.
+        
+        Args:
+            connection: Connection to write with
+            user_id (int): User ID
+        """
+        deltas = defaultdict(lambda: [0, 0.0])
+        
+        def add(metric, key, day, count, total=0.0):
+            entry = deltas[(user_id, metric, key or '', day)]
+            entry[0] += count
+            entry[1] += total
+        
+        farms = connection.execute(select(func.count(Farm.id)).where(Farm.user_id == user_id)).scalar()
+        add('farms', '', UNDATED, farms or 0)
+        
+        for crop_type, count, area in connection.execute(
+            select(Crop.crop_type, func.count(Crop.id), func.sum(Crop.area_acres))
+            .join(Farm, Farm.id == Crop.farm_id)
+            .where(Farm.user_id == user_id, Crop.status == 'active')
+            .group_by(Crop.crop_type)
+        ):
+            add('active_crops', crop_type, UNDATED, count, float(area or 0))
+        
+        for activity_type, status, scheduled_date, completed_date, count in connection.execute(
+            select(Activity.activity_type, Activity.status, Activity.scheduled_date, Activity.completed_date, func.count(Activity.id))
+            .where(Activity.user_id == user_id)
+            .group_by(Activity.activity_type, Activity.status, Activity.scheduled_date, Activity.completed_date)
+        ):
+            values = {'activity_type': activity_type, 'status': status,
+                      'scheduled_date': scheduled_date, 'completed_date': completed_date}
+            for metric, key, day, _, _ in activity_counters(values):
+                add(metric, key, day, count)
+        
+        for is_healthy, count in connection.execute(
+            select(DiseaseDetection.is_healthy, func.count(DiseaseDetection.id))
+            .where(DiseaseDetection.user_id == user_id)
+            .group_by(DiseaseDetection.is_healthy)
+        ):
+            add('detections', 'healthy' if is_healthy else 'diseased', UNDATED, count)
+        
+        connection.execute(cls.__table__.delete().where(cls.__table__.c.user_id == user_id))
+        cls.apply(connection, deltas)
+
+class UserDataVersion(db.Model):
+    """
+    Version of the data a user's charts are built from.
+    
+    Advanced in the same transaction as every write to the user's farms,
+    crops, activities and detections, so cached chart responses keyed on it
+    expire in every process as soon as the write commits.
+    """
+    
+    __tablename__ = 'user_data_versions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id} = {self.version}>'
+    
+    @classmethod
+    def bump(cls, connection, user_ids):
+        """
+        Advance the version of users in the caller's transaction.
+        
+        Args:
+            connection: Connection to write with
+            user_ids (iterable): User IDs (None values are ignored)
+        """
+        rows = [{'user_id': user_id, 'version': 1} for user_id in sorted({u for u in user_ids if u is not None})]
+        if not rows:
+            return
+        
+        table = cls.__table__
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id'],
+                set_={'version': table.c.version + 1}
+            )
+            connection.execute(statement, rows)
+            return
+        
+        for row in rows:
+            updated = connection.execute(
+                table.update().where(table.c.user_id == row['user_id']).values(version=table.c.version + 1)
+            )
+            if updated.rowcount == 0:
+                connection.execute(insert(table), [row])
+    
+    @classmethod
+    def get(cls, connection, user_id):
+        """Get a user's current version (0 if their data never changed)."""
+        version = connection.execute(select(cls.version).where(cls.user_id == user_id)).scalar()
+        return version or 0
+
+def activity_counters(values):
+    """Get the (metric, key, day, count, total) counters an activity contributes one to."""
+    activity_type = values['activity_type'] or ''
+    counters = [('activities', values['status'] or '', UNDATED)]
+    if values['scheduled_date']:
+        counters.append(('scheduled', activity_type, values['scheduled_date']))
+        if values['status'] == 'pending':
+            counters.append(('pending', activity_type, values['scheduled_date']))
+    if values['status'] == 'completed' and values['completed_date']:
+        counters.append(('completed', activity_type, values['completed_date']))
+    return [(metric, key, day, 1, 0.0) for metric, key, day in counters]
+
+def _crop_counters(values):
+    if values['status'] != 'active':
+        return []
+    return [('active_crops', values['crop_type'] or '', UNDATED, 1, float(values['area_acres'] or 0))]
+
+def _detection_counters(values):
+    return [('detections', 'healthy' if values['is_healthy'] else 'diseased', UNDATED, 1, 0.0)]
+
+def _values(target, attrs, old=False):
+    """Get attribute values, or their values before this flush when old is set."""
+    state = db.inspect(target)
+    values = {}
+    for attr in attrs:
+        history = state.attrs[attr].history
+        values[attr] = history.deleted[0] if old and history.deleted else getattr(target, attr)
+    return values
+
+def _add(deltas, user_id, counters, sign):
+    for metric, key, day, count, total in counters:
+        entry = deltas[(user_id, metric, key, day)]
+        entry[0] += sign * count
+        entry[1] += sign * total
+
+def _farm_owner(connection, farm_id):
+    if farm_id is None:
+        return None
+    return connection.execute(select(Farm.user_id).where(Farm.id == farm_id)).scalar()
+
+ACTIVITY_ATTRS = ('user_id', 'activity_type', 'status', 'scheduled_date', 'completed_date')
+CROP_ATTRS = ('farm_id', 'crop_type', 'status', 'area_acres')
+DETECTION_ATTRS = ('user_id', 'is_healthy')
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    """No-op set listener; registering it with active_history loads the old value for the deltas."""
+
+for _model, _attrs in ((Activity, ACTIVITY_ATTRS), (Crop, CROP_ATTRS), (DiseaseDetection, DETECTION_ATTRS), (Farm, ('user_id',))):
+    for _attr in _attrs:
+        db.event.listen(getattr(_model, _attr), 'set', _keep_old_value, active_history=True)
+
+@db.event.listens_for(Farm, 'after_insert')
+def _farm_inserted(mapper, connection, farm):
+    UserStatCounter.apply(connection, {(farm.user_id, 'farms', '', UNDATED): [1, 0.0]})
+
+@db.event.listens_for(Farm, 'after_delete')
+def _farm_deleted(mapper, connection, farm):
+    UserStatCounter.apply(connection, {(farm.user_id, 'farms', '', UNDATED): [-1, 0.0]})
+
+@db.event.listens_for(Farm, 'after_update')
+def _farm_updated(mapper, connection, farm):
+    history = db.inspect(farm).attrs.user_id.history
+    if not history.has_changes():
+        return
+    # The farm's crops, activities and detections moved with it (see _propagate_farm_owner)
+    for user_id in {farm.user_id, *history.deleted}:
+        UserStatCounter.rebuild(connection, user_id)
+
+@db.event.listens_for(Crop, 'after_insert')
+def _crop_inserted(mapper, connection, crop):
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, _farm_owner(connection, crop.farm_id), _crop_counters(_values(crop, CROP_ATTRS)), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(Crop, 'after_delete')
+def _crop_deleted(mapper, connection, crop):
+    old = _values(crop, CROP_ATTRS, old=True)
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, _farm_owner(connection, old['farm_id']), _crop_counters(old), -1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(Crop, 'after_update')
+def _crop_updated(mapper, connection, crop):
+    old, new = _values(crop, CROP_ATTRS, old=True), _values(crop, CROP_ATTRS)
+    if old == new:
+        return
+    
+    old_owner, new_owner = _farm_owner(connection, old['farm_id']), _farm_owner(connection, new['farm_id'])
+    if old_owner != new_owner:
+        # Activities and detections changed owner too (see _propagate_crop_farm)
+        for user_id in {old_owner, new_owner} - {None}:
+            UserStatCounter.rebuild(connection, user_id)
+        return
+    
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, old_owner, _crop_counters(old), -1)
+    _add(deltas, new_owner, _crop_counters(new), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(Activity, 'after_insert')
+def _activity_inserted(mapper, connection, activity):
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, activity.user_id, activity_counters(_values(activity, ACTIVITY_ATTRS)), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(Activity, 'after_delete')
+def _activity_deleted(mapper, connection, activity):
+    old = _values(activity, ACTIVITY_ATTRS, old=True)
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, old['user_id'], activity_counters(old), -1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(Activity, 'after_update')
+def _activity_updated(mapper, connection, activity):
+    old, new = _values(activity, ACTIVITY_ATTRS, old=True), _values(activity, ACTIVITY_ATTRS)
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, old['user_id'], activity_counters(old), -1)
+    _add(deltas, new['user_id'], activity_counters(new), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(DiseaseDetection, 'after_insert')
+def _detection_inserted(mapper, connection, detection):
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, detection.user_id, _detection_counters(_values(detection, DETECTION_ATTRS)), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(DiseaseDetection, 'after_delete')
+def _detection_deleted(mapper, connection, detection):
+    old = _values(detection, DETECTION_ATTRS, old=True)
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, old['user_id'], _detection_counters(old), -1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(DiseaseDetection, 'after_update')
+def _detection_updated(mapper, connection, detection):
+    old, new = _values(detection, DETECTION_ATTRS, old=True), _values(detection, DETECTION_ATTRS)
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0.0])
+    _add(deltas, old['user_id'], _detection_counters(old), -1)
+    _add(deltas, new['user_id'], _detection_counters(new), 1)
+    UserStatCounter.apply(connection, deltas)
+
+@db.event.listens_for(User, 'before_delete')
+def _user_deleted(mapper, connection, user):
+    for table in (UserStatCounter.__table__, UserDataVersion.__table__):
+        connection.execute(table.delete().where(table.c.user_id == user.id))
@@ -48,12 +48,20 @@ class User(UserMixin, db.Model):
     
     def get_farms_count(self):
         """Get total number of farms."""
+        from app.services.user_context import current_user_context
+        context = current_user_context(self.id)
+        if context is not None:
+            return context.farms_count
         return self.farms.count()
     
     def get_active_crops_count(self):
         """Get total number of active crops across all farms."""
         from app.models.crop import Crop
         from app.models.farm import Farm
+        from app.services.user_context import current_user_context
+        context = current_user_context(self.id)
+        if context is not None:
+            return context.active_crops_count
         return Crop.query.join(Farm).filter(
             Farm.user_id == self.id,
             Crop.status == 'active'
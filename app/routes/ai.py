@@ -2,11 +2,10 @@
 AI/ML Routes - Disease Detection and Smart Recommendations
 """
 
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from flask_babel import _
 from werkzeug.utils import secure_filename
-from app.models.farm import Farm
 from app.models.crop import Crop, DiseaseDetection
 from app import db
 import os
@@ -15,6 +14,9 @@ from datetime import datetime
 from PIL import Image
 from transformers import pipeline
 from app.models.crop_data import CropInfo, DiseaseInfo, CropHealthTip
+from app.services.digests import DigestService
+from app.services.serializers import serialize_crops
+from app.services.pagination import keyset_paginate
 
 ai_bp = Blueprint('ai', __name__)
 
@@ -52,14 +54,17 @@ def initialize_disease_model():
 def disease_scanner():
     """Disease detection scanner page."""
     farms = current_user.farms.all()
-    all_crops = []
+    farm_names = {farm.id: farm.farm_name for farm in farms}
     
-    for farm in farms:
-        crops = farm.get_active_crops()
-        for crop in crops:
-            crop_data = crop.to_dict()
-            crop_data['farm_name'] = farm.farm_name
-            all_crops.append(crop_data)
+    # Serialize all active crops with one stage query instead of three queries per crop
+    crops = Crop.query.filter(
+        Crop.farm_id.in_(list(farm_names)),
+        Crop.status == 'active'
+    ).order_by(Crop.farm_id, Crop.id).all()
+    
+    all_crops = serialize_crops(crops)
+    for crop_data in all_crops:
+        crop_data['farm_name'] = farm_names[crop_data['farm_id']]
     
     return render_template('ai/disease_scanner.html', crops=all_crops, model_loaded=MODEL_LOADED)
 
@@ -67,12 +72,36 @@ def disease_scanner():
 @login_required
 def disease_history():
     """Disease detection history."""
-    detections = DiseaseDetection.query.join(Crop).join(Farm).filter(
-        Farm.user_id == current_user.id
-    ).order_by(DiseaseDetection.detected_at.desc()).all()
+    try:
+        detections = keyset_paginate(
+            DiseaseDetection.query.filter(DiseaseDetection.user_id == current_user.id),
+            [DiseaseDetection.detected_at, DiseaseDetection.id],
+            cursor=request.args.get('cursor'),
+            before=request.args.get('before'),
+            per_page=20
+        )
+    except ValueError:
+        abort(400)
     
     return render_template('ai/disease_history.html', detections=detections)
 
+@ai_bp.route('/api/disease-history')
+@login_required
+def disease_history_api():
+    """API endpoint for disease detection history, newest first, one cursor page at a time."""
+    try:
+        page = keyset_paginate(
+            DiseaseDetection.query.filter(DiseaseDetection.user_id == current_user.id),
+            [DiseaseDetection.detected_at, DiseaseDetection.id],
+            cursor=request.args.get('cursor'),
+            before=request.args.get('before'),
+            per_page=request.args.get('limit', 20, type=int)
+        )
+    except ValueError:
+        return jsonify({'error': _('Invalid cursor')}), 400
+    
+    return jsonify(page.to_dict(lambda detection: detection.to_dict()))
+
 @ai_bp.route('/detect-disease', methods=['POST'])
 @login_required
 def detect_disease():
@@ -132,6 +161,19 @@ def detect_disease():
                 db.session.add(detection)
                 db.session.commit()
                 current_app.logger.info(f"Disease detection saved for crop {crop_id}")
+                
+                if not detection.is_healthy and detection.crop:
+                    # Summarized in the farmer's next digest SMS
+                    DigestService().add(
+                        current_user.id,
+                        'disease',
+                        {
+                            'crop_name': detection.crop.crop_type,
+                            'disease_name': detection.predicted_disease,
+                            'confidence': detection_result['confidence']
+                        },
+                        dedupe_key=f"disease-detection:{detection.id}"
+                    )
             except Exception as db_error:
                 current_app.logger.error(f"Failed to save detection to database: {db_error}")
                 # Continue anyway - detection still works
@@ -5,11 +5,18 @@ Provides data endpoints for charts and graphs
 
 from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required, current_user
+from flask_babel import get_locale
 from app.models.user import User
 from app.models.farm import Farm
-from app.models.crop import Crop, Activity, DiseaseDetection
-from app import db
-from sqlalchemy import func, desc
+from app.models.crop import Crop, Activity
+from app import db, limiter
+from app.services.serializers import json_response
+from app.services.db_engine import read_replica
+from app.services.response_cache import cached_chart_response
+from app.services.dashboard_stats import get_stats_snapshot
+from app.services.stage_timeline import crop_timeline
+from app.services.yield_estimation import estimate_yields, monthly_projection
+from sqlalchemy import desc
 from datetime import datetime, timedelta, date
 import calendar
 import os
@@ -110,6 +117,33 @@ def identify_plant():
         current_app.logger.error(f"Error in plant identification endpoint: {e}")
         return jsonify({'success': False, 'error': 'An internal error occurred.'}), 500
 
+@api_bp.route('/notifications/status-callback', methods=['POST'])
+@limiter.exempt
+def notification_status_callback():
+    """Receive SMS delivery status updates from Twilio."""
+    from app.models.notification import NotificationOutbox
+    
+    auth_token = current_app.config.get('TWILIO_AUTH_TOKEN')
+    if auth_token:
+        from twilio.request_validator import RequestValidator
+        validator = RequestValidator(auth_token)
+        if not validator.validate(request.url, request.form, request.headers.get('X-Twilio-Signature', '')):
+            return jsonify({'success': False, 'error': 'Invalid signature'}), 403
+    
+    message_sid = request.form.get('MessageSid')
+    message_status = request.form.get('MessageStatus')
+    if not message_sid or not message_status:
+        return jsonify({'success': False, 'error': 'Missing MessageSid or MessageStatus'}), 400
+    
+    entry = NotificationOutbox.query.filter_by(provider_message_id=message_sid).first()
+    if entry:
+        entry.delivery_status = message_status
+        if message_status in ('failed', 'undelivered'):
+            entry.last_error = request.form.get('ErrorCode')
+        db.session.commit()
+    
+    return jsonify({'success': True})
+
 @api_bp.route('/test')
 def test_endpoint():
     """Test endpoint to verify API blueprint is working."""
@@ -119,8 +153,13 @@ def test_endpoint():
         'timestamp': datetime.now().isoformat()
     })
 
+def _crop_display_name(crop):
+    return f"{crop.crop_type.title()} ({crop.variety or 'सामान्य'})"
+
 @api_bp.route('/charts/crop-growth/<int:crop_id>')
 @login_required
+@read_replica
+@cached_chart_response
 def crop_growth_data(crop_id):
     """Get crop growth data for timeline chart."""
     crop = Crop.query.join(Farm).filter(
@@ -128,58 +167,39 @@ def crop_growth_data(crop_id):
         Farm.user_id == current_user.id
     ).first_or_404()
     
-    # Calculate growth stages based on days since planting
-    stages = []
-    if crop.planting_date:
-        growth_stages = {
-            'wheat': [
-                {'name': 'अंकुरण', 'days': 7, 'color': '#10B981'},
-                {'name': 'कल्ले निकलना', 'days': 40, 'color': '#059669'},
-                {'name': 'जोड़ बनना', 'days': 70, 'color': '#047857'},
-                {'name': 'फूल आना', 'days': 100, 'color': '#065F46'},
-                {'name': 'दाना भरना', 'days': 130, 'color': '#064E3B'},
-                {'name': 'पकना', 'days': 140, 'color': '#FCD34D'}
-            ],
-            'rice': [
-                {'name': 'अंकुरण', 'days': 10, 'color': '#10B981'},
-                {'name': 'कल्ले निकलना', 'days': 45, 'color': '#059669'},
-                {'name': 'फूल आना', 'days': 90, 'color': '#047857'},
-                {'name': 'दूध की अवस्था', 'days': 120, 'color': '#065F46'},
-                {'name': 'पकना', 'days': 150, 'color': '#FCD34D'}
-            ],
-            'sugarcane': [
-                {'name': 'अंकुरण', 'days': 30, 'color': '#10B981'},
-                {'name': 'कल्ले निकलना', 'days': 90, 'color': '#059669'},
-                {'name': 'तेज वृद्धि', 'days': 240, 'color': '#047857'},
-                {'name': 'पकना', 'days': 365, 'color': '#FCD34D'}
-            ]
-        }
-        
-        crop_stages = growth_stages.get(crop.crop_type.lower(), growth_stages['wheat'])
-        days_planted = (date.today() - crop.planting_date).days
-        
-        for i, stage in enumerate(crop_stages):
-            is_current = (i == 0 or days_planted >= crop_stages[i-1]['days']) and days_planted < stage['days']
-            is_completed = days_planted >= stage['days']
-            
-            stages.append({
-                'name': stage['name'],
-                'days': stage['days'],
-                'color': stage['color'],
-                'current': is_current,
-                'completed': is_completed,
-                'progress': min(100, (days_planted / stage['days']) * 100) if is_current else (100 if is_completed else 0)
-            })
-    
-    return jsonify({
-        'crop_name': f"{crop.crop_type.title()} ({crop.variety or 'सामान्य'})",
-        'planting_date': crop.planting_date.isoformat() if crop.planting_date else None,
-        'days_planted': (date.today() - crop.planting_date).days if crop.planting_date else 0,
-        'stages': stages
+    timeline = crop_timeline(crop, str(get_locale()))
+    return json_response({
+        'crop_name': _crop_display_name(crop),
+        'planting_date': timeline['planting_date'],
+        'days_planted': timeline['days_planted'],
+        'stages': timeline['stages']
     })
 
+@api_bp.route('/charts/crop-growth')
+@login_required
+@read_replica
+@cached_chart_response
+def crop_growth_batch_data():
+    """Get growth timelines of all of the user's active crops in one response."""
+    crops = Crop.query.join(Farm).filter(
+        Farm.user_id == current_user.id,
+        Crop.status == 'active'
+    ).order_by(Crop.planting_date, Crop.id).all()
+    
+    locale = str(get_locale())
+    today = date.today()
+    timelines = []
+    for crop in crops:
+        timeline = crop_timeline(crop, locale, today)
+        timeline['crop_name'] = _crop_display_name(crop)
+        timelines.append(timeline)
+    
+    return json_response({'crops': timelines, 'count': len(timelines)})
+
 @api_bp.route('/charts/activity-timeline/<int:crop_id>')
 @login_required
+@read_replica
+@cached_chart_response
 def activity_timeline_data(crop_id):
     """Get activity timeline data for the crop."""
     crop = Crop.query.join(Farm).filter(
@@ -222,13 +242,14 @@ def activity_timeline_data(crop_id):
             'quantity': activity.quantity
         })
     
-    return jsonify({
+    return json_response({
         'crop_name': f"{crop.crop_type.title()}",
         'datasets': list(activity_data.values())
     })
 
 @api_bp.route('/charts/weather-trends')
 @login_required
+@read_replica
 def weather_trends_data():
     """Get weather trends data (mock data for now)."""
     # Generate mock weather data for the past 7 days
@@ -257,7 +278,7 @@ def weather_trends_data():
         
         current_date += timedelta(days=1)
     
-    return jsonify({
+    return json_response({
         'labels': labels,
         'datasets': [
             {
@@ -287,6 +308,8 @@ def weather_trends_data():
 
 @api_bp.route('/charts/yield-prediction/<int:crop_id>')
 @login_required
+@read_replica
+@cached_chart_response
 def yield_prediction_data(crop_id):
     """Get yield prediction data for the crop."""
     crop = Crop.query.join(Farm).filter(
@@ -294,95 +317,64 @@ def yield_prediction_data(crop_id):
         Farm.user_id == current_user.id
     ).first_or_404()
     
-    # Mock yield prediction based on crop type and area
-    yield_per_acre = {
-        'wheat': {'min': 20, 'avg': 25, 'max': 30},
-        'rice': {'min': 30, 'avg': 35, 'max': 40},
-        'sugarcane': {'min': 400, 'avg': 500, 'max': 600},
-        'corn': {'min': 25, 'avg': 30, 'max': 35},
-        'cotton': {'min': 15, 'avg': 20, 'max': 25}
-    }
+    estimate = estimate_yields([crop])[crop.id]
     
-    crop_yield = yield_per_acre.get(crop.crop_type.lower(), yield_per_acre['wheat'])
-    area = float(crop.area_acres)
-    
-    # Calculate predictions
-    predictions = {
-        'pessimistic': crop_yield['min'] * area,
-        'realistic': crop_yield['avg'] * area,
-        'optimistic': crop_yield['max'] * area
-    }
-    
-    # Mock monthly yield development
-    if crop.planting_date:
-        days_planted = (date.today() - crop.planting_date).days
-        growth_progress = min(100, (days_planted / 140) * 100)  # Assuming 140 days cycle
-    else:
-        growth_progress = 50
-    
-    monthly_data = []
-    current_yield = 0
-    for month in range(6):  # 6 months projection
-        progress = min(100, growth_progress + (month * 16.67))  # 100/6 = 16.67
-        current_yield = (predictions['realistic'] * progress) / 100
-        monthly_data.append(round(current_yield, 1))
-    
-    return jsonify({
+    return json_response({
         'crop_name': f"{crop.crop_type.title()}",
-        'area_acres': area,
-        'unit': 'क्विंटल' if crop.crop_type.lower() != 'sugarcane' else 'टन',
-        'predictions': predictions,
+        'area_acres': float(crop.area_acres),
+        'unit': estimate['unit'],
+        'predictions': estimate['predictions'],
         'monthly_projection': {
             'labels': ['महीना 1', 'महीना 2', 'महीना 3', 'महीना 4', 'महीना 5', 'महीना 6'],
-            'data': monthly_data
+            'data': monthly_projection(estimate)
         },
-        'current_progress': round(growth_progress, 1)
+        'current_progress': estimate['progress'],
+        'source': estimate['source'],
+        'factors': estimate['factors']
+    })
+
+@api_bp.route('/charts/yield-prediction')
+@login_required
+@read_replica
+@cached_chart_response
+def yield_prediction_batch_data():
+    """Get yield estimates of all of the user's active crops in one response."""
+    crops = Crop.query.join(Farm).filter(
+        Farm.user_id == current_user.id,
+        Crop.status == 'active'
+    ).order_by(Crop.planting_date, Crop.id).all()
+    
+    estimates = estimate_yields(crops)
+    return json_response({
+        'crops': [
+            dict(estimates[crop.id], crop_id=crop.id, crop_name=_crop_display_name(crop), area_acres=float(crop.area_acres))
+            for crop in crops
+        ],
+        'count': len(crops)
     })
 
 @api_bp.route('/charts/dashboard-overview')
 @login_required
+@read_replica
+@cached_chart_response
 def dashboard_overview_data():
     """Get dashboard overview charts data."""
-    # Crop distribution by type
-    crop_distribution = db.session.query(
-        Crop.crop_type,
-        func.count(Crop.id).label('count'),
-        func.sum(Crop.area_acres).label('total_area')
-    ).join(Farm).filter(
-        Farm.user_id == current_user.id,
-        Crop.status == 'active'
-    ).group_by(Crop.crop_type).all()
+    snapshot = get_stats_snapshot(current_user.id)
     
+    # Crop distribution by type
     crop_labels = []
     crop_counts = []
     crop_areas = []
     crop_colors = ['#EF4444', '#10B981', '#3B82F6', '#F59E0B', '#8B5CF6', '#EC4899']
     
-    for i, (crop_type, count, area) in enumerate(crop_distribution):
+    for crop_type, entry in sorted(snapshot.crop_distribution.items()):
         crop_labels.append(crop_type.title())
-        crop_counts.append(count)
-        crop_areas.append(float(area or 0))
+        crop_counts.append(entry['count'])
+        crop_areas.append(entry['area'])
     
     # Monthly activity trends
-    six_months_ago = date.today() - timedelta(days=180)
-    monthly_activities = db.session.query(
-        func.strftime('%Y-%m', Activity.scheduled_date).label('month'),
-        Activity.activity_type,
-        func.count(Activity.id).label('count')
-    ).join(Crop).join(Farm).filter(
-        Farm.user_id == current_user.id,
-        Activity.scheduled_date >= six_months_ago
-    ).group_by('month', Activity.activity_type).all()
-    
-    # Process monthly data
-    months = {}
-    activity_types = set()
-    
-    for month, activity_type, count in monthly_activities:
-        if month not in months:
-            months[month] = {}
-        months[month][activity_type] = count
-        activity_types.add(activity_type)
+    months = snapshot.scheduled_by_month
+    activity_types = {activity_type for types in months.values() for activity_type in types}
     
     # Prepare monthly chart data
     sorted_months = sorted(months.keys())
@@ -410,7 +402,7 @@ def dashboard_overview_data():
             'borderColor': colors[i % len(colors)]
         })
     
-    return jsonify({
+    return json_response({
         'crop_distribution': {
             'labels': crop_labels,
             'counts': crop_counts,
@@ -422,13 +414,8 @@ def dashboard_overview_data():
             'datasets': activity_datasets
         },
         'disease_detections': {
-            'total': DiseaseDetection.query.join(Crop).join(Farm).filter(
-                Farm.user_id == current_user.id
-            ).count(),
-            'healthy': DiseaseDetection.query.join(Crop).join(Farm).filter(
-                Farm.user_id == current_user.id,
-                DiseaseDetection.is_healthy == True
-            ).count()
+            'total': snapshot.detections_total,
+            'healthy': snapshot.detections_healthy
         }
     })
 
@@ -2,17 +2,23 @@
 Crop Management Routes
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
 from app.models.farm import Farm
 from app.models.crop import Crop, Activity
 from app.services.irrigation import IrrigationService
-from app.services.notifications import NotificationService
+from app.services.digests import DigestService
 from app.services.activity_templates import ActivityTemplateService
+from app.services.bulk_activities import BulkActivityService
+from app.services.pagination import keyset_paginate
 from app import db
+from sqlalchemy import func
 from datetime import date, datetime, timedelta
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 crops_bp = Blueprint('crops', __name__)
 
@@ -117,13 +123,13 @@ def add_crop():
             
             # Auto-create activity schedule from templates
             activity_service = ActivityTemplateService()
-            created_activities = activity_service.create_activities_from_template(
+            created_count = activity_service.create_activities_from_template(
                 crop, 
                 current_user.preferred_language or 'hi'
             )
             
-            if created_activities:
-                flash(_('Crop added successfully. %(count)d activities scheduled automatically.', count=len(created_activities)), 'success')
+            if created_count:
+                flash(_('Crop added successfully. %(count)d activities scheduled automatically.', count=created_count), 'success')
             else:
                 flash(_('Crop added successfully.'), 'success')
                 
@@ -151,6 +157,10 @@ def view(crop_id):
     irrigation_service = IrrigationService()
     farm_location = crop.farm.get_location()
     irrigation_recommendation = irrigation_service.calculate_irrigation_need(crop, farm_location)
+    if irrigation_recommendation['action'] == 'irrigate':
+        irrigation_recommendation['timing'] = irrigation_service.calculate_optimal_irrigation_time(
+            crop, irrigation_recommendation['water_amount_mm'], farm_location
+        )
     
     return render_template('crops/view.html', 
                          crop=crop,
@@ -195,13 +205,45 @@ def activities(crop_id):
         Farm.user_id == current_user.id
     ).first_or_404()
     
-    # Get activities with pagination
-    page = request.args.get('page', 1, type=int)
-    activities = crop.activities.order_by(Activity.scheduled_date.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    # Keyset pagination on (scheduled_date, id): constant cost however long the history
+    try:
+        activities = keyset_paginate(
+            Activity.query.filter(Activity.crop_id == crop.id),
+            [Activity.scheduled_date, Activity.id],
+            cursor=request.args.get('cursor'),
+            before=request.args.get('before'),
+            per_page=20
+        )
+    except ValueError:
+        abort(400)
+    
+    status_counts = dict(db.session.query(Activity.status, func.count(Activity.id)).filter(
+        Activity.crop_id == crop.id
+    ).group_by(Activity.status).all())
+    
+    return render_template('crops/activities.html', crop=crop, activities=activities, status_counts=status_counts)
+
+@crops_bp.route('/api/<int:crop_id>/activities')
+@login_required
+def activities_api(crop_id):
+    """API endpoint for a crop's activities, newest first, one cursor page at a time."""
+    crop = Crop.query.join(Farm).filter(
+        Crop.id == crop_id,
+        Farm.user_id == current_user.id
+    ).first_or_404()
     
-    return render_template('crops/activities.html', crop=crop, activities=activities)
+    try:
+        page = keyset_paginate(
+            Activity.query.filter(Activity.crop_id == crop.id),
+            [Activity.scheduled_date, Activity.id],
+            cursor=request.args.get('cursor'),
+            before=request.args.get('before'),
+            per_page=request.args.get('limit', 20, type=int)
+        )
+    except ValueError:
+        return jsonify({'success': False, 'error': _('Invalid cursor')}), 400
+    
+    return jsonify(dict(page.to_dict(lambda activity: activity.to_dict()), success=True))
 
 @crops_bp.route('/<int:crop_id>/add-activity', methods=['GET', 'POST'])
 @login_required
@@ -257,6 +299,29 @@ def bulk_activities():
     farms = current_user.farms.all()
     
     if request.method == 'POST':
+        bulk_service = BulkActivityService()
+        csv_file = request.files.get('activities_csv')
+        
+        if csv_file and csv_file.filename:
+            # CSV mode: one row per crop, each with its own activity
+            try:
+                summary = bulk_service.import_csv(current_user.id, csv_file.stream)
+            except ValueError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('crops.bulk_activities'))
+            except Exception:
+                flash(_('Error adding activities.'), 'error')
+                return redirect(url_for('crops.bulk_activities'))
+            
+            for error in summary['errors'][:5]:
+                flash(error, 'warning')
+            if summary['created'] > 0:
+                logger.info(f"Bulk CSV import: {summary['created']} activities ({summary['rows_per_second']} rows/sec)")
+                flash(_('Activity added for %(count)d crops.', count=summary['created']), 'success')
+            else:
+                flash(_('No activities were added.'), 'error')
+            return redirect(url_for('crops.index'))
+        
         selected_crops = request.form.getlist('crop_ids')
         activity_type = request.form.get('activity_type', '').strip()
         description = request.form.get('description', '').strip()
@@ -273,32 +338,24 @@ def bulk_activities():
         
         try:
             scheduled_date = datetime.strptime(scheduled_date, '%Y-%m-%d').date()
+            crop_ids = [int(crop_id) for crop_id in selected_crops]
         except (ValueError, TypeError):
             flash(_('Please enter valid date.'), 'error')
             return render_template('crops/bulk_activities.html', farms=farms, date=date)
         
-        # Create activities for selected crops
-        created_count = 0
-        for crop_id in selected_crops:
-            crop = Crop.query.join(Farm).filter(
-                Crop.id == int(crop_id),
-                Farm.user_id == current_user.id
-            ).first()
-            
-            if crop:
-                activity = Activity(
-                    crop_id=crop.id,
-                    activity_type=activity_type,
-                    description=description,
-                    quantity=quantity,
-                    scheduled_date=scheduled_date
-                )
-                db.session.add(activity)
-                created_count += 1
+        # One ownership query and one insert for all selected crops
+        try:
+            summary = bulk_service.create_for_crops(
+                current_user.id, crop_ids, activity_type, scheduled_date,
+                description=description, quantity=quantity
+            )
+        except Exception:
+            flash(_('Error adding activities.'), 'error')
+            return redirect(url_for('crops.bulk_activities'))
         
-        if created_count > 0:
-            db.session.commit()
-            flash(_('Activity added for %(count)d crops.', count=created_count), 'success')
+        if summary['created'] > 0:
+            logger.info(f"Bulk activities: {summary['created']} created ({summary['rows_per_second']} rows/sec)")
+            flash(_('Activity added for %(count)d crops.', count=summary['created']), 'success')
         else:
             flash(_('No activities were added.'), 'error')
         
@@ -337,13 +394,13 @@ def generate_schedule(crop_id):
     ).first_or_404()
     
     activity_service = ActivityTemplateService()
-    created_activities = activity_service.create_activities_from_template(
+    created_count = activity_service.create_activities_from_template(
         crop,
         current_user.preferred_language or 'hi'
     )
     
-    if created_activities:
-        flash(_('%(count)d activities scheduled automatically.', count=len(created_activities)), 'success')
+    if created_count:
+        flash(_('%(count)d activities scheduled automatically.', count=created_count), 'success')
     else:
         flash(_('All activities already exist.'), 'info')
     
@@ -353,9 +410,9 @@ def generate_schedule(crop_id):
 @login_required
 def complete_activity(activity_id):
     """Mark activity as completed."""
-    activity = Activity.query.join(Crop).join(Farm).filter(
+    activity = Activity.query.filter(
         Activity.id == activity_id,
-        Farm.user_id == current_user.id
+        Activity.user_id == current_user.id
     ).first_or_404()
     
     notes = request.form.get('notes', '').strip()
@@ -380,6 +437,10 @@ def irrigation_recommendation_api(crop_id):
     irrigation_service = IrrigationService()
     farm_location = crop.farm.get_location()
     recommendation = irrigation_service.calculate_irrigation_need(crop, farm_location)
+    if recommendation['action'] == 'irrigate':
+        recommendation['timing'] = irrigation_service.calculate_optimal_irrigation_time(
+            crop, recommendation['water_amount_mm'], farm_location
+        )
     
     return jsonify(recommendation)
 
@@ -402,19 +463,18 @@ def schedule_irrigation_api(crop_id):
         irrigation_service = IrrigationService()
         activity = irrigation_service.schedule_irrigation_activity(crop, water_amount)
         
-        # Send notification
-        notification_service = NotificationService()
-        notification_service.send_irrigation_alert(
-            current_user.phone,
-            crop.crop_type,
-            f"आज {water_amount}मिमी पानी दें",
-            current_user.preferred_language
+        # Buffer the notice for the user's next digest SMS
+        DigestService().add(
+            current_user.id,
+            'irrigation',
+            {'crop_name': crop.crop_type, 'water_amount_mm': water_amount},
+            dedupe_key=f"irrigation-activity:{activity.id}"
         )
         
         return jsonify({
             'success': True,
             'activity_id': activity.id,
-            'message': 'सिंचाई निर्धारित की गई और SMS भेजा गया'
+            'message': 'सिंचाई निर्धारित की गई, सूचना अगले सारांश SMS में भेजी जाएगी'
         })
         
     except Exception as e:
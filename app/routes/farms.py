@@ -2,11 +2,12 @@
 Farm Management Routes
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
 from app.models.farm import Farm
 from app.models.crop import Crop
+from app.services.gazetteer import gazetteer
 from app import db
 from datetime import datetime
 import re
@@ -196,18 +197,32 @@ def delete(farm_id):
 @farms_bp.route('/api/location-suggestions')
 @login_required
 def location_suggestions():
-    """API endpoint for location-based suggestions."""
+    """API endpoint for location-based suggestions from the offline gazetteer."""
     query = request.args.get('q', '').strip()
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
     
-    if len(query) < 3:
+    try:
+        if latitude is not None and longitude is not None:
+            # Reverse lookup: places nearest to the device location
+            places = gazetteer.nearest(latitude, longitude, limit=5)
+        elif len(query) < 2:
+            return jsonify([])
+        else:
+            places = gazetteer.search(query, limit=10)
+    except OSError as e:
+        current_app.logger.error(f"Gazetteer unavailable: {e}")
         return jsonify([])
     
-    # In a real app, you'd integrate with a geocoding service
-    # For now, return some sample suggestions
     suggestions = [
-        {'name': f'{query} - उत्तर प्रदेश', 'lat': 26.8467, 'lon': 80.9462},
-        {'name': f'{query} - बिहार', 'lat': 25.0961, 'lon': 85.3131},
-        {'name': f'{query} - मध्य प्रदेश', 'lat': 22.9734, 'lon': 78.6569},
+        {
+            'name': f"{place['name_hi']}, {place['district_hi']} - {place['state_hi']}",
+            'name_en': f"{place['name_en']}, {place['district']} - {place['state']}",
+            'kind': place['kind'],
+            'lat': place['latitude'],
+            'lon': place['longitude']
+        }
+        for place in places
     ]
     
     return jsonify(suggestions)
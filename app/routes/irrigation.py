@@ -5,11 +5,10 @@ Smart Irrigation Routes - Enhanced irrigation management system
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
-from app.models.farm import Farm
-from app.models.crop import Crop, Activity
 from app.services.irrigation import IrrigationService
-from app.services.notifications import NotificationService
+from app.services.digests import DigestService
 from app.services.weather import WeatherService
+from app.services.dashboard_stats import get_stats_snapshot
 from app import db
 from datetime import date, datetime, timedelta
 import logging
@@ -100,6 +99,7 @@ def irrigation_schedule_api():
         # Get all user's crops and their irrigation recommendations
         for farm in current_user.farms.all():
             farm_location = farm.get_location()
+            farm_schedule = []
             for crop in farm.get_active_crops():
                 recommendation = irrigation_service.calculate_irrigation_need(crop, farm_location)
                 
@@ -111,7 +111,10 @@ def irrigation_schedule_api():
                     'area_acres': crop.area_acres
                 }
                 
-                schedule.append(recommendation)
+                farm_schedule.append(recommendation)
+            
+            # Best irrigation window per crop, from one scored forecast per farm
+            schedule.extend(irrigation_service.add_irrigation_windows(farm, farm_schedule))
         
         # Sort by priority: urgent > high > medium > low
         priority_order = {'urgent': 0, 'high': 1, 'medium': 2, 'low': 3}
@@ -129,8 +132,8 @@ def schedule_all_urgent_api():
     """API endpoint to schedule irrigation for all urgent crops."""
     try:
         irrigation_service = IrrigationService()
-        notification_service = NotificationService()
-        scheduled_count = 0
+        schedule = []
+        digest_items = []
         
         for farm in current_user.farms.all():
             farm_location = farm.get_location()
@@ -139,21 +142,27 @@ def schedule_all_urgent_api():
                 
                 if (recommendation['action'] == 'irrigate' and 
                     recommendation['priority'] in ['urgent', 'high']):
-                    
-                    # Schedule irrigation activity
-                    activity = irrigation_service.schedule_irrigation_activity(
-                        crop, recommendation['water_amount_mm']
-                    )
-                    
-                    # Send notification
-                    notification_service.send_irrigation_alert(
-                        current_user.phone,
-                        crop.crop_type,
-                        f"आज {recommendation['water_amount_mm']}मिमी पानी दें - {recommendation['priority']} प्राथमिकता",
-                        current_user.preferred_language
-                    )
-                    
-                    scheduled_count += 1
+                    schedule.append((crop, recommendation['water_amount_mm']))
+                    digest_items.append({
+                        'crop_id': crop.id,
+                        'crop_name': crop.crop_type,
+                        'water_amount_mm': recommendation['water_amount_mm'],
+                        'priority': recommendation['priority']
+                    })
+        
+        # Schedule all irrigation activities in one transaction
+        scheduled_count = irrigation_service.schedule_irrigation_activities(schedule)
+        
+        # One notice per crop, merged into one digest SMS that is sent right away
+        DigestService().add_many([
+            {
+                'user_id': current_user.id,
+                'notice_type': 'irrigation',
+                'params': item,
+                'dedupe_key': f"irrigation-urgent:{item['crop_id']}:{date.today().isoformat()}"
+            }
+            for item in digest_items
+        ], urgent=True)
         
         return jsonify({
             'success': True,
@@ -193,15 +202,14 @@ def get_irrigation_stats():
     try:
         irrigation_service = IrrigationService()
         
-        # Count all crops
-        total_crops = 0
+        snapshot = get_stats_snapshot(current_user.id)
         urgent_count = 0
         optimal_count = 0
         
+        # Urgency depends on live weather, so it is still evaluated per crop
         for farm in current_user.farms.all():
             farm_location = farm.get_location()
             active_crops = farm.get_active_crops()
-            total_crops += len(active_crops)
             
             for crop in active_crops:
                 recommendation = irrigation_service.calculate_irrigation_need(crop, farm_location)
@@ -211,19 +219,11 @@ def get_irrigation_stats():
                 elif recommendation['action'] == 'monitor':
                     optimal_count += 1
         
-        # Count scheduled irrigation activities for today
-        scheduled_today = Activity.query.join(Crop).join(Farm).filter(
-            Farm.user_id == current_user.id,
-            Activity.activity_type == 'irrigation',
-            Activity.scheduled_date == date.today(),
-            Activity.status == 'pending'
-        ).count()
-        
         stats.update({
-            'total_crops': total_crops,
+            'total_crops': snapshot.active_crops,
             'urgent_irrigation': urgent_count,
             'optimal_status': optimal_count,
-            'scheduled_today': scheduled_today
+            'scheduled_today': snapshot.pending_today_by_type.get('irrigation', 0)
         })
         
     except Exception as e:
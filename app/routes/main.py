@@ -6,14 +6,13 @@ from flask import Blueprint, render_template, request, jsonify, redirect, url_fo
 from flask_login import login_required, current_user
 from flask_babel import _
 from app.models.user import User
-from app.models.farm import Farm
-from app.models.crop import Crop, Activity, DiseaseDetection
+from app.models.crop import Activity, DiseaseDetection
 from app import db
-from sqlalchemy import func
 from app.services.weather import WeatherService
 from app.services.irrigation import IrrigationService
-from app.services.notifications import NotificationService
-from datetime import date, datetime, timedelta, timezone
+from app.services.db_engine import pool_status
+from app.services.dashboard_stats import get_stats_snapshot
+from datetime import date, datetime, timezone
 import logging
 
 main_bp = Blueprint('main', __name__)
@@ -38,15 +37,15 @@ def dashboard():
     
     # Get today's activities
     today = date.today()
-    today_activities = Activity.query.join(Crop).join(Farm).filter(
-        Farm.user_id == current_user.id,
+    today_activities = Activity.query.filter(
+        Activity.user_id == current_user.id,
         Activity.scheduled_date == today,
         Activity.status == 'pending'
     ).all()
     
     # Get overdue activities
-    overdue_activities = Activity.query.join(Crop).join(Farm).filter(
-        Farm.user_id == current_user.id,
+    overdue_activities = Activity.query.filter(
+        Activity.user_id == current_user.id,
         Activity.scheduled_date < today,
         Activity.status == 'pending'
     ).all()
@@ -70,11 +69,12 @@ def dashboard():
             irrigation_recommendations.extend(farm_recommendations)
     
     # Statistics
+    snapshot = get_stats_snapshot(current_user.id, today)
     stats = {
-        'total_farms': len(farms),
-        'active_crops': len(active_crops),
-        'pending_activities': len(today_activities),
-        'overdue_activities': len(overdue_activities),
+        'total_farms': snapshot.total_farms,
+        'active_crops': snapshot.active_crops,
+        'pending_activities': snapshot.pending_today,
+        'overdue_activities': snapshot.overdue,
         'urgent_irrigation': len([r for r in irrigation_recommendations if r['priority'] == 'urgent']),
         'weather_alerts': 0  # Placeholder for weather alerts
     }
@@ -106,45 +106,12 @@ def get_weather_api(lat, lon):
 @login_required
 def dashboard_stats_api():
     """API endpoint for dashboard statistics."""
-    farms = current_user.farms.all()
-    
-    # Crop distribution
-    crop_counts = {}
-    for farm in farms:
-        for crop in farm.get_active_crops():
-            crop_type = crop.crop_type
-            crop_counts[crop_type] = crop_counts.get(crop_type, 0) + 1
-    
-    # Activities by status
-    activity_stats = db.session.query(
-        Activity.status,
-        func.count(Activity.id)
-    ).join(Crop).join(Farm).filter(
-        Farm.user_id == current_user.id
-    ).group_by(Activity.status).all()
-    
-    activity_counts = {status: count for status, count in activity_stats}
-    
-    # Recent activity trend (last 7 days)
-    activity_trend = []
-    for i in range(7):
-        day = date.today() - timedelta(days=i)
-        day_activities = Activity.query.join(Crop).join(Farm).filter(
-            Farm.user_id == current_user.id,
-            Activity.completed_date == day
-        ).count()
-        
-        activity_trend.append({
-            'date': day.isoformat(),
-            'count': day_activities
-        })
-    
-    activity_trend.reverse()  # Show oldest to newest
+    snapshot = get_stats_snapshot(current_user.id)
     
     return jsonify({
-        'crop_distribution': crop_counts,
-        'activity_status': activity_counts,
-        'activity_trend': activity_trend
+        'crop_distribution': {crop_type: entry['count'] for crop_type, entry in snapshot.crop_distribution.items()},
+        'activity_status': snapshot.activity_status,
+        'activity_trend': snapshot.activity_trend()
     })
 
 @main_bp.route('/help')
@@ -210,6 +177,9 @@ def health_check():
             'version': '1.0.0'
         }
         
+        # Pool occupancy and checkout waits show connection starvation before requests time out
+        health_data['database_pool'] = pool_status(db.engines)
+        
         # Optional: Add more health checks
         try:
             user_count = User.query.count()
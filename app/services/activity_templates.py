@@ -2,156 +2,140 @@
 Activity Template Service - Pre-defined activity templates for different crops
 """
 
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
 from datetime import date, timedelta
-from app.models.crop import Activity
+from types import MappingProxyType
+from flask import current_app
+from sqlalchemy import select, func
+from app.models.crop import Crop, Activity
+from app.models.farm import Farm
+from app.models.user import User
 from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Activity columns written when creating activities from templates
+ACTIVITY_COLUMNS = ('crop_id', 'activity_type', 'description', 'quantity', 'scheduled_date', 'status', 'template_key')
+
+# Bundled template file; ACTIVITY_TEMPLATES_PATH overrides it
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'activity_templates.json')
+
+# Seconds between checks of the template file's modification time
+DEFAULT_RELOAD_INTERVAL = 30
+
+class TemplateSnapshot:
+    """Immutable, indexed view of the activity templates loaded from one file version."""
+    
+    def __init__(self, templates, mtime=None):
+        self.mtime = mtime
+        by_crop = {}
+        by_stage = {}
+        days = {}
+        
+        for crop_type, crop_templates in templates.items():
+            frozen = sorted(
+                (MappingProxyType(dict(template)) for template in crop_templates),
+                key=lambda template: template['days_after_planting']
+            )
+            crop_type = crop_type.lower()
+            by_crop[crop_type] = tuple(frozen)
+            days[crop_type] = tuple(template['days_after_planting'] for template in frozen)
+            for template in frozen:
+                by_stage.setdefault((crop_type, template['stage']), []).append(template)
+        
+        self.by_crop = MappingProxyType(by_crop)
+        self.by_stage = MappingProxyType({key: tuple(value) for key, value in by_stage.items()})
+        self.days = MappingProxyType(days)
+    
+    def in_day_range(self, crop_type, first_day, last_day):
+        """Get a crop's templates with first_day <= days_after_planting <= last_day."""
+        crop_days = self.days.get(crop_type, ())
+        start = bisect_left(crop_days, first_day)
+        end = bisect_right(crop_days, last_day)
+        return self.by_crop[crop_type][start:end] if end > start else ()
+
+class TemplateStore:
+    """Process-wide holder of the current template snapshot with mtime-based hot reload."""
+    
+    def __init__(self, path=TEMPLATES_PATH, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """Get the current snapshot, reloading if the file changed since the last check."""
+        now = time.monotonic()
+        if self._snapshot is None or now - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if self._snapshot is None or now - self._checked_at >= self.reload_interval:
+                    self._checked_at = now
+                    self._reload_if_changed()
+        return self._snapshot
+    
+    def reload(self):
+        """Force a reload of the template file."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._snapshot = None
+            self._reload_if_changed()
+        return self._snapshot
+    
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            if self._snapshot is not None and self._snapshot.mtime == mtime:
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = TemplateSnapshot(json.load(f), mtime)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep serving the previous version if an edit left the file unreadable
+            logger.error(f"Error loading activity templates from {self.path}: {e}")
+            if self._snapshot is None:
+                self._snapshot = TemplateSnapshot({})
+            return
+        
+        # Readers keep whichever snapshot they already hold; the swap is one assignment
+        self._snapshot = snapshot
+        logger.info(f"Loaded activity templates for {len(snapshot.by_crop)} crops from {self.path}")
+
+_template_stores = {}
+_template_stores_lock = threading.Lock()
+
+def get_template_store(path=None, reload_interval=None):
+    """Get the process-wide template store for a template file."""
+    path = path or TEMPLATES_PATH
+    store = _template_stores.get(path)
+    if store is None:
+        with _template_stores_lock:
+            store = _template_stores.setdefault(
+                path, TemplateStore(path, DEFAULT_RELOAD_INTERVAL if reload_interval is None else reload_interval)
+            )
+    return store
 
 class ActivityTemplateService:
     """Service for managing activity templates and smart scheduling."""
     
     def __init__(self):
-        self.activity_templates = self._load_activity_templates()
+        self.template_store = get_template_store(
+            current_app.config.get('ACTIVITY_TEMPLATES_PATH'),
+            current_app.config.get('ACTIVITY_TEMPLATES_RELOAD_SECONDS')
+        )
     
-    def _load_activity_templates(self):
-        """Load pre-defined activity templates for different crops."""
-        return {
-            'wheat': [
-                {
-                    'stage': 'germination',
-                    'days_after_planting': 3,
-                    'activity_type': 'irrigation',
-                    'description': 'First irrigation after germination',
-                    'description_hi': 'अंकुरण के बाद पहली सिंचाई',
-                    'quantity': '25mm',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'germination',
-                    'days_after_planting': 7,
-                    'activity_type': 'fertilizer',
-                    'description': 'Apply starter fertilizer (DAP)',
-                    'description_hi': 'शुरुआती खाद (DAP) डालें',
-                    'quantity': '50kg/acre',
-                    'priority': 'medium'
-                },
-                {
-                    'stage': 'tillering',
-                    'days_after_planting': 25,
-                    'activity_type': 'irrigation',
-                    'description': 'Tillering stage irrigation',
-                    'description_hi': 'कल्ले निकलने के समय सिंचाई',
-                    'quantity': '35mm',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'tillering',
-                    'days_after_planting': 30,
-                    'activity_type': 'fertilizer',
-                    'description': 'Apply nitrogen fertilizer (Urea)',
-                    'description_hi': 'नाइट्रोजन खाद (यूरिया) डालें',
-                    'quantity': '65kg/acre',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'jointing',
-                    'days_after_planting': 55,
-                    'activity_type': 'irrigation',
-                    'description': 'Jointing stage irrigation',
-                    'description_hi': 'गांठ बनने के समय सिंचाई',
-                    'quantity': '40mm',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'flowering',
-                    'days_after_planting': 85,
-                    'activity_type': 'irrigation',
-                    'description': 'Critical flowering stage irrigation',
-                    'description_hi': 'फूल आने के समय अति महत्वपूर्ण सिंचाई',
-                    'quantity': '45mm',
-                    'priority': 'urgent'
-                },
-                {
-                    'stage': 'grain_filling',
-                    'days_after_planting': 105,
-                    'activity_type': 'irrigation',
-                    'description': 'Grain filling irrigation',
-                    'description_hi': 'दाना भरने के समय सिंचाई',
-                    'quantity': '35mm',
-                    'priority': 'high'
-                }
-            ],
-            'rice': [
-                {
-                    'stage': 'transplanting',
-                    'days_after_planting': 1,
-                    'activity_type': 'irrigation',
-                    'description': 'Initial flooding after transplanting',
-                    'description_hi': 'रोपाई के बाद प्रारंभिक जल भराव',
-                    'quantity': '50mm',
-                    'priority': 'urgent'
-                },
-                {
-                    'stage': 'vegetative',
-                    'days_after_planting': 15,
-                    'activity_type': 'fertilizer',
-                    'description': 'Apply nitrogen fertilizer',
-                    'description_hi': 'नाइट्रोजन खाद डालें',
-                    'quantity': '40kg/acre',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'tillering',
-                    'days_after_planting': 35,
-                    'activity_type': 'irrigation',
-                    'description': 'Maintain water level during tillering',
-                    'description_hi': 'कल्ले निकलने के समय पानी का स्तर बनाए रखें',
-                    'quantity': '2-3cm depth',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'flowering',
-                    'days_after_planting': 75,
-                    'activity_type': 'irrigation',
-                    'description': 'Critical flowering irrigation',
-                    'description_hi': 'फूल आने के समय अति महत्वपूर्ण सिंचाई',
-                    'quantity': '5cm depth',
-                    'priority': 'urgent'
-                }
-            ],
-            'sugarcane': [
-                {
-                    'stage': 'germination',
-                    'days_after_planting': 10,
-                    'activity_type': 'irrigation',
-                    'description': 'Post-planting irrigation',
-                    'description_hi': 'रोपाई के बाद सिंचाई',
-                    'quantity': '60mm',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'tillering',
-                    'days_after_planting': 45,
-                    'activity_type': 'fertilizer',
-                    'description': 'Apply NPK fertilizer',
-                    'description_hi': 'NPK खाद डालें',
-                    'quantity': '120kg/acre',
-                    'priority': 'high'
-                },
-                {
-                    'stage': 'grand_growth',
-                    'days_after_planting': 120,
-                    'activity_type': 'irrigation',
-                    'description': 'Growth phase irrigation',
-                    'description_hi': 'विकास अवस्था में सिंचाई',
-                    'quantity': '80mm',
-                    'priority': 'high'
-                }
-            ]
-        }
+    @property
+    def activity_templates(self):
+        """Current templates by crop type (read-only)."""
+        return self.template_store.get().by_crop
     
     def get_crop_templates(self, crop_type):
         """Get activity templates for a specific crop type."""
-        return self.activity_templates.get(crop_type.lower(), [])
+        return list(self.template_store.get().by_crop.get(crop_type.lower(), ()))
     
     def get_crop_activity_templates(self, crop_type):
         """Get activity templates for crops - alias for get_crop_templates."""
@@ -159,8 +143,7 @@ class ActivityTemplateService:
     
     def get_activity_templates_for_stage(self, crop_type, stage):
         """Get activities for specific growth stage."""
-        templates = self.get_crop_templates(crop_type)
-        return [t for t in templates if t['stage'] == stage]
+        return list(self.template_store.get().by_stage.get((crop_type.lower(), stage), ()))
     
     def generate_activities_for_crop(self, crop):
         """Generate activity schedule for a crop based on templates."""
@@ -197,51 +180,151 @@ class ActivityTemplateService:
     
     def generate_crop_schedule(self, crop, language='hi'):
         """Generate a complete activity schedule for a crop based on templates."""
-        crop_type = crop.crop_type.lower()
-        templates = self.get_crop_templates(crop_type)
+        return self._build_schedule(crop.id, crop.crop_type, crop.planting_date, language)
+    
+    def _build_schedule(self, crop_id, crop_type, planting_date, language='hi'):
+        """Build template activity dicts for one crop from its plain column values."""
+        templates = self.get_crop_templates(crop_type.lower())
         
         activities = []
         for template in templates:
-            scheduled_date = crop.planting_date + timedelta(days=template['days_after_planting'])
+            scheduled_date = planting_date + timedelta(days=template['days_after_planting'])
             
             # Only schedule future activities or activities within 3 days past
             if scheduled_date >= date.today() - timedelta(days=3):
                 activity_data = {
-                    'crop_id': crop.id,
+                    'crop_id': crop_id,
                     'activity_type': template['activity_type'],
                     'description': template['description_hi'] if language == 'hi' else template['description'],
                     'quantity': template['quantity'],
                     'scheduled_date': scheduled_date,
                     'status': 'pending',
                     'priority': template.get('priority', 'medium'),
-                    'stage': template['stage']
+                    'stage': template['stage'],
+                    'template_key': self._template_key(template)
                 }
                 activities.append(activity_data)
         
         return activities
     
+    def _template_key(self, template):
+        """Stable key identifying the template an activity was generated from."""
+        return f"{template['stage']}:{template['activity_type']}:{template['days_after_planting']}"
+    
+    def _load_existing(self, crop_ids):
+        """
+        Load what already exists for some crops with one query.
+        
+        Returns:
+            tuple: (set of (crop_id, activity_type, scheduled_date), set of (crop_id, template_key))
+        """
+        pairs = set()
+        template_keys = set()
+        rows = db.session.execute(
+            select(Activity.crop_id, Activity.activity_type, Activity.scheduled_date, Activity.template_key)
+            .where(Activity.crop_id.in_(crop_ids))
+        )
+        for crop_id, activity_type, scheduled_date, template_key in rows:
+            pairs.add((crop_id, activity_type, scheduled_date))
+            if template_key:
+                template_keys.add((crop_id, template_key))
+        return pairs, template_keys
+    
+    def _new_activity_rows(self, schedule, existing_pairs, existing_keys):
+        """Diff a generated schedule against existing activities."""
+        rows = []
+        for activity_data in schedule:
+            crop_id = activity_data['crop_id']
+            if ((crop_id, activity_data['activity_type'], activity_data['scheduled_date']) in existing_pairs or
+                    (crop_id, activity_data['template_key']) in existing_keys):
+                continue
+            rows.append({column: activity_data[column] for column in ACTIVITY_COLUMNS})
+            existing_pairs.add((crop_id, activity_data['activity_type'], activity_data['scheduled_date']))
+        return rows
+    
     def create_activities_from_template(self, crop, language='hi'):
-        """Create actual Activity objects from templates for a crop."""
-        activities_data = self.generate_crop_schedule(crop, language)
-        created_activities = []
+        """
+        Create Activity rows from templates for a crop.
         
-        for activity_data in activities_data:
-            # Check if similar activity already exists
-            existing = Activity.query.filter_by(
-                crop_id=crop.id,
-                activity_type=activity_data['activity_type'],
-                scheduled_date=activity_data['scheduled_date']
-            ).first()
-            
-            if not existing:
-                activity = Activity(**activity_data)
-                db.session.add(activity)
-                created_activities.append(activity)
+        Existing activities are loaded with one query and diffed in memory; the
+        new rows are written with one bulk insert. The (crop_id, template_key)
+        unique constraint keeps concurrent requests from creating duplicates.
         
-        if created_activities:
+        Returns:
+            int: Number of activities created
+        """
+        schedule = self.generate_crop_schedule(crop, language)
+        if not schedule:
+            return 0
+        
+        existing_pairs, existing_keys = self._load_existing([crop.id])
+        rows = self._new_activity_rows(schedule, existing_pairs, existing_keys)
+        
+        created = 0
+        if rows:
+            created = Activity.bulk_insert(rows, ignore_conflicts=True)
             db.session.commit()
         
-        return created_activities
+        return created
+    
+    def regenerate_for_crop_type(self, crop_type, chunk_size=500, progress_callback=None):
+        """
+        Create missing template activities for every active crop of a type.
+        
+        Crops are processed in primary-key chunks: one query for the chunk's
+        crops and owner languages, one for their existing activities, one bulk
+        insert and one commit per chunk.
+        
+        Args:
+            crop_type (str): Crop type, e.g. 'wheat'
+            chunk_size (int): Crops per chunk
+            progress_callback (callable): Called with the running summary after each chunk
+            
+        Returns:
+            dict: Summary with crops_processed, activities_created and elapsed_seconds
+        """
+        started = time.perf_counter()
+        summary = {'crop_type': crop_type, 'crops_processed': 0, 'activities_created': 0}
+        last_id = 0
+        
+        while True:
+            crops = db.session.execute(
+                select(Crop.id, Crop.crop_type, Crop.planting_date, User.preferred_language)
+                .join(Farm, Farm.id == Crop.farm_id)
+                .join(User, User.id == Farm.user_id)
+                .where(
+                    func.lower(Crop.crop_type) == crop_type.lower(),
+                    Crop.status == 'active',
+                    Crop.id > last_id
+                )
+                .order_by(Crop.id)
+                .limit(chunk_size)
+            ).all()
+            if not crops:
+                break
+            
+            schedule = []
+            for crop_id, crop_crop_type, planting_date, language in crops:
+                schedule.extend(self._build_schedule(crop_id, crop_crop_type, planting_date, language or 'hi'))
+            
+            try:
+                existing_pairs, existing_keys = self._load_existing([crop.id for crop in crops])
+                rows = self._new_activity_rows(schedule, existing_pairs, existing_keys)
+                created = Activity.bulk_insert(rows, ignore_conflicts=True)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error regenerating activities for crops {crops[0].id}-{crops[-1].id}: {e}")
+                raise
+            
+            summary['crops_processed'] += len(crops)
+            summary['activities_created'] += created
+            last_id = crops[-1].id
+            if progress_callback:
+                progress_callback(summary)
+        
+        summary['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+        return summary
     
     def get_suggested_activities(self, crop):
         """Get activity suggestions based on crop stage and weather."""
@@ -249,19 +332,20 @@ class ActivityTemplateService:
         current_stage = stage_info['stage']
         days_planted = crop.get_days_since_planting()
         
-        templates = self.get_crop_templates(crop.crop_type)
-        suggestions = []
+        crop_type = crop.crop_type.lower()
+        snapshot = self.template_store.get()
         
-        for template in templates:
-            # Suggest activities for current stage or upcoming stage
-            if (template['stage'] == current_stage or 
-                abs(template['days_after_planting'] - days_planted) <= 7):
-                
-                suggestions.append({
-                    'template': template,
-                    'suggested_date': crop.planting_date + timedelta(days=template['days_after_planting']),
-                    'urgency': self._calculate_urgency(template, days_planted)
-                })
+        # Templates for the current stage or due within a week either side
+        candidates = {id(t): t for t in snapshot.by_stage.get((crop_type, current_stage), ())}
+        candidates.update((id(t), t) for t in snapshot.in_day_range(crop_type, days_planted - 7, days_planted + 7))
+        
+        suggestions = []
+        for template in sorted(candidates.values(), key=lambda t: t['days_after_planting']):
+            suggestions.append({
+                'template': dict(template),
+                'suggested_date': crop.planting_date + timedelta(days=template['days_after_planting']),
+                'urgency': self._calculate_urgency(template, days_planted)
+            })
         
         # Sort by urgency
         suggestions.sort(key=lambda x: x['urgency'], reverse=True)
@@ -0,0 +1,202 @@
+"""
+Advisory Batch Service - Region-wide irrigation advisories for extension offices
+"""
+
+import csv
+import time
+from sqlalchemy import select
+from app.models.user import User
+from app.models.farm import Farm
+from app.models.crop import Crop
+from app.services.irrigation import IrrigationService
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_FIELDS = [
+    'crop_id', 'farm_id', 'farm_name', 'farmer_name', 'phone', 'village', 'state',
+    'latitude', 'longitude', 'grid_cell', 'crop_type', 'variety', 'area_acres',
+    'action', 'priority', 'water_amount_mm', 'days_since_irrigation',
+    'growth_stage', 'message_hi', 'message_en'
+]
+
+
+class CsvAdvisoryWriter:
+    """Write advisory rows to a CSV file as they are produced."""
+    
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=ADVISORY_FIELDS)
+        self._writer.writeheader()
+    
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+
+class ParquetAdvisoryWriter:
+    """Write advisory rows to a Parquet file, one row group per chunk."""
+    
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        
+        self._pa = pa
+        self._schema = pa.schema([
+            ('crop_id', pa.int64()), ('farm_id', pa.int64()), ('farm_name', pa.string()),
+            ('farmer_name', pa.string()), ('phone', pa.string()), ('village', pa.string()),
+            ('state', pa.string()), ('latitude', pa.float64()), ('longitude', pa.float64()),
+            ('grid_cell', pa.string()), ('crop_type', pa.string()), ('variety', pa.string()),
+            ('area_acres', pa.float64()), ('action', pa.string()), ('priority', pa.string()),
+            ('water_amount_mm', pa.float64()), ('days_since_irrigation', pa.int64()),
+            ('growth_stage', pa.string()), ('message_hi', pa.string()), ('message_en', pa.string())
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+    
+    def write_rows(self, rows):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+    
+    def close(self):
+        self._writer.close()
+
+
+ADVISORY_WRITERS = {
+    'csv': CsvAdvisoryWriter,
+    'parquet': ParquetAdvisoryWriter
+}
+
+
+class AdvisoryBatchService:
+    """Compute irrigation advisories for every active crop in a region."""
+    
+    def __init__(self, chunk_size=500):
+        self.chunk_size = chunk_size
+        self.irrigation_service = IrrigationService()
+        self.weather_service = self.irrigation_service.weather_service
+    
+    def build_query(self, state=None, bbox=None):
+        """
+        Build the streaming query for active crops with their farm and owner.
+        
+        Args:
+            state (str): Only include farmers from this state
+            bbox (tuple): (min_lat, min_lon, max_lat, max_lon) farm bounding box
+        """
+        query = select(Crop, Farm, User).join(
+            Farm, Crop.farm_id == Farm.id
+        ).join(
+            User, Farm.user_id == User.id
+        ).where(
+            Crop.status == 'active',
+            User.is_active == True
+        )
+        
+        if state:
+            query = query.where(User.state == state)
+        
+        if bbox:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            query = query.where(
+                Farm.latitude.between(min_lat, max_lat),
+                Farm.longitude.between(min_lon, max_lon)
+            )
+        
+        # Ordering by location keeps crops of a grid cell together
+        return query.order_by(Farm.latitude, Farm.longitude, Crop.id)
+    
+    def run(self, writer, state=None, bbox=None, only_irrigate=False, progress_every=5000):
+        """
+        Stream active crops in chunks and write advisories incrementally.
+        
+        Args:
+            writer: CsvAdvisoryWriter or ParquetAdvisoryWriter
+            state (str): Optional state filter
+            bbox (tuple): Optional bounding box filter
+            only_irrigate (bool): Only write crops whose recommendation is to irrigate
+            progress_every (int): Log progress after this many crops
+            
+        Returns:
+            dict: Run summary with crops processed, rows written and throughput
+        """
+        started = time.perf_counter()
+        processed = 0
+        written = 0
+        next_progress = progress_every
+        
+        query = self.build_query(state, bbox).execution_options(
+            stream_results=True, yield_per=self.chunk_size
+        )
+        result = db.session.execute(query)
+        
+        for partition in result.partitions(self.chunk_size):
+            rows = []
+            for crop, farm, user in partition:
+                row = self._build_row(crop, farm, user)
+                processed += 1
+                if only_irrigate and row['action'] != 'irrigate':
+                    continue
+                rows.append(row)
+            
+            writer.write_rows(rows)
+            written += len(rows)
+            
+            # Keep memory flat: objects from finished chunks are no longer needed
+            db.session.expunge_all()
+            
+            if processed >= next_progress:
+                elapsed = time.perf_counter() - started
+                logger.info(f"Advisory batch: {processed} crops, {processed / max(elapsed, 1e-9):.0f} rows/sec")
+                next_progress += progress_every
+        
+        elapsed = time.perf_counter() - started
+        return {
+            'crops_processed': processed,
+            'rows_written': written,
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(processed / max(elapsed, 1e-9), 1)
+        }
+    
+    def _build_row(self, crop, farm, user):
+        """Compute the advisory for one crop using its grid cell's weather."""
+        location = farm.get_location()
+        cell = None
+        weather_analysis = None
+        
+        if location:
+            cell = self.weather_service.get_grid_cell(*location)
+            weather_analysis = self.weather_service.analyze_irrigation_conditions(*location)
+        
+        recommendation = self.irrigation_service.calculate_irrigation_need(
+            crop, location, weather_analysis=weather_analysis
+        )
+        
+        return {
+            'crop_id': crop.id,
+            'farm_id': farm.id,
+            'farm_name': farm.farm_name,
+            'farmer_name': user.name,
+            'phone': user.phone,
+            'village': user.village,
+            'state': user.state,
+            'latitude': location[0] if location else None,
+            'longitude': location[1] if location else None,
+            'grid_cell': f"{cell[0]},{cell[1]}" if cell else None,
+            'crop_type': crop.crop_type,
+            'variety': crop.variety,
+            'area_acres': float(crop.area_acres),
+            'action': recommendation['action'],
+            'priority': recommendation['priority'],
+            'water_amount_mm': float(recommendation['water_amount_mm']),
+            'days_since_irrigation': recommendation['days_since_irrigation'],
+            'growth_stage': recommendation['growth_stage'],
+            'message_hi': recommendation['message_hi'],
+            'message_en': recommendation['message_en']
+        }
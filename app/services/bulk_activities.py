@@ -0,0 +1,184 @@
+"""
+Bulk Activity Service - Create one activity across many crops with set-based queries
+"""
+
+import csv
+import io
+import time
+from datetime import datetime
+from flask_babel import gettext as _
+from sqlalchemy import select
+from app.models.crop import Crop, Activity
+from app.models.farm import Farm
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# IDs per ownership IN (...) query, below every database's bind parameter limit
+ID_CHUNK_SIZE = 500
+
+# Rows per insert statement
+INSERT_CHUNK_SIZE = 1000
+
+CSV_COLUMNS = ('crop_id', 'activity_type', 'scheduled_date', 'description', 'quantity')
+
+class BulkActivityService:
+    """Service for creating activities for many crops at once."""
+    
+    def __init__(self, activity_types=None):
+        if activity_types is None:
+            from app.services.activity_templates import ActivityTemplateService
+            activity_types = [t['value'] for t in ActivityTemplateService().get_activity_types()]
+        self.activity_types = set(activity_types)
+    
+    def get_owned_crop_ids(self, user_id, crop_ids):
+        """
+        Filter crop IDs down to the user's crops.
+        
+        Args:
+            user_id (int): Owner user ID
+            crop_ids (iterable): Candidate crop IDs
+        
+        Returns:
+            set: IDs of crops that belong to the user
+        """
+        crop_ids = list(set(crop_ids))
+        owned = set()
+        for start in range(0, len(crop_ids), ID_CHUNK_SIZE):
+            owned.update(db.session.scalars(
+                select(Crop.id).join(Farm, Farm.id == Crop.farm_id).where(
+                    Crop.id.in_(crop_ids[start:start + ID_CHUNK_SIZE]),
+                    Farm.user_id == user_id
+                )
+            ))
+        return owned
+    
+    def create_for_crops(self, user_id, crop_ids, activity_type, scheduled_date, description='', quantity=''):
+        """
+        Create the same activity for many crops.
+        
+        Args:
+            user_id (int): Owner user ID; crops of other users are skipped
+            crop_ids (list): Selected crop IDs
+            activity_type (str): Activity type
+            scheduled_date (date): Scheduled date
+            description (str): Activity description
+            quantity (str): Quantity text
+        
+        Returns:
+            dict: Summary with created, skipped, elapsed_seconds and rows_per_second
+        """
+        started = time.perf_counter()
+        crop_ids = [int(crop_id) for crop_id in crop_ids]
+        owned = self.get_owned_crop_ids(user_id, crop_ids)
+        
+        rows = [
+            {
+                'crop_id': crop_id,
+                'activity_type': activity_type,
+                'description': description,
+                'quantity': quantity,
+                'scheduled_date': scheduled_date
+            }
+            for crop_id in dict.fromkeys(crop_ids) if crop_id in owned
+        ]
+        
+        created = self._insert(rows)
+        return self._summary(started, created, skipped=len(crop_ids) - created)
+    
+    def import_csv(self, user_id, stream):
+        """
+        Create activities from an uploaded CSV.
+        
+        Columns: crop_id, activity_type, scheduled_date (YYYY-MM-DD) and
+        optional description and quantity. Invalid rows and crops the user
+        does not own are reported and skipped; valid rows are inserted.
+        
+        Args:
+            user_id (int): Owner user ID
+            stream: Binary or text file object
+        
+        Returns:
+            dict: Summary with created, skipped, errors, elapsed_seconds and rows_per_second
+        """
+        started = time.perf_counter()
+        if isinstance(stream.read(0), bytes):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        
+        reader = csv.DictReader(stream)
+        missing = [column for column in CSV_COLUMNS[:3] if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(_('CSV is missing columns: %(columns)s', columns=', '.join(missing)))
+        
+        rows = []
+        errors = []
+        for line_number, record in enumerate(reader, start=2):
+            try:
+                rows.append(self._parse_csv_row(record, line_number))
+            except ValueError as e:
+                errors.append(str(e))
+        
+        owned = self.get_owned_crop_ids(user_id, [row['crop_id'] for row in rows])
+        valid_rows = []
+        for row in rows:
+            line_number = row.pop('line_number')
+            if row['crop_id'] in owned:
+                valid_rows.append(row)
+            else:
+                errors.append(_('Line %(line)d: crop %(crop_id)d not found', line=line_number, crop_id=row['crop_id']))
+        
+        created = self._insert(valid_rows)
+        summary = self._summary(started, created, skipped=len(errors))
+        summary['errors'] = errors
+        return summary
+    
+    def _parse_csv_row(self, record, line_number):
+        """Validate one CSV record into an activity row."""
+        try:
+            crop_id = int((record.get('crop_id') or '').strip())
+        except ValueError:
+            raise ValueError(_('Line %(line)d: invalid crop_id', line=line_number))
+        
+        activity_type = (record.get('activity_type') or '').strip().lower()
+        if activity_type not in self.activity_types:
+            raise ValueError(_("Line %(line)d: invalid activity_type '%(activity_type)s'",
+                               line=line_number, activity_type=activity_type))
+        
+        try:
+            scheduled_date = datetime.strptime((record.get('scheduled_date') or '').strip(), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(_('Line %(line)d: invalid scheduled_date', line=line_number))
+        
+        return {
+            'crop_id': crop_id,
+            'activity_type': activity_type,
+            'description': (record.get('description') or '').strip(),
+            'quantity': (record.get('quantity') or '').strip(),
+            'scheduled_date': scheduled_date,
+            'line_number': line_number
+        }
+    
+    def _insert(self, rows):
+        """Insert rows in chunks within one transaction."""
+        if not rows:
+            return 0
+        created = 0
+        try:
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                created += Activity.bulk_insert(rows[start:start + INSERT_CHUNK_SIZE])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error inserting {len(rows)} bulk activities: {e}")
+            raise
+        return created
+    
+    def _summary(self, started, created, skipped):
+        elapsed = time.perf_counter() - started
+        return {
+            'created': created,
+            'skipped': skipped,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(created / elapsed, 1) if elapsed > 0 else float(created)
+        }
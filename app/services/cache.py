@@ -0,0 +1,74 @@
+"""
+Cache Service - Small in-process caches shared by services
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry."""
+    
+    def __init__(self, ttl_seconds=300, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Get a cached value, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            
+            return value
+    
+    def set(self, key, value, ttl_seconds=None):
+        """Store a value for ttl_seconds (defaults to the cache TTL)."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._evict_expired()
+                if len(self._entries) >= self.max_entries:
+                    # Drop the entry closest to expiry to make room
+                    oldest_key = min(self._entries, key=lambda k: self._entries[k][0])
+                    del self._entries[oldest_key]
+            
+            self._entries[key] = (time.monotonic() + ttl, value)
+    
+    def get_or_set(self, key, factory, ttl_seconds=None):
+        """Get a cached value, computing and storing it with factory() if missing."""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set(key, value, ttl_seconds)
+        return value
+    
+    def delete(self, key):
+        """Remove a key from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+    
+    def _evict_expired(self):
+        """Drop expired entries. Caller must hold the lock."""
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._entries.items() if expires_at < now]
+        for key in expired:
+            del self._entries[key]
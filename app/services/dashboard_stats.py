@@ -0,0 +1,117 @@
+"""
+Dashboard Stats Service - Per-user stats snapshot read from the counter table
+
+Counters in user_stat_counters are updated in the same transaction as every
+farm, crop, activity and detection write (see app.models.stats), so a
+snapshot is one indexed read of a user's counter rows regardless of how
+much history they have.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from sqlalchemy import or_
+from app import db
+from app.models.stats import UserStatCounter, UNDATED
+import logging
+
+logger = logging.getLogger(__name__)
+
+TREND_DAYS = 7
+MONTHLY_WINDOW_DAYS = 180
+
+class StatsSnapshot:
+    """Dashboard counters for one user on one day."""
+    
+    def __init__(self, today):
+        self.today = today
+        self.total_farms = 0
+        self.active_crops = 0
+        self.crop_distribution = {}  # crop type -> {'count', 'area'}
+        self.activity_status = {}  # status -> count
+        self.pending_today = 0
+        self.overdue = 0
+        self.pending_today_by_type = {}  # activity type -> count
+        self.completed_by_day = {}  # date -> count, last TREND_DAYS days
+        self.scheduled_by_month = {}  # 'YYYY-MM' -> {activity type: count}, last MONTHLY_WINDOW_DAYS days
+        self.detections_total = 0
+        self.detections_healthy = 0
+    
+    def activity_trend(self):
+        """Get completed activity counts for the last TREND_DAYS days, oldest first."""
+        days = [self.today - timedelta(days=offset) for offset in range(TREND_DAYS - 1, -1, -1)]
+        return [{'date': day.isoformat(), 'count': self.completed_by_day.get(day, 0)} for day in days]
+
+def get_stats_snapshot(user_id, today=None):
+    """
+    Get a user's dashboard stats with one read of their counter rows.
+    
+    Args:
+        user_id (int): User ID
+        today (date): Day the date-relative counters are computed for
+    
+    Returns:
+        StatsSnapshot: Snapshot of the user's counters
+    """
+    today = today or date.today()
+    month_window_start = today - timedelta(days=MONTHLY_WINDOW_DAYS)
+    trend_start = today - timedelta(days=TREND_DAYS - 1)
+    rows = db.session.query(
+        UserStatCounter.metric, UserStatCounter.key, UserStatCounter.day,
+        UserStatCounter.count, UserStatCounter.total
+    ).filter(
+        UserStatCounter.user_id == user_id,
+        UserStatCounter.count != 0,
+        or_(
+            UserStatCounter.day == UNDATED,
+            UserStatCounter.metric == 'pending',
+            UserStatCounter.day >= min(month_window_start, trend_start)
+        )
+    ).all()
+    
+    snapshot = StatsSnapshot(today)
+    scheduled_by_month = defaultdict(lambda: defaultdict(int))
+    for metric, key, day, count, total in rows:
+        if metric == 'farms':
+            snapshot.total_farms += count
+        elif metric == 'active_crops':
+            snapshot.active_crops += count
+            snapshot.crop_distribution[key] = {'count': count, 'area': round(total, 2)}
+        elif metric == 'activities':
+            snapshot.activity_status[key] = count
+        elif metric == 'pending':
+            if day == today:
+                snapshot.pending_today += count
+                snapshot.pending_today_by_type[key] = snapshot.pending_today_by_type.get(key, 0) + count
+            elif day < today:
+                snapshot.overdue += count
+        elif metric == 'completed':
+            if trend_start <= day <= today:
+                snapshot.completed_by_day[day] = snapshot.completed_by_day.get(day, 0) + count
+        elif metric == 'scheduled':
+            if day >= month_window_start:
+                scheduled_by_month[day.strftime('%Y-%m')][key] += count
+        elif metric == 'detections':
+            snapshot.detections_total += count
+            if key == 'healthy':
+                snapshot.detections_healthy += count
+    
+    snapshot.scheduled_by_month = {month: dict(types) for month, types in scheduled_by_month.items()}
+    return snapshot
+
+def rebuild_user_stats(user_ids):
+    """
+    Recompute the counters of users from the source tables and commit.
+    
+    Args:
+        user_ids (iterable): User IDs
+    
+    Returns:
+        int: Number of users rebuilt
+    """
+    connection = db.session.connection()
+    rebuilt = 0
+    for user_id in user_ids:
+        UserStatCounter.rebuild(connection, user_id)
+        rebuilt += 1
+    db.session.commit()
+    return rebuilt
@@ -0,0 +1,230 @@
+"""
+Database Engine Service - Engine profiles, read-replica routing and pool metrics
+
+Engine options are derived from the database URL before db.init_app:
+SQLite gets WAL mode and a busy timeout on every connection so concurrent
+gunicorn workers wait for the write lock instead of failing with
+"database is locked"; PostgreSQL gets a sized, pre-pinged pool and a
+server-side statement timeout. An optional read replica is registered as
+the 'replica' bind and used by views wrapped in read_replica.
+"""
+
+import os
+import threading
+import time
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_KEY = 'replica'
+
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+DEFAULT_STATEMENT_TIMEOUT_MS = 30000
+
+class PoolMetrics:
+    """Thread-safe counters for connection pool checkouts."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+    
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+    
+    def snapshot(self):
+        """Get the counters as a dict with wait times in milliseconds."""
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3)
+            }
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_profile(uri, config):
+    """
+    Build SQLAlchemy engine options for a database URL.
+    
+    Args:
+        uri (str): Database URL
+        config (dict): Application config with optional DATABASE_* overrides
+    
+    Returns:
+        dict: Engine options for create_engine
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    
+    if backend == 'sqlite':
+        if _is_memory_sqlite(url):
+            # In-memory databases keep SQLAlchemy's single-connection pool
+            return {}
+        return {
+            'poolclass': TimedQueuePool,
+            'pool_size': config.get('DATABASE_POOL_SIZE', 5),
+            'max_overflow': config.get('DATABASE_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+            'connect_args': {
+                'timeout': config.get('DATABASE_BUSY_TIMEOUT_MS', DEFAULT_SQLITE_BUSY_TIMEOUT_MS) / 1000,
+                'check_same_thread': False
+            }
+        }
+    
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DATABASE_POOL_SIZE', DEFAULT_POOL_SIZE),
+        'max_overflow': config.get('DATABASE_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW),
+        'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'pool_recycle': config.get('DATABASE_POOL_RECYCLE', DEFAULT_POOL_RECYCLE),
+        'pool_pre_ping': True
+    }
+    if backend == 'postgresql':
+        statement_timeout = config.get('DATABASE_STATEMENT_TIMEOUT_MS', DEFAULT_STATEMENT_TIMEOUT_MS)
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+def configure_engine(app):
+    """
+    Apply the engine profile and replica bind to the app config.
+    
+    Must run before db.init_app. Options set explicitly in
+    SQLALCHEMY_ENGINE_OPTIONS take precedence over the profile.
+    
+    Args:
+        app: Flask application
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return
+    
+    options = engine_profile(uri, app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    
+    replica_uri = app.config.get('SQLALCHEMY_REPLICA_URI') or os.environ.get('DATABASE_REPLICA_URL')
+    if replica_uri:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND_KEY, dict(engine_profile(replica_uri, app.config), url=replica_uri))
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+def _set_sqlite_pragmas(busy_timeout_ms, wal):
+    """Create a connect listener applying the SQLite pragmas."""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+            if wal:
+                cursor.execute('PRAGMA journal_mode = WAL')
+                # WAL makes NORMAL durable against application crashes
+                cursor.execute('PRAGMA synchronous = NORMAL')
+            cursor.execute('PRAGMA temp_store = MEMORY')
+        finally:
+            cursor.close()
+    return on_connect
+
+def install_engine_events(app, db):
+    """
+    Attach per-connection setup to the app's engines.
+    
+    Must run after db.init_app.
+    
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension
+    """
+    busy_timeout = app.config.get('DATABASE_BUSY_TIMEOUT_MS', DEFAULT_SQLITE_BUSY_TIMEOUT_MS)
+    
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            wal = not _is_memory_sqlite(engine.url)
+            event.listen(engine, 'connect', _set_sqlite_pragmas(busy_timeout, wal))
+            logger.info(f"SQLite engine {bind_key or 'primary'} configured (WAL={wal}, busy_timeout={busy_timeout}ms)")
+
+def pool_status(engines):
+    """
+    Get pool occupancy and checkout-wait metrics for each engine.
+    
+    Args:
+        engines (dict): Bind key to engine, e.g. db.engines
+    
+    Returns:
+        dict: Metrics keyed by bind name ('primary' for the default bind)
+    """
+    status = {}
+    for bind_key, engine in engines.items():
+        pool = engine.pool
+        entry = {'pool': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'idle': pool.checkedin()
+            })
+        if isinstance(pool, TimedQueuePool):
+            entry.update(pool.metrics.snapshot())
+        status[bind_key or 'primary'] = entry
+    return status
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica inside read_replica views."""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_read_replica'):
+            replica = self._db.engines.get(REPLICA_BIND_KEY)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(view):
+    """Route a read-only view's queries to the replica when one is configured."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        g.db_read_replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_replica = False
+    return wrapped
@@ -0,0 +1,235 @@
+"""
+Digest Service - Buffers per-event notices and merges them into one SMS per user per window
+"""
+
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, insert
+from app import db
+from app.models.user import User
+from app.models.notification import PendingNotice
+from app.services.message_templates import message_templates, count_sms_segments
+from app.services.notification_queue import notification_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Order of notices inside a digest (most time-critical first)
+NOTICE_PRIORITY = {
+    'weather': 0,
+    'disease': 1,
+    'irrigation': 2,
+    'fertilizer': 3
+}
+
+# Users flushed per database round-trip
+FLUSH_CHUNK_SIZE = 500
+
+# Default digest window; notices added with urgent=True never wait for it
+DEFAULT_WINDOW_MINUTES = 180
+
+class DigestService:
+    """Service for buffering notices and flushing them as digest SMS."""
+    
+    def __init__(self):
+        # 0 disables buffering: each notice is flushed as soon as it is added
+        self.window_minutes = current_app.config.get('NOTIFICATION_DIGEST_WINDOW_MINUTES', DEFAULT_WINDOW_MINUTES)
+        self.max_segments = current_app.config.get('SMS_MAX_SEGMENTS', 4)
+    
+    def get_window_start(self, moment=None):
+        """
+        Get the start of the digest window containing a moment.
+        
+        Windows are aligned to local midnight, so a 1440 minute window is one
+        calendar day and a 360 minute window starts at 00:00, 06:00, 12:00 and 18:00.
+        """
+        moment = moment or datetime.now()
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if not self.window_minutes:
+            return moment
+        
+        minutes = int((moment - midnight).total_seconds() // 60)
+        return midnight + timedelta(minutes=(minutes // self.window_minutes) * self.window_minutes)
+    
+    def add(self, user_id, notice_type, params, dedupe_key=None, commit=True, urgent=False):
+        """
+        Buffer one notice for the user's next digest.
+        
+        Args:
+            user_id (int): Recipient user ID
+            notice_type (str): irrigation, fertilizer, disease or weather
+            params (dict): Values for the digest_<notice_type>_line template
+            dedupe_key (str): Optional key; a notice with the same key is only buffered once
+            commit (bool): Commit the session after inserting
+            urgent (bool): Send the user's digest now instead of when the window closes
+        
+        Returns:
+            int: Number of notices buffered (0 or 1)
+        """
+        return self.add_many([{
+            'user_id': user_id,
+            'notice_type': notice_type,
+            'params': params,
+            'dedupe_key': dedupe_key
+        }], commit=commit, urgent=urgent)
+    
+    def add_many(self, notices, commit=True, urgent=False):
+        """
+        Buffer many notices with one insert.
+        
+        Args:
+            notices (list): Dicts with user_id, notice_type, params and optional dedupe_key
+            commit (bool): Commit the session after inserting
+            urgent (bool): Send the users' digests now instead of when the window closes,
+                for notices that must reach them the same day (only with commit=True)
+        
+        Returns:
+            int: Number of notices buffered
+        """
+        window_start = self.get_window_start()
+        rows = []
+        seen = set()
+        
+        for notice in notices:
+            if notice['notice_type'] not in NOTICE_PRIORITY:
+                raise ValueError(f"Unknown notice type: {notice['notice_type']}")
+            key = notice.get('dedupe_key')
+            if key and key in seen:
+                continue
+            seen.add(key)
+            rows.append({
+                'user_id': notice['user_id'],
+                'notice_type': notice['notice_type'],
+                'params': notice['params'],
+                'dedupe_key': key,
+                'window_start': window_start
+            })
+        
+        keys = [row['dedupe_key'] for row in rows if row['dedupe_key']]
+        if keys:
+            existing = set(db.session.scalars(
+                select(PendingNotice.dedupe_key).where(PendingNotice.dedupe_key.in_(keys))
+            ))
+            rows = [row for row in rows if row['dedupe_key'] not in existing]
+        
+        if rows:
+            db.session.execute(insert(PendingNotice), rows)
+        
+        if commit:
+            db.session.commit()
+            if (urgent or not self.window_minutes) and rows:
+                self.flush(force=True, user_ids={row['user_id'] for row in rows})
+        
+        return len(rows)
+    
+    def render_digest(self, notices, language):
+        """
+        Merge notices into one message within the SMS segment limit.
+        
+        Lines are ordered by urgency; lines that do not fit are replaced by a
+        "+N more" line rather than pushing the message into extra segments.
+        
+        Args:
+            notices (list): PendingNotice rows for one user
+            language (str): Language code
+        
+        Returns:
+            str: Digest message text
+        """
+        notices = sorted(notices, key=lambda notice: (NOTICE_PRIORITY[notice.notice_type], notice.id))
+        lines = [
+            message_templates.render(f'digest_{notice.notice_type}_line', language, **notice.params)
+            for notice in notices
+        ]
+        
+        for included in range(len(lines), 0, -1):
+            shown = lines[:included]
+            if included < len(lines):
+                shown.append(message_templates.render('digest_more', language, count=len(lines) - included))
+            
+            body = message_templates.render('digest', language, count=len(lines), lines='\n'.join(shown))
+            if not self.max_segments or count_sms_segments(body)['segments'] <= self.max_segments:
+                return body
+        
+        # Even the most urgent line alone is too long; trim it
+        return message_templates.render_within_segments(
+            'digest', language, self.max_segments, 'lines', count=len(lines), lines=lines[0]
+        )
+    
+    def flush(self, force=False, user_ids=None):
+        """
+        Queue one digest per user for every closed window.
+        
+        Args:
+            force (bool): Also flush the current, still open window
+            user_ids (iterable): Only flush these users (default: everyone with pending notices)
+        
+        Returns:
+            dict: Flush summary
+        """
+        started = time.perf_counter()
+        summary = {'users': 0, 'notices': 0, 'digests_queued': 0}
+        
+        pending = PendingNotice.digest_key.is_(None)
+        if not force:
+            pending = pending & (PendingNotice.window_start < self.get_window_start())
+        if user_ids is not None:
+            pending = pending & PendingNotice.user_id.in_(list(user_ids))
+        
+        due_users = list(db.session.scalars(select(PendingNotice.user_id).where(pending).distinct()))
+        
+        for start in range(0, len(due_users), FLUSH_CHUNK_SIZE):
+            chunk = due_users[start:start + FLUSH_CHUNK_SIZE]
+            try:
+                queued, notice_count = self._flush_users(chunk, pending)
+                summary['users'] += len(chunk)
+                summary['notices'] += notice_count
+                summary['digests_queued'] += queued
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error flushing digests for {len(chunk)} users: {e}")
+        
+        summary['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+        logger.info(f"Digest flush: {summary}")
+        return summary
+    
+    def _flush_users(self, user_ids, pending):
+        """Render, queue and mark the pending notices of a chunk of users."""
+        notices_by_user = {}
+        for notice in db.session.scalars(
+            select(PendingNotice).where(pending, PendingNotice.user_id.in_(user_ids)).order_by(PendingNotice.id)
+        ):
+            notices_by_user.setdefault(notice.user_id, []).append(notice)
+        
+        users = {
+            row.id: row for row in db.session.execute(
+                select(User.id, User.phone, User.preferred_language, User.is_active).where(User.id.in_(user_ids))
+            )
+        }
+        
+        entries = []
+        marks = []
+        for user_id, notices in notices_by_user.items():
+            user = users.get(user_id)
+            if user is None or not user.is_active:
+                digest_key = 'skipped:inactive'
+            else:
+                language = user.preferred_language or 'hi'
+                digest_key = f"digest:{user_id}:{notices[0].id}-{notices[-1].id}"
+                entries.append({
+                    'recipient': user.phone,
+                    'body': self.render_digest(notices, language),
+                    'notification_type': 'digest',
+                    'user_id': user_id,
+                    'language': language,
+                    'idempotency_key': digest_key
+                })
+            marks.extend({'id': notice.id, 'digest_key': digest_key} for notice in notices)
+        
+        if marks:
+            db.session.execute(update(PendingNotice), marks)
+        
+        # Marks and outbox rows are committed together
+        queued = notification_queue.enqueue_many(entries, commit=True)
+        return len(queued), len(marks)
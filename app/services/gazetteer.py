@@ -0,0 +1,359 @@
+"""
+Gazetteer Service - Offline place search for location autocomplete
+
+Places are stored in a sorted TSV file (one line per search key) with a
+binary file of line offsets. Both are memory-mapped, so a lookup is a binary
+search over the offsets and only the pages holding matching lines are read.
+"""
+
+import csv
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from app.services.geo import GeoHashIndex
+import logging
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'gazetteer')
+
+PLACES_FILE = 'places.tsv'
+INDEX_FILE = 'places.idx'
+
+# Districts and tehsils are few, so they get their own file that is always
+# searched in full; only the (much larger) village file is capped
+MAJOR_PLACES_FILE = 'major_places.tsv'
+MAJOR_INDEX_FILE = 'major_places.idx'
+MAJOR_KINDS = {'district', 'tehsil'}
+
+FIELDS = ['key', 'kind', 'name_en', 'name_hi', 'district', 'district_hi', 'state', 'state_hi',
+          'latitude', 'longitude', 'population']
+
+# Ranking of place kinds in suggestions
+KIND_RANK = {'district': 0, 'tehsil': 1, 'village': 2}
+
+# Village prefix matches examined before ranking
+MAX_CANDIDATES = 200
+
+# Devanagari -> Latin letters. Only consonants matter after folding; vowels
+# are kept so that leading vowels and semivowel rules behave like Latin input.
+DEVANAGARI_LETTERS = {
+    'अ': 'a', 'आ': 'a', 'इ': 'i', 'ई': 'i', 'उ': 'u', 'ऊ': 'u', 'ऋ': 'ri',
+    'ए': 'e', 'ऐ': 'e', 'ओ': 'o', 'औ': 'o',
+    'क': 'k', 'ख': 'k', 'ग': 'g', 'घ': 'g', 'ङ': 'n',
+    'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'j', 'ञ': 'n',
+    'ट': 't', 'ठ': 't', 'ड': 'd', 'ढ': 'd', 'ण': 'n',
+    'त': 't', 'थ': 't', 'द': 'd', 'ध': 'd', 'न': 'n',
+    'प': 'p', 'फ': 'f', 'ब': 'b', 'भ': 'b', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'व': 'v',
+    'श': 's', 'ष': 's', 'स': 's', 'ह': 'h',
+    'ा': 'a', 'ि': 'i', 'ी': 'i', 'ु': 'u', 'ू': 'u', 'ृ': 'ri',
+    'े': 'e', 'ै': 'e', 'ो': 'o', 'ौ': 'o',
+    'ं': 'n', 'ँ': 'n', 'ः': 'h', '्': ''
+}
+
+# Nukta forms that change the sound (ड़/ढ़ are flaps written "r" in English)
+NUKTA_LETTERS = {'ड': 'r', 'ढ': 'r', 'फ': 'f', 'ज': 'j', 'क': 'k', 'ख': 'k', 'ग': 'g'}
+NUKTA = '़'
+
+# Vowel signs and virama; a consonant without one carries the inherent "a"
+DEVANAGARI_SIGNS = set('ािीुूृेैोौ्')
+DEVANAGARI_CONSONANTS = set('कखगघङचछजझञटठडढणतथदधनपफबभमयरलवशषसह')
+
+# Latin spellings folded to one consonant, longest first
+LATIN_FOLDS = [
+    ('chh', 'c'), ('ksh', 'ks'),
+    ('ch', 'c'), ('ck', 'k'), ('sh', 's'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'),
+    ('th', 't'), ('dh', 'd'), ('ph', 'f'), ('bh', 'b'), ('rh', 'r'),
+    ('c', 'k'), ('q', 'k'), ('z', 'j'), ('x', 'ks'), ('w', 'v')
+]
+
+VOWELS = set('aeiou')
+SEMIVOWELS = set('vy')
+
+def transliterate_devanagari(text):
+    """Transliterate Devanagari to lowercase Latin letters for folding."""
+    text = unicodedata.normalize('NFD', text)
+    output = []
+    for index, char in enumerate(text):
+        if char == NUKTA:
+            continue
+        following = index + 1
+        if following < len(text) and text[following] == NUKTA:
+            output.append(NUKTA_LETTERS.get(char, DEVANAGARI_LETTERS.get(char, char)))
+            following += 1
+        else:
+            output.append(DEVANAGARI_LETTERS.get(char, char))
+        
+        if char in DEVANAGARI_CONSONANTS and (following >= len(text) or text[following] not in DEVANAGARI_SIGNS):
+            output.append('a')
+    return ''.join(output)
+
+def fold_name(text):
+    """
+    Fold a place name to a spelling-insensitive search key.
+    
+    Devanagari is transliterated, then Latin spellings are reduced to a
+    consonant skeleton: aspirates merge with their plain consonant, vowels
+    and non-initial "h" are dropped, semivowels after a vowel are dropped and
+    doubled letters collapse. "Lucknow", "Lakhnau" and "लखनऊ" all fold to "lkn".
+    
+    Args:
+        text (str): Place name or user input
+    
+    Returns:
+        str: Folded key
+    """
+    text = transliterate_devanagari(text.lower())
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text) if char.isascii() and char.isalpha())
+    
+    letters = []
+    index = 0
+    while index < len(text):
+        for spelling, folded in LATIN_FOLDS:
+            if text.startswith(spelling, index):
+                letters.append(folded)
+                index += len(spelling)
+                break
+        else:
+            letters.append(text[index])
+            index += 1
+    
+    text_letters = ''.join(letters)
+    key = []
+    previous = ''
+    for position, letter in enumerate(text_letters):
+        if letter in VOWELS:
+            if position == 0:
+                key.append('a')  # Leading vowels are spelled inconsistently; keep one marker
+        elif letter == 'h' and position > 0:
+            pass
+        elif letter in SEMIVOWELS and previous in VOWELS:
+            pass
+        elif letter == 'y' and position == len(text_letters) - 1:
+            pass  # Final "y" is a vowel ("Bareilly")
+        elif not key or key[-1] != letter:
+            key.append(letter)
+        previous = letter
+    
+    return ''.join(key)
+
+def is_devanagari(text):
+    """Check whether text contains Devanagari characters."""
+    return any('ऀ' <= char <= 'ॿ' for char in text)
+
+class SortedPlaces:
+    """One memory-mapped places file with its binary file of line offsets."""
+    
+    def __init__(self, places_path, index_path):
+        self._places = self._map(places_path)
+        self._offsets = self._map(index_path)
+        self.count = len(self._offsets) // 4
+    
+    @staticmethod
+    def _map(path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''  # mmap cannot map an empty file
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    def _offset(self, index):
+        return struct.unpack_from('<I', self._offsets, index * 4)[0]
+    
+    def _key(self, index):
+        start = self._offset(index)
+        return self._places[start:self._places.find(b'\t', start)]
+    
+    def record(self, index):
+        start = self._offset(index)
+        end = self._places.find(b'\n', start)
+        values = self._places[start:end if end != -1 else len(self._places)].decode('utf-8').split('\t')
+        record = dict(zip(FIELDS, values))
+        record['latitude'] = float(record['latitude'])
+        record['longitude'] = float(record['longitude'])
+        record['population'] = int(record['population'] or 0)
+        return record
+    
+    def _lower_bound(self, key):
+        """Index of the first line whose key is >= key."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def prefix_matches(self, prefix, candidates, limit=None):
+        """
+        Add the places whose key starts with prefix to candidates, deduplicated by place.
+        
+        Args:
+            prefix (bytes): Folded key prefix
+            candidates (dict): Places found so far, keyed by (name_en, district, state)
+            limit (int): Stop once candidates holds this many places (default: no limit)
+        """
+        index = self._lower_bound(prefix)
+        while index < self.count and (limit is None or len(candidates) < limit):
+            if not self._key(index).startswith(prefix):
+                break
+            record = self.record(index)
+            candidates.setdefault((record['name_en'], record['district'], record['state']), record)
+            index += 1
+
+class Gazetteer:
+    """Memory-mapped sorted-key index over the bundled places files."""
+    
+    def __init__(self, directory=GAZETTEER_DIR):
+        self.directory = directory
+        self._major = None
+        self._places = None
+        self._spatial_index = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        """Map the places and offsets files on first use."""
+        if self._places is not None:
+            return
+        with self._lock:
+            if self._places is not None:
+                return
+            major_path = os.path.join(self.directory, MAJOR_PLACES_FILE)
+            if os.path.exists(major_path):
+                self._major = SortedPlaces(major_path, os.path.join(self.directory, MAJOR_INDEX_FILE))
+            else:
+                logger.warning(f"No {MAJOR_PLACES_FILE} in {self.directory}; rebuild the gazetteer")
+            self._places = SortedPlaces(
+                os.path.join(self.directory, PLACES_FILE), os.path.join(self.directory, INDEX_FILE)
+            )
+    
+    def _files(self):
+        return [places for places in (self._major, self._places) if places is not None]
+    
+    def __len__(self):
+        self._load()
+        return sum(places.count for places in self._files())
+    
+    def search(self, query, limit=10):
+        """
+        Find places whose folded name starts with the folded query.
+        
+        Every matching district and tehsil is ranked; villages are capped at
+        MAX_CANDIDATES prefix matches so short queries stay cheap.
+        
+        Args:
+            query (str): User input in Devanagari or Latin script
+            limit (int): Maximum number of places
+        
+        Returns:
+            list: Place dicts, best match first
+        """
+        self._load()
+        key = fold_name(query)
+        if not key:
+            return []
+        
+        encoded = key.encode('ascii')
+        candidates = {}
+        if self._major is not None:
+            self._major.prefix_matches(encoded, candidates)
+        self._places.prefix_matches(encoded, candidates, limit=len(candidates) + MAX_CANDIDATES)
+        
+        typed = query.strip().lower()
+        name_field = 'name_hi' if is_devanagari(query) else 'name_en'
+        
+        def rank(record):
+            name = record[name_field].lower()
+            literal_match = name.startswith(typed) or any(word.startswith(typed) for word in name.split())
+            return (not literal_match, KIND_RANK.get(record['kind'], 3), -record['population'], record['name_en'])
+        
+        return sorted(candidates.values(), key=rank)[:limit]
+    
+    def nearest(self, latitude, longitude, limit=5):
+        """
+        Find the places nearest to a point (reverse geocoding).
+        
+        Returns:
+            list: Place dicts with distance_km, nearest first
+        """
+        if self._spatial_index is None:
+            self._load()
+            records = {}
+            for places in self._files():
+                for index in range(places.count):
+                    record = places.record(index)
+                    records.setdefault((record['name_en'], record['district'], record['state']), record)
+            self._spatial_index = GeoHashIndex(
+                (record['latitude'], record['longitude'], record) for record in records.values()
+            )
+        
+        return [
+            dict(record, distance_km=round(distance, 2))
+            for distance, record in self._spatial_index.nearest(latitude, longitude, limit)
+        ]
+
+def build_gazetteer(rows, directory=GAZETTEER_DIR):
+    """
+    Write the sorted places files and offsets indexes.
+    
+    Districts and tehsils go to the major places file, every other kind to
+    the places file.
+    
+    Args:
+        rows (iterable): Dicts with kind, name_en, name_hi, district, district_hi,
+            state, state_hi, latitude, longitude and optional population
+        directory (str): Output directory
+    
+    Returns:
+        int: Number of places written
+    """
+    lines = {True: [], False: []}
+    places = 0
+    for row in rows:
+        values = [
+            row['kind'], row['name_en'], row['name_hi'], row['district'], row['district_hi'],
+            row['state'], row['state_hi'],
+            f"{float(row['latitude']):.5f}", f"{float(row['longitude']):.5f}", str(row.get('population') or 0)
+        ]
+        if any('\t' in value or '\n' in value for value in values):
+            raise ValueError(f"Tabs and newlines are not allowed in place names: {row['name_en']}")
+        
+        # Every word start is searchable, so "Delhi" finds "New Delhi"
+        keys = set()
+        for name in (row['name_en'], row['name_hi']):
+            words = name.split()
+            keys.update(fold_name(' '.join(words[start:])) for start in range(len(words)))
+        keys.discard('')
+        for key in keys:
+            lines[row['kind'] in MAJOR_KINDS].append((key, '\t'.join([key] + values)))
+        places += 1
+    
+    os.makedirs(directory, exist_ok=True)
+    _write_sorted_places(lines[True], directory, MAJOR_PLACES_FILE, MAJOR_INDEX_FILE)
+    _write_sorted_places(lines[False], directory, PLACES_FILE, INDEX_FILE)
+    return places
+
+def _write_sorted_places(lines, directory, places_file, index_file):
+    """Write (key, line) pairs sorted by key, with a file of line offsets."""
+    lines.sort()
+    offsets = []
+    position = 0
+    with open(os.path.join(directory, places_file), 'wb') as f:
+        for _, line in lines:
+            data = (line + '\n').encode('utf-8')
+            offsets.append(position)
+            f.write(data)
+            position += len(data)
+    
+    with open(os.path.join(directory, index_file), 'wb') as f:
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+
+def build_gazetteer_from_csv(csv_path, directory=GAZETTEER_DIR):
+    """Build the gazetteer files from a CSV with the build_gazetteer columns."""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        return build_gazetteer(csv.DictReader(f), directory)
+
+gazetteer = Gazetteer()
@@ -0,0 +1,310 @@
+"""
+Geo Service - Geohash spatial index for farm and place location queries
+"""
+
+import math
+from bisect import bisect_left
+from sqlalchemy import select, or_, and_
+from app import db
+from app.models.farm import Farm
+import logging
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+_GEOHASH_INDEX = {char: index for index, char in enumerate(GEOHASH_ALPHABET)}
+
+# Precision stored on farms (~5 m cells)
+GEOHASH_PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode coordinates as a geohash.
+    
+    Nearby points share long prefixes, so a B-tree index on the geohash
+    string answers "points in this cell" as a single range scan.
+    
+    Args:
+        latitude (float): Latitude in degrees
+        longitude (float): Longitude in degrees
+        precision (int): Number of characters
+    
+    Returns:
+        str: Geohash
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    
+    while len(chars) < precision:
+        if even:
+            middle = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= middle:
+                bits = (bits << 1) | 1
+                lon_range[0] = middle
+            else:
+                bits <<= 1
+                lon_range[1] = middle
+        else:
+            middle = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= middle:
+                bits = (bits << 1) | 1
+                lat_range[0] = middle
+            else:
+                bits <<= 1
+                lat_range[1] = middle
+        
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    
+    return ''.join(chars)
+
+def geohash_bounds(geohash):
+    """Get the (min_lat, min_lon, max_lat, max_lon) bounding box of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    
+    for char in geohash:
+        value = _GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    
+    return (lat_range[0], lon_range[0], lat_range[1], lon_range[1])
+
+def geohash_decode(geohash):
+    """Get the (latitude, longitude) centre of a geohash cell."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    return ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+
+def geohash_cell_size_km(precision, latitude=0.0):
+    """Get the (height_km, width_km) of a geohash cell at a latitude."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    height = 180.0 / (2 ** lat_bits) * 111.32
+    width = 360.0 / (2 ** lon_bits) * 111.32 * max(math.cos(math.radians(latitude)), 0.01)
+    return (height, width)
+
+def geohash_neighbors(geohash):
+    """
+    Get the cell and its 8 neighbours at the same precision.
+    
+    Returns:
+        list: Geohashes of the 3x3 block centred on the cell
+    """
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    height = max_lat - min_lat
+    width = max_lon - min_lon
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+    
+    cells = []
+    for d_lat in (-1, 0, 1):
+        latitude = center_lat + d_lat * height
+        if latitude > 90 or latitude < -90:
+            continue
+        for d_lon in (-1, 0, 1):
+            longitude = (center_lon + d_lon * width + 180) % 360 - 180
+            cell = geohash_encode(latitude, longitude, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+def precision_for_radius(radius_km, latitude=0.0):
+    """Get the finest precision whose cells are at least radius_km in both directions."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if min(geohash_cell_size_km(precision, latitude)) >= radius_km:
+            return precision
+    return 1
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def prefix_upper_bound(prefix):
+    """
+    Get the smallest geohash greater than every geohash starting with prefix.
+    
+    The last character is incremented within the geohash alphabet (dropping
+    trailing 'z's), so the bound only uses geohash characters and orders the
+    same as the stored values instead of relying on how a collation sorts
+    punctuation.
+    
+    Args:
+        prefix (str): Geohash cell
+    
+    Returns:
+        str: Exclusive upper bound, or None if no geohash sorts after the cell
+    """
+    prefix = prefix.rstrip(GEOHASH_ALPHABET[-1])
+    if not prefix:
+        return None
+    return prefix[:-1] + GEOHASH_ALPHABET[_GEOHASH_INDEX[prefix[-1]] + 1]
+
+class GeoHashIndex:
+    """
+    In-memory geohash index over (latitude, longitude, item) points.
+    
+    Items are kept sorted by geohash, so a cell lookup is two binary searches
+    (a range of the sorted array) rather than a scan of every point.
+    """
+    
+    def __init__(self, points=(), precision=GEOHASH_PRECISION):
+        self.precision = precision
+        entries = sorted(
+            ((geohash_encode(latitude, longitude, precision), float(latitude), float(longitude), item)
+             for latitude, longitude, item in points),
+            key=lambda entry: entry[0]
+        )
+        self._hashes = [entry[0] for entry in entries]
+        self._entries = entries
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def in_cell(self, prefix):
+        """Get (latitude, longitude, item) for every point in a geohash cell."""
+        start = bisect_left(self._hashes, prefix)
+        bound = prefix_upper_bound(prefix)
+        end = len(self._hashes) if bound is None else bisect_left(self._hashes, bound)
+        return [entry[1:] for entry in self._entries[start:end]]
+    
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Get points within radius_km, nearest first.
+        
+        Returns:
+            list: (distance_km, item) tuples
+        """
+        precision = precision_for_radius(radius_km, latitude)
+        results = []
+        for cell in geohash_neighbors(geohash_encode(latitude, longitude, precision)):
+            for point_lat, point_lon, item in self.in_cell(cell):
+                distance = haversine_km(latitude, longitude, point_lat, point_lon)
+                if distance <= radius_km:
+                    results.append((distance, item))
+        results.sort(key=lambda result: result[0])
+        return results
+    
+    def nearest(self, latitude, longitude, limit=1):
+        """
+        Get the nearest points, expanding the searched block until the result is exact.
+        
+        Returns:
+            list: (distance_km, item) tuples, nearest first
+        """
+        return _expanding_nearest(
+            latitude, longitude, limit,
+            lambda cells: [
+                (haversine_km(latitude, longitude, point_lat, point_lon), item)
+                for cell in cells for point_lat, point_lon, item in self.in_cell(cell)
+            ]
+        )
+
+def _expanding_nearest(latitude, longitude, limit, fetch):
+    """
+    k-nearest search over geohash blocks of decreasing precision.
+    
+    The 3x3 block around the point contains every point closer than one cell
+    size, so once the k-th candidate is within that distance the answer is exact.
+    """
+    candidates = []
+    for precision in range(GEOHASH_PRECISION - 1, 0, -1):
+        cells = geohash_neighbors(geohash_encode(latitude, longitude, precision))
+        candidates = sorted(fetch(cells), key=lambda result: result[0])
+        guaranteed_km = min(geohash_cell_size_km(precision, latitude))
+        
+        if len(candidates) >= limit and candidates[limit - 1][0] <= guaranteed_km:
+            break
+    
+    return candidates[:limit]
+
+class FarmSpatialService:
+    """Location queries over farms served by the indexed geohash and grid cell columns."""
+    
+    def _cell_filter(self, cells):
+        """Build an OR of geohash range conditions, one index range scan per cell."""
+        conditions = []
+        for cell in cells:
+            bound = prefix_upper_bound(cell)
+            if bound is None:
+                conditions.append(Farm.geohash >= cell)
+            else:
+                conditions.append(and_(Farm.geohash >= cell, Farm.geohash < bound))
+        return or_(*conditions)
+    
+    def _fetch(self, cells, user_id=None):
+        """Fetch farms whose geohash falls in any of the cells."""
+        query = select(Farm).where(self._cell_filter(cells))
+        if user_id is not None:
+            query = query.where(Farm.user_id == user_id)
+        return list(db.session.scalars(query))
+    
+    def farms_in_radius(self, latitude, longitude, radius_km, user_id=None):
+        """
+        Get farms within radius_km of a point, nearest first.
+        
+        Args:
+            latitude (float): Centre latitude
+            longitude (float): Centre longitude
+            radius_km (float): Search radius
+            user_id (int): Only search this user's farms
+        
+        Returns:
+            list: (distance_km, Farm) tuples
+        """
+        precision = precision_for_radius(radius_km, latitude)
+        cells = geohash_neighbors(geohash_encode(latitude, longitude, precision))
+        
+        results = []
+        for farm in self._fetch(cells, user_id):
+            distance = haversine_km(latitude, longitude, farm.latitude, farm.longitude)
+            if distance <= radius_km:
+                results.append((distance, farm))
+        results.sort(key=lambda result: result[0])
+        return results
+    
+    def nearest_farms(self, latitude, longitude, limit=5, user_id=None):
+        """
+        Get the farms nearest to a point.
+        
+        Args:
+            latitude (float): Point latitude
+            longitude (float): Point longitude
+            limit (int): Number of farms
+            user_id (int): Only search this user's farms
+        
+        Returns:
+            list: (distance_km, Farm) tuples, nearest first
+        """
+        return _expanding_nearest(
+            latitude, longitude, limit,
+            lambda cells: [
+                (haversine_km(latitude, longitude, farm.latitude, farm.longitude), farm)
+                for farm in self._fetch(cells, user_id)
+            ]
+        )
+    
+    def farms_in_grid_cell(self, cell_key):
+        """Get the farms in a weather grid cell (see Farm.grid_cell)."""
+        return Farm.query.filter_by(grid_cell=cell_key).all()
@@ -5,24 +5,29 @@ Smart Irrigation Service - Calculates irrigation recommendations
 from datetime import datetime, date, timedelta
 from app.services.weather import WeatherService
 from app.models.crop import Crop, Activity
+from app.services.serializers import serialize_crops
 from app import db
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rolling windows supported by the water efficiency report
+WATER_REPORT_WINDOWS = (7, 30, 90)
+
 class IrrigationService:
     """Service for calculating irrigation recommendations."""
     
     def __init__(self):
         self.weather_service = WeatherService()
     
-    def calculate_irrigation_need(self, crop, farm_location=None):
+    def calculate_irrigation_need(self, crop, farm_location=None, weather_analysis=None):
         """
         Calculate irrigation recommendation for a specific crop.
         
         Args:
             crop (Crop): The crop object
             farm_location (tuple): (latitude, longitude) of the farm
+            weather_analysis (dict): Precomputed weather analysis, e.g. shared by a grid cell
             
         Returns:
             dict: Irrigation recommendation
@@ -33,12 +38,11 @@ class IrrigationService:
             growth_stage = crop.get_growth_stage_info()
             
             # Get last irrigation activity
-            last_irrigation = self._get_last_irrigation(crop)
-            days_since_irrigation = self._calculate_days_since_irrigation(last_irrigation)
+            last_irrigated_on = self._get_last_irrigation_date(crop)
+            days_since_irrigation = self._calculate_days_since_irrigation(last_irrigated_on)
             
             # Get weather analysis if location available
-            weather_analysis = None
-            if farm_location:
+            if weather_analysis is None and farm_location:
                 weather_analysis = self.weather_service.analyze_irrigation_conditions(
                     farm_location[0], farm_location[1]
                 )
@@ -67,11 +71,47 @@ class IrrigationService:
         recommendations = []
         farm_location = farm.get_location()
         
-        for crop in farm.get_active_crops():
+        crops = farm.get_active_crops()
+        for crop, crop_data in zip(crops, serialize_crops(crops)):
             recommendation = self.calculate_irrigation_need(crop, farm_location)
-            recommendation['crop'] = crop.to_dict()
+            recommendation['crop'] = crop_data
             recommendations.append(recommendation)
         
+        return self.add_irrigation_windows(farm, recommendations)
+    
+    def add_irrigation_windows(self, farm, recommendations):
+        """
+        Attach the best irrigation window to the farm's "irrigate" recommendations.
+        
+        The forecast of the farm's grid cell is scored once and shared by all
+        its crops; crops without a forecast window get the next fixed slot.
+        
+        Args:
+            farm (Farm): The farm object
+            recommendations (list): Recommendations for the farm's crops
+            
+        Returns:
+            list: The same recommendations, with 'timing' set on those to irrigate
+        """
+        water_amounts = {
+            recommendation['crop_id']: recommendation['water_amount_mm']
+            for recommendation in recommendations if recommendation['action'] == 'irrigate'
+        }
+        if not water_amounts:
+            return recommendations
+        
+        windows = {}
+        if farm.is_location_set():
+            try:
+                from app.services.irrigation_slots import IrrigationSlotService
+                windows = IrrigationSlotService().best_windows_for_farm(farm, water_amounts)
+            except Exception as e:
+                logger.error(f"Error calculating irrigation windows for farm {farm.id}: {e}")
+        
+        for recommendation in recommendations:
+            crop_id = recommendation['crop_id']
+            if crop_id in water_amounts:
+                recommendation['timing'] = windows.get(crop_id) or self._get_fixed_irrigation_time(water_amounts[crop_id])
         return recommendations
     
     def schedule_irrigation_activity(self, crop, water_amount_mm, scheduled_date=None):
@@ -103,17 +143,46 @@ class IrrigationService:
         
         return activity
     
-    def _get_last_irrigation(self, crop):
-        """Get the last irrigation activity for a crop."""
-        return crop.activities.filter_by(
-            activity_type='irrigation',
-            status='completed'
-        ).order_by(Activity.completed_date.desc()).first()
+    def schedule_irrigation_activities(self, schedule, scheduled_date=None):
+        """
+        Schedule irrigation activities for many crops in one transaction.
+        
+        Args:
+            schedule (list): (crop, water_amount_mm) pairs
+            scheduled_date (date): Date to schedule irrigation (default: today)
+            
+        Returns:
+            int: Number of activities created
+        """
+        if not scheduled_date:
+            scheduled_date = date.today()
+        
+        rows = [{
+            'crop_id': crop.id,
+            'activity_type': 'irrigation',
+            'description': f'Irrigate {crop.crop_type} with {water_amount_mm}mm water',
+            'quantity': f'{water_amount_mm}mm',
+            'scheduled_date': scheduled_date,
+            'status': 'pending'
+        } for crop, water_amount_mm in schedule]
+        
+        try:
+            created = Activity.bulk_insert(rows)
+            db.session.commit()
+            return created
+        except Exception:
+            db.session.rollback()
+            raise
     
-    def _calculate_days_since_irrigation(self, last_irrigation):
+    def _get_last_irrigation_date(self, crop):
+        """Get the date of the last completed irrigation for a crop."""
+        # Kept up to date by Activity.mark_completed, so no activity scan is needed
+        return crop.last_irrigated_on
+    
+    def _calculate_days_since_irrigation(self, last_irrigated_on):
         """Calculate days since last irrigation."""
-        if last_irrigation and last_irrigation.completed_date:
-            return (date.today() - last_irrigation.completed_date).days
+        if last_irrigated_on:
+            return (date.today() - last_irrigated_on).days
         return 7  # Default to 7 days if no irrigation history
     
     def _calculate_recommendation(self, crop, base_water_need, days_since_irrigation, weather_analysis, growth_stage):
@@ -209,8 +278,24 @@ class IrrigationService:
         else:
             return "सिंचाई न करें - मौसम की स्थिति अनुकूल है"
     
-    def calculate_optimal_irrigation_time(self, crop, water_amount_mm):
+    def calculate_optimal_irrigation_time(self, crop, water_amount_mm, farm_location=None):
         """Calculate optimal time for irrigation based on weather and efficiency."""
+        if farm_location is None and crop.farm:
+            farm_location = crop.farm.get_location()
+        
+        if farm_location:
+            try:
+                from app.services.irrigation_slots import IrrigationSlotService
+                window = IrrigationSlotService().best_window_for_crop(crop, water_amount_mm, farm_location)
+                if window:
+                    return window
+            except Exception as e:
+                logger.error(f"Error calculating irrigation window from forecast: {e}")
+        
+        return self._get_fixed_irrigation_time(water_amount_mm)
+    
+    def _get_fixed_irrigation_time(self, water_amount_mm):
+        """Pick the next fixed irrigation slot when no forecast is available."""
         try:
             # Best irrigation times (hours in 24-hour format)
             optimal_times = [
@@ -295,58 +380,125 @@ class IrrigationService:
         days = ['सोमवार', 'मंगलवार', 'बुधवार', 'गुरुवार', 'शुक्रवार', 'शनिवार', 'रविवार']
         return days[weekday]
     
-    def calculate_water_efficiency_report(self, farm):
-        """Calculate water usage efficiency report for a farm."""
-        try:
-            # Get all irrigation activities in the last 30 days
-            thirty_days_ago = date.today() - timedelta(days=30)
-            
-            irrigation_activities = Activity.query.join(Crop).filter(
-                Crop.farm_id == farm.id,
-                Activity.activity_type == 'irrigation',
-                Activity.completed_date >= thirty_days_ago,
-                Activity.status == 'completed'
-            ).all()
-            
-            total_water_used = 0
-            activities_count = len(irrigation_activities)
+    def calculate_water_efficiency_report(self, farm, window_days=30):
+        """
+        Calculate water usage efficiency report for a farm.
+        
+        Args:
+            farm (Farm): The farm object
+            window_days (int): Rolling window in days (7, 30 or 90)
             
-            for activity in irrigation_activities:
-                # Extract water amount from quantity field (format: "25.5mm")
-                try:
-                    water_amount = float(activity.quantity.replace('mm', ''))
-                    total_water_used += water_amount
-                except:
-                    continue
+        Returns:
+            dict: Water efficiency report
+        """
+        try:
+            reports = self._build_water_efficiency_reports([farm.id], window_days)
+            return reports[farm.id]
+        except Exception as e:
+            logger.error(f"Error calculating water efficiency: {e}")
+            return self._get_empty_efficiency_report(window_days)
+    
+    def calculate_user_water_efficiency_report(self, user, window_days=30):
+        """
+        Calculate water usage efficiency reports for all farms of a user.
+        
+        Args:
+            user (User): The user object
+            window_days (int): Rolling window in days (7, 30 or 90)
             
-            # Calculate efficiency metrics
-            farm_area = sum([crop.area_acres for crop in farm.get_active_crops()])
-            water_per_acre = total_water_used / max(farm_area, 1)
+        Returns:
+            dict: Per-farm reports keyed by farm id, plus an overall summary
+        """
+        from app.models.farm import Farm
+        
+        try:
+            farm_ids = [farm_id for (farm_id,) in db.session.query(Farm.id).filter(
+                Farm.user_id == user.id
+            ).all()]
+            farms = self._build_water_efficiency_reports(farm_ids, window_days)
             
-            # Benchmark: 150mm per month is good for most crops
-            efficiency_percentage = min(100, (150 / max(water_per_acre, 1)) * 100)
+            total_water = sum(r['total_water_used_mm'] for r in farms.values())
+            total_area = sum(r['farm_area_acres'] for r in farms.values())
+            total_events = sum(r['irrigation_events'] for r in farms.values())
             
             return {
-                'total_water_used_mm': round(total_water_used, 1),
-                'irrigation_events': activities_count,
-                'farm_area_acres': farm_area,
-                'water_per_acre': round(water_per_acre, 1),
-                'efficiency_percentage': round(efficiency_percentage, 1),
-                'efficiency_rating': self._get_efficiency_rating(efficiency_percentage),
-                'recommendations': self._get_efficiency_recommendations(efficiency_percentage)
+                'farms': farms,
+                'overall': self._build_efficiency_report(total_water, total_events, total_area, window_days)
             }
-            
         except Exception as e:
-            logger.error(f"Error calculating water efficiency: {e}")
-            return {
-                'total_water_used_mm': 0,
-                'irrigation_events': 0,
-                'farm_area_acres': 0,
-                'water_per_acre': 0,
-                'efficiency_percentage': 0,
-                'efficiency_rating': 'डेटा उपलब्ध नहीं',
-                'recommendations': ['अधिक डेटा संग्रह करें']
-            }
+            logger.error(f"Error calculating user water efficiency: {e}")
+            return {'farms': {}, 'overall': self._get_empty_efficiency_report(window_days)}
+    
+    def _build_water_efficiency_reports(self, farm_ids, window_days):
+        """Build efficiency reports for many farms from the daily rollup table."""
+        from sqlalchemy import func
+        from app.models.crop import IrrigationDailyRollup
+        
+        if window_days not in WATER_REPORT_WINDOWS:
+            raise ValueError(f"Unsupported report window: {window_days} days")
+        
+        if not farm_ids:
+            return {}
+        
+        since = date.today() - timedelta(days=window_days)
+        
+        usage = dict((farm_id, (water, events)) for farm_id, water, events in db.session.query(
+            IrrigationDailyRollup.farm_id,
+            func.sum(IrrigationDailyRollup.water_mm),
+            func.sum(IrrigationDailyRollup.events)
+        ).filter(
+            IrrigationDailyRollup.farm_id.in_(farm_ids),
+            IrrigationDailyRollup.day >= since
+        ).group_by(IrrigationDailyRollup.farm_id).all())
+        
+        areas = dict(db.session.query(
+            Crop.farm_id,
+            func.sum(Crop.area_acres)
+        ).filter(
+            Crop.farm_id.in_(farm_ids),
+            Crop.status == 'active'
+        ).group_by(Crop.farm_id).all())
+        
+        reports = {}
+        for farm_id in farm_ids:
+            water, events = usage.get(farm_id, (0, 0))
+            reports[farm_id] = self._build_efficiency_report(
+                float(water or 0), int(events or 0), float(areas.get(farm_id) or 0), window_days
+            )
+        
+        return reports
+    
+    def _build_efficiency_report(self, total_water_used, activities_count, farm_area, window_days):
+        """Build a single efficiency report from aggregated totals."""
+        water_per_acre = total_water_used / max(farm_area, 1)
+        
+        # Benchmark: 150mm per month is good for most crops
+        benchmark = 150 * window_days / 30
+        efficiency_percentage = min(100, (benchmark / max(water_per_acre, 1)) * 100)
+        
+        return {
+            'window_days': window_days,
+            'total_water_used_mm': round(total_water_used, 1),
+            'irrigation_events': activities_count,
+            'farm_area_acres': farm_area,
+            'water_per_acre': round(water_per_acre, 1),
+            'efficiency_percentage': round(efficiency_percentage, 1),
+            'efficiency_rating': self._get_efficiency_rating(efficiency_percentage),
+            'recommendations': self._get_efficiency_recommendations(efficiency_percentage)
+        }
+    
+    def _get_empty_efficiency_report(self, window_days):
+        """Get efficiency report when no data is available."""
+        return {
+            'window_days': window_days,
+            'total_water_used_mm': 0,
+            'irrigation_events': 0,
+            'farm_area_acres': 0,
+            'water_per_acre': 0,
+            'efficiency_percentage': 0,
+            'efficiency_rating': 'डेटा उपलब्ध नहीं',
+            'recommendations': ['अधिक डेटा संग्रह करें']
+        }
     
     def _get_efficiency_rating(self, percentage):
         """Get efficiency rating in Hindi."""
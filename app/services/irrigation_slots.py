@@ -0,0 +1,202 @@
+"""
+Irrigation Slot Service - Picks the best irrigation window from the hourly forecast
+"""
+
+import math
+from datetime import date, timedelta
+from flask import current_app
+from app.services.cache import TTLCache
+from app.services.weather import WeatherService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hours ahead that are scored
+SLOT_HORIZON_HOURS = 48
+
+# Rain falling this many hours after a window ends makes the irrigation redundant
+RAIN_LOOKAHEAD_HOURS = 6
+
+# Default water application rate for surface irrigation (mm per hour)
+DEFAULT_APPLICATION_RATE_MM_H = 10
+
+# Scored hourly profiles shared by all crops in a grid cell
+_cell_profile_cache = TTLCache(ttl_seconds=1800)
+
+
+def evaporation_loss(temperature, humidity, wind_speed, hour):
+    """
+    Estimate the fraction of applied water lost to evaporation and drift.
+    
+    Uses the vapour pressure deficit (from temperature and humidity), wind
+    speed and a solar term for daylight hours.
+    
+    Args:
+        temperature (float): Air temperature in °C
+        humidity (float): Relative humidity in %
+        wind_speed (float): Wind speed in m/s
+        hour (int): Hour of day (0-23)
+        
+    Returns:
+        float: Loss fraction between 0.02 and 0.6
+    """
+    saturation_pressure = 0.6108 * math.exp(17.27 * temperature / (temperature + 237.3))
+    vapour_pressure_deficit = saturation_pressure * (1 - min(humidity, 100) / 100)
+    
+    if 10 <= hour <= 16:
+        solar = 0.10
+    elif 7 <= hour <= 9 or 17 <= hour <= 18:
+        solar = 0.04
+    else:
+        solar = 0.0
+    
+    loss = 0.03 + 0.04 * vapour_pressure_deficit + 0.015 * wind_speed + solar
+    return min(0.6, max(0.02, loss))
+
+
+class CellSlotProfile:
+    """Hourly irrigation efficiency profile for one grid cell."""
+    
+    def __init__(self, hourly_forecast):
+        self.hours = [item['datetime'] for item in hourly_forecast]
+        self.efficiency = []
+        self.expected_rain = []
+        
+        # Single pass over the forecast array
+        for item in hourly_forecast:
+            loss = evaporation_loss(
+                item['temperature'], item['humidity'], item['wind_speed'], item['datetime'].hour
+            )
+            self.efficiency.append(1 - loss)
+            self.expected_rain.append(item['rain_mm'] * item['rain_probability'] / 100)
+        
+        # Prefix sums give O(1) window averages
+        self._efficiency_prefix = [0.0]
+        for value in self.efficiency:
+            self._efficiency_prefix.append(self._efficiency_prefix[-1] + value)
+        
+        self._rain_prefix = [0.0]
+        for value in self.expected_rain:
+            self._rain_prefix.append(self._rain_prefix[-1] + value)
+    
+    def __len__(self):
+        return len(self.hours)
+    
+    def window_efficiency(self, start, duration):
+        """Average efficiency of a window of duration hours starting at index start."""
+        return (self._efficiency_prefix[start + duration] - self._efficiency_prefix[start]) / duration
+    
+    def rain_after(self, end):
+        """Expected rain (mm) in the lookahead period after index end."""
+        stop = min(len(self.expected_rain), end + RAIN_LOOKAHEAD_HOURS)
+        return self._rain_prefix[stop] - self._rain_prefix[min(end, stop)]
+
+
+class IrrigationSlotService:
+    """Service for choosing irrigation windows from the hourly forecast."""
+    
+    def __init__(self):
+        self.weather_service = WeatherService()
+        self.application_rate = current_app.config.get(
+            'IRRIGATION_APPLICATION_RATE_MM_H', DEFAULT_APPLICATION_RATE_MM_H
+        )
+    
+    def get_cell_profile(self, latitude, longitude):
+        """Get the scored hourly profile for the grid cell containing the coordinates."""
+        cell = self.weather_service.get_grid_cell(latitude, longitude)
+        
+        def build():
+            hourly = self.weather_service.get_hourly_forecast(
+                cell[0], cell[1], SLOT_HORIZON_HOURS + RAIN_LOOKAHEAD_HOURS
+            )
+            return CellSlotProfile(hourly) if hourly else None
+        
+        return _cell_profile_cache.get_or_set(
+            (cell, self.weather_service.grid_resolution), build, self.weather_service.cache_ttl
+        )
+    
+    def find_best_window(self, profile, water_amount_mm):
+        """
+        Find the best irrigation window in a cell profile.
+        
+        Args:
+            profile (CellSlotProfile): Scored hourly profile of the crop's cell
+            water_amount_mm (float): Water to apply in mm
+            
+        Returns:
+            dict: Best window, or None if the profile is empty
+        """
+        horizon = min(SLOT_HORIZON_HOURS, len(profile))
+        if horizon == 0:
+            return None
+        
+        duration = max(1, min(horizon, math.ceil(water_amount_mm / self.application_rate)))
+        best = None
+        
+        for start in range(horizon - duration + 1):
+            efficiency = profile.window_efficiency(start, duration)
+            rain_after = profile.rain_after(start + duration)
+            
+            # Rain soon after irrigation replaces part of the applied water
+            wasted_fraction = min(1.0, rain_after / water_amount_mm) if water_amount_mm > 0 else 0
+            score = efficiency * (1 - wasted_fraction)
+            
+            if best is None or score > best['score']:
+                best = {
+                    'start': start,
+                    'score': score,
+                    'efficiency': efficiency,
+                    'rain_after_mm': rain_after
+                }
+        
+        start_time = profile.hours[best['start']]
+        end_time = start_time + timedelta(hours=duration)
+        efficiency = round(best['efficiency'], 2)
+        
+        return {
+            'recommended_time': self._format_window_label(start_time, end_time),
+            'window_start': start_time.isoformat(),
+            'window_end': end_time.isoformat(),
+            'duration_hours': duration,
+            'efficiency': efficiency,
+            'adjusted_amount': round(water_amount_mm / efficiency, 1),
+            'water_saved': round(water_amount_mm * (1 - efficiency), 1),
+            'rain_after_mm': round(best['rain_after_mm'], 1)
+        }
+    
+    def best_window_for_crop(self, crop, water_amount_mm, farm_location):
+        """Get the best irrigation window for a crop, or None without forecast data."""
+        profile = self.get_cell_profile(farm_location[0], farm_location[1])
+        if not profile:
+            return None
+        return self.find_best_window(profile, water_amount_mm)
+    
+    def best_windows_for_farm(self, farm, water_amounts):
+        """
+        Get the best irrigation window for several crops of a farm.
+        
+        Args:
+            farm (Farm): The farm object
+            water_amounts (dict): Water amount in mm keyed by crop id
+            
+        Returns:
+            dict: Best window keyed by crop id
+        """
+        location = farm.get_location()
+        if not location:
+            return {}
+        
+        profile = self.get_cell_profile(location[0], location[1])
+        if not profile:
+            return {}
+        
+        return {
+            crop_id: self.find_best_window(profile, water_amount_mm)
+            for crop_id, water_amount_mm in water_amounts.items()
+        }
+    
+    def _format_window_label(self, start_time, end_time):
+        """Format a window label in Hindi, e.g. 'कल 05:00-08:00'."""
+        days_ahead = (start_time.date() - date.today()).days
+        day_label = {0: 'आज', 1: 'कल', 2: 'परसों'}.get(days_ahead, start_time.strftime('%d/%m'))
+        return f"{day_label} {start_time:%H:%M}-{end_time:%H:%M}"
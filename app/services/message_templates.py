@@ -0,0 +1,187 @@
+"""
+Message Template Registry - Precompiled localized SMS templates and segment counting
+"""
+
+import json
+import math
+import os
+import threading
+from string import Formatter
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'messages')
+
+# Language used when templates for the requested language do not exist
+FALLBACK_LANGUAGE = 'en'
+
+# GSM 03.38 basic character set (1 septet each) and extension table (2 septets each)
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+# Characters per segment: (single message, each part of a multipart message)
+SEGMENT_LIMITS = {
+    'GSM-7': (160, 153),
+    'UCS-2': (70, 67)
+}
+
+
+def sms_encoding(text):
+    """Get the SMS encoding required for text ('GSM-7' or 'UCS-2')."""
+    for char in text:
+        if char not in GSM7_BASIC and char not in GSM7_EXTENDED:
+            return 'UCS-2'
+    return 'GSM-7'
+
+
+def count_sms_segments(text):
+    """
+    Count the SMS segments needed to send text.
+    
+    Hindi (Devanagari) and emoji force UCS-2, which fits 70 characters in a
+    single segment instead of 160.
+    
+    Args:
+        text (str): Message text
+        
+    Returns:
+        dict: encoding, units (septets or UTF-16 code units) and segments
+    """
+    encoding = sms_encoding(text)
+    
+    if encoding == 'GSM-7':
+        units = sum(2 if char in GSM7_EXTENDED else 1 for char in text)
+    else:
+        units = len(text.encode('utf-16-le')) // 2
+    
+    single, multipart = SEGMENT_LIMITS[encoding]
+    segments = 1 if units <= single else math.ceil(units / multipart)
+    
+    return {'encoding': encoding, 'units': units, 'segments': segments}
+
+
+class CompiledTemplate:
+    """A message template parsed once into literal text and placeholders."""
+    
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self._parts = []
+        self.fields = []
+        
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is not None and (conversion or not field.isidentifier()):
+                raise ValueError(f"Unsupported placeholder '{{{field}}}' in template {name}")
+            self._parts.append((literal, field, spec or ''))
+            if field and field not in self.fields:
+                self.fields.append(field)
+    
+    def render(self, **context):
+        """Render the template with placeholder values."""
+        missing = [field for field in self.fields if field not in context]
+        if missing:
+            raise KeyError(f"Template {self.name} missing values for: {', '.join(missing)}")
+        
+        output = []
+        for literal, field, spec in self._parts:
+            output.append(literal)
+            if field:
+                output.append(format(context[field], spec))
+        return ''.join(output)
+
+
+class MessageTemplateRegistry:
+    """Registry of compiled message templates, loaded once per language."""
+    
+    def __init__(self, templates_dir=TEMPLATES_DIR):
+        self.templates_dir = templates_dir
+        self._languages = {}
+        self._lock = threading.RLock()
+    
+    def available_languages(self):
+        """Get languages that have a template file."""
+        return sorted(name[:-5] for name in os.listdir(self.templates_dir) if name.endswith('.json'))
+    
+    def get_templates(self, language):
+        """Get the compiled templates for a language, loading them on first use."""
+        templates = self._languages.get(language)
+        if templates is not None:
+            return templates
+        
+        with self._lock:
+            if language not in self._languages:
+                path = os.path.join(self.templates_dir, f'{language}.json')
+                if not os.path.exists(path):
+                    if language == FALLBACK_LANGUAGE:
+                        raise FileNotFoundError(f"No message templates found at {path}")
+                    self._languages[language] = self.get_templates(FALLBACK_LANGUAGE)
+                else:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        sources = json.load(f)
+                    self._languages[language] = {
+                        name: CompiledTemplate(name, source) for name, source in sources.items()
+                    }
+            return self._languages[language]
+    
+    def get(self, name, language):
+        """Get a compiled template by name and language."""
+        return self.get_templates(language)[name]
+    
+    def render(self, name, language, **context):
+        """Render a single message."""
+        return self.get(name, language).render(**context)
+    
+    def render_many(self, name, language, contexts):
+        """
+        Render one template for many recipients.
+        
+        Args:
+            name (str): Template name
+            language (str): Language code
+            contexts (iterable): Placeholder dicts, one per message
+            
+        Returns:
+            list: Rendered messages in the same order
+        """
+        template = self.get(name, language)
+        return [template.render(**context) for context in contexts]
+    
+    def render_within_segments(self, name, language, max_segments, trim_field, **context):
+        """
+        Render a message, trimming one placeholder until it fits max_segments.
+        
+        Args:
+            name (str): Template name
+            language (str): Language code
+            max_segments (int): Maximum SMS segments, or None for no limit
+            trim_field (str): Placeholder whose value may be shortened
+            **context: Placeholder values
+            
+        Returns:
+            str: Rendered message
+        """
+        template = self.get(name, language)
+        text = template.render(**context)
+        if not max_segments or count_sms_segments(text)['segments'] <= max_segments:
+            return text
+        
+        # Binary search the longest prefix of the trimmed field that fits
+        value = str(context[trim_field])
+        low, high = 0, len(value)
+        best = template.render(**dict(context, **{trim_field: ''}))
+        
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = value[:middle].rstrip() + '...' if middle < len(value) else value
+            rendered = template.render(**dict(context, **{trim_field: candidate}))
+            if count_sms_segments(rendered)['segments'] <= max_segments:
+                best = rendered
+                low = middle + 1
+            else:
+                high = middle - 1
+        
+        return best
+
+
+message_templates = MessageTemplateRegistry()
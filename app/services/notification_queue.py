@@ -0,0 +1,336 @@
+"""
+Notification Queue - Durable outbox and delivery worker pool for outbound SMS
+
+Web requests only enqueue rows into the notification_outbox table. A pool of
+delivery workers claims pending rows, sends them within each provider's rate
+limit and records the outcome, retrying failures with exponential backoff.
+
+The rate limit is enforced per pool, so exactly one pool should deliver: the
+standalone `python batch.py notification-worker` process. In-process pools
+(NOTIFICATION_INPROCESS_WORKERS > 0) are opt-in for single-process setups,
+since every web server worker would otherwise add its own full-rate pool.
+"""
+
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from app.models.notification import NotificationOutbox
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default messages per second per provider (Twilio long codes allow 1 MPS)
+DEFAULT_PROVIDER_RATES = {'twilio': 1.0}
+
+# Rows in 'sending' longer than this are assumed abandoned by a crashed worker
+STALE_LOCK_SECONDS = 600
+
+# Delivery threads started inside web processes; 0 leaves delivery to the notification-worker job
+DEFAULT_INPROCESS_WORKERS = 0
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter."""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1.0):
+        """Block until tokens are available, then consume them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class NotificationQueue:
+    """Enqueue outbound notifications into the durable outbox."""
+    
+    def enqueue(self, recipient, body, notification_type, user_id=None, language='hi',
+                idempotency_key=None, provider='twilio', commit=True):
+        """
+        Add one notification to the outbox.
+        
+        Args:
+            recipient (str): Phone number
+            body (str): Fully formatted message text
+            notification_type (str): irrigation, weather, disease, fertilizer, digest
+            user_id (int): Recipient user id, if known
+            language (str): Message language
+            idempotency_key (str): Key that makes repeated enqueues a no-op
+            provider (str): Delivery provider
+            commit (bool): Commit the session after adding the row
+            
+        Returns:
+            NotificationOutbox: The queued entry, or None if the key was already queued
+        """
+        created = self.enqueue_many([{
+            'recipient': recipient,
+            'body': body,
+            'notification_type': notification_type,
+            'user_id': user_id,
+            'language': language,
+            'idempotency_key': idempotency_key,
+            'provider': provider
+        }], commit=commit)
+        
+        if not created:
+            return None
+        
+        return NotificationOutbox.query.filter_by(idempotency_key=created[0]).first()
+    
+    def enqueue_many(self, entries, commit=True):
+        """
+        Add many notifications to the outbox with one insert.
+        
+        Entries whose idempotency key is already queued are skipped, including
+        keys queued concurrently by another request or job.
+        
+        Args:
+            entries (list): Dicts with recipient, body, notification_type and optional
+                user_id, language, idempotency_key, provider
+            commit (bool): Commit the session after inserting
+            
+        Returns:
+            list: Idempotency keys of the entries that were queued
+        """
+        from sqlalchemy import insert
+        
+        rows = {}
+        for entry in entries:
+            row = dict(entry)
+            row['idempotency_key'] = row.get('idempotency_key') or uuid.uuid4().hex
+            row.setdefault('provider', 'twilio')
+            row.setdefault('language', 'hi')
+            row['status'] = 'pending'
+            row['next_attempt_at'] = datetime.utcnow()
+            rows[row['idempotency_key']] = row
+        
+        queued = []
+        if rows:
+            dialect = db.session.get_bind().dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                
+                # Keys inserted meanwhile by another transaction are skipped rather than failing the batch
+                statement = dialect_insert(NotificationOutbox).on_conflict_do_nothing(
+                    index_elements=['idempotency_key']
+                ).returning(NotificationOutbox.idempotency_key)
+                queued = list(db.session.scalars(statement, list(rows.values())))
+            else:
+                existing = set()
+                keys = list(rows)
+                for start in range(0, len(keys), 500):
+                    existing.update(db.session.scalars(
+                        select(NotificationOutbox.idempotency_key).where(
+                            NotificationOutbox.idempotency_key.in_(keys[start:start + 500])
+                        )
+                    ))
+                
+                new_rows = [row for key, row in rows.items() if key not in existing]
+                if new_rows:
+                    db.session.execute(insert(NotificationOutbox), new_rows)
+                queued = [row['idempotency_key'] for row in new_rows]
+        
+        if commit:
+            db.session.commit()
+            self._after_enqueue()
+        
+        return queued
+    
+    def get_status(self, idempotency_key):
+        """Get the delivery status of a queued notification."""
+        entry = NotificationOutbox.query.filter_by(idempotency_key=idempotency_key).first()
+        return entry.to_dict() if entry else None
+    
+    def _after_enqueue(self):
+        """Deliver inline when configured (e.g. in tests), else wake opted-in in-process workers."""
+        app = current_app._get_current_object()
+        
+        if app.config.get('NOTIFICATION_QUEUE_SYNC', app.testing):
+            DeliveryWorkerPool(app, workers=1).drain()
+            return
+        
+        if app.config.get('NOTIFICATION_INPROCESS_WORKERS', DEFAULT_INPROCESS_WORKERS) > 0:
+            get_inprocess_pool(app).wake()
+
+
+class DeliveryWorkerPool:
+    """Pool of worker threads that deliver queued notifications."""
+    
+    def __init__(self, app, workers=4, batch_size=50, poll_interval=2.0):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = app.config.get('NOTIFICATION_MAX_BACKOFF_SECONDS', 3600)
+        self.base_backoff = app.config.get('NOTIFICATION_BASE_BACKOFF_SECONDS', 30)
+        
+        rates = dict(DEFAULT_PROVIDER_RATES)
+        rates.update(app.config.get('NOTIFICATION_PROVIDER_RATES', {}))
+        self.buckets = {provider: TokenBucket(rate) for provider, rate in rates.items()}
+        
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+    
+    def start(self):
+        """Start the worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'notification-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} notification delivery workers")
+    
+    def stop(self, timeout=10):
+        """Signal workers to stop and wait for them."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def wake(self):
+        """Wake idle workers because new work was queued."""
+        self._wake.set()
+    
+    def drain(self):
+        """Deliver everything that is currently due on the calling thread."""
+        delivered = 0
+        with self.app.app_context():
+            while True:
+                processed = self._process_batch()
+                delivered += processed
+                if not processed:
+                    return delivered
+    
+    def _run(self):
+        worker_id = threading.current_thread().name
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    processed = self._process_batch()
+                except Exception as e:
+                    logger.error(f"{worker_id}: error processing notification batch: {e}")
+                    db.session.rollback()
+                    processed = 0
+                finally:
+                    db.session.remove()
+                
+                if not processed:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+    
+    def _process_batch(self):
+        """Claim and deliver one batch. Returns the number of rows processed."""
+        entries = self._claim_batch()
+        if not entries:
+            return 0
+        
+        from app.services.notifications import NotificationService
+        service = NotificationService()
+        
+        for entry in entries:
+            bucket = self.buckets.get(entry.provider)
+            if bucket:
+                bucket.acquire()
+            
+            result = service.send_sms(entry.recipient, entry.body, entry.language)
+            self._record_result(entry, result)
+            db.session.commit()
+        
+        return len(entries)
+    
+    def _claim_batch(self):
+        """Atomically mark a batch of due rows as being sent by this worker."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        
+        # Release rows abandoned by crashed workers
+        db.session.execute(
+            update(NotificationOutbox).where(
+                NotificationOutbox.status == 'sending',
+                NotificationOutbox.locked_at < now - timedelta(seconds=STALE_LOCK_SECONDS)
+            ).values(status='pending', locked_by=None, locked_at=None)
+        )
+        
+        due_ids = select(NotificationOutbox.id).where(
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id).limit(self.batch_size)
+        
+        db.session.execute(
+            update(NotificationOutbox).where(
+                NotificationOutbox.id.in_(due_ids.scalar_subquery()),
+                NotificationOutbox.status == 'pending'
+            ).values(status='sending', locked_by=token, locked_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        
+        return NotificationOutbox.query.filter_by(locked_by=token, status='sending').order_by(
+            NotificationOutbox.id
+        ).all()
+    
+    def _record_result(self, entry, result):
+        """Record a delivery attempt and schedule a retry if needed."""
+        entry.attempts += 1
+        entry.locked_by = None
+        entry.locked_at = None
+        
+        if result.get('status') == 'success':
+            entry.status = 'sent'
+            entry.sent_at = datetime.utcnow()
+            entry.provider_message_id = result.get('message_id')
+            entry.last_error = None
+        elif entry.attempts >= entry.max_attempts:
+            entry.status = 'failed'
+            entry.last_error = result.get('error')
+            logger.error(f"Notification {entry.idempotency_key} failed after {entry.attempts} attempts")
+        else:
+            entry.status = 'pending'
+            entry.last_error = result.get('error')
+            entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._backoff(entry.attempts))
+    
+    def _backoff(self, attempts):
+        """Exponential backoff with jitter, in seconds."""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+
+_inprocess_pool = None
+_inprocess_lock = threading.Lock()
+
+def get_inprocess_pool(app):
+    """Get (starting on first use) the delivery pool running inside this process."""
+    global _inprocess_pool
+    
+    with _inprocess_lock:
+        if _inprocess_pool is None:
+            _inprocess_pool = DeliveryWorkerPool(
+                app, workers=app.config.get('NOTIFICATION_INPROCESS_WORKERS', DEFAULT_INPROCESS_WORKERS)
+            )
+            _inprocess_pool.start()
+        return _inprocess_pool
+
+
+notification_queue = NotificationQueue()
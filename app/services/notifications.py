@@ -4,19 +4,39 @@ Notification Service - Handles SMS and other notifications
 
 from twilio.rest import Client
 from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from app.services.message_templates import message_templates, count_sms_segments
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Weather alert icons
+WEATHER_ICONS = {
+    'rain': '🌧️',
+    'storm': '⛈️',
+    'heat': '🌡️',
+    'wind': '💨',
+    'frost': '❄️'
+}
+
 class NotificationService:
     """Service for sending notifications via SMS and other channels."""
     
-    def __init__(self):
+    def __init__(self, client=None):
         self.account_sid = current_app.config.get('TWILIO_ACCOUNT_SID')
         self.auth_token = current_app.config.get('TWILIO_AUTH_TOKEN')
         self.phone_number = current_app.config.get('TWILIO_PHONE_NUMBER')
+        self.status_callback_url = current_app.config.get('TWILIO_STATUS_CALLBACK_URL')
+        self.bulk_concurrency = current_app.config.get('NOTIFICATION_BULK_CONCURRENCY', 8)
+        self.bulk_rate = current_app.config.get('NOTIFICATION_BULK_RATE')
+        # Free-text parts of alerts are trimmed so a message never exceeds this many segments
+        self.max_segments = current_app.config.get('SMS_MAX_SEGMENTS', 4)
         
-        if self.account_sid and self.auth_token:
+        if client is not None:
+            # Injected client (e.g. a stand-in provider for benchmarks)
+            self.client = client
+        elif self.account_sid and self.auth_token:
             self.client = Client(self.account_sid, self.auth_token)
         else:
             self.client = None
@@ -38,28 +58,14 @@ class NotificationService:
             logger.info(f"SMS (Mock): {phone_number} - {message}")
             return {'status': 'success', 'message_id': 'mock_sms_123', 'method': 'mock'}
         
-        try:
-            # Send the message via Twilio
-            sms_message = self.client.messages.create(
-                body=message,
-                from_=self.phone_number,
-                to=phone_number
-            )
-            
-            logger.info(f"SMS sent successfully to {phone_number}, ID: {sms_message.sid}")
-            return {
-                'status': 'success',
-                'message_id': sms_message.sid,
-                'method': 'sms'
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to send SMS to {phone_number}: {e}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'method': 'sms'
-            }
+        return self._deliver(phone_number, message, 'SMS')
+    
+    def format_irrigation_alert(self, crop_name, message, language='hi'):
+        """Format irrigation alert message text."""
+        return message_templates.render_within_segments(
+            'irrigation_alert', language, self.max_segments, 'message',
+            crop_name=crop_name, message=message
+        )
     
     def send_irrigation_alert(self, user_phone, crop_name, message, language='hi'):
         """
@@ -78,45 +84,45 @@ class NotificationService:
             logger.info(f"SMS Alert (Mock): {user_phone} - {message}")
             return {'status': 'success', 'message_id': 'mock_123', 'method': 'mock'}
         
-        try:
-            # Format message based on language
-            if language == 'hi':
-                formatted_message = f"""🌾 किसान साथी
-
-फसल: {crop_name}
-{message}
-
-धन्यवाद,
-स्मार्ट फसल देखभाल सहायक"""
-            else:
-                formatted_message = f"""🌾 Dear Farmer
-
-Crop: {crop_name}
-{message}
-
-Thanks,
-Smart Crop Care Assistant"""
-            
-            message = self.client.messages.create(
-                body=formatted_message,
-                from_=self.phone_number,
-                to=user_phone
-            )
-            
-            logger.info(f"SMS sent successfully to {user_phone}, ID: {message.sid}")
-            return {
-                'status': 'success',
-                'message_id': message.sid,
-                'method': 'sms'
-            }
+        return self._deliver(user_phone, self.format_irrigation_alert(crop_name, message, language), 'SMS')
+    
+    def format_irrigation_digest(self, items, language='hi'):
+        """Format one message summarizing irrigation for several crops."""
+        crop_name = ', '.join(item['crop_name'] for item in items)
+        lines = message_templates.render_many('irrigation_digest_line', language, items)
+        header = message_templates.render('irrigation_digest_header', language, count=len(items))
+        message = header + "\n" + "\n".join(lines)
+        
+        return self.format_irrigation_alert(crop_name, message, language)
+    
+    def send_irrigation_digest(self, user_phone, items, language='hi'):
+        """
+        Send one SMS summarizing irrigation scheduled for several crops.
+        
+        Args:
+            user_phone (str): User's phone number
+            items (list): Dicts with crop_name, water_amount_mm and priority
+            language (str): Language preference ('hi' or 'en')
             
-        except Exception as e:
-            logger.error(f"Failed to send SMS to {user_phone}: {e}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'method': 'sms'
-            }
+        Returns:
+            dict: Notification result
+        """
+        if not items:
+            return {'status': 'success', 'message_id': None, 'method': 'none'}
+        
+        body = self.format_irrigation_digest(items, language)
+        if not self.client:
+            logger.info(f"SMS Digest (Mock): {user_phone} - {body}")
+            return {'status': 'success', 'message_id': 'mock_124', 'method': 'mock'}
+        
+        return self._deliver(user_phone, body, 'SMS')
+    
+    def format_weather_alert(self, alert_type, message, language='hi'):
+        """Format weather alert message text."""
+        return message_templates.render_within_segments(
+            'weather_alert', language, self.max_segments, 'message',
+            icon=WEATHER_ICONS.get(alert_type, '⚠️'), message=message
+        )
     
     def send_weather_alert(self, user_phone, alert_type, message, language='hi'):
         """
@@ -135,53 +141,14 @@ Smart Crop Care Assistant"""
             logger.info(f"Weather Alert (Mock): {user_phone} - {message}")
             return {'status': 'success', 'message_id': 'mock_456', 'method': 'mock'}
         
-        try:
-            # Weather alert icons
-            icons = {
-                'rain': '🌧️',
-                'storm': '⛈️',
-                'heat': '🌡️',
-                'wind': '💨',
-                'frost': '❄️'
-            }
-            
-            icon = icons.get(alert_type, '⚠️')
-            
-            if language == 'hi':
-                formatted_message = f"""{icon} मौसम चेतावनी
-
-{message}
-
-सावधान रहें,
-स्मार्ट फसल देखभाल सहायक"""
-            else:
-                formatted_message = f"""{icon} Weather Alert
-
-{message}
-
-Stay safe,
-Smart Crop Care Assistant"""
-            
-            message = self.client.messages.create(
-                body=formatted_message,
-                from_=self.phone_number,
-                to=user_phone
-            )
-            
-            logger.info(f"Weather alert sent to {user_phone}, ID: {message.sid}")
-            return {
-                'status': 'success',
-                'message_id': message.sid,
-                'method': 'sms'
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to send weather alert to {user_phone}: {e}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'method': 'sms'
-            }
+        return self._deliver(user_phone, self.format_weather_alert(alert_type, message, language), 'Weather alert')
+    
+    def format_disease_alert(self, crop_name, disease_name, confidence, treatment, language='hi'):
+        """Format disease alert message text."""
+        return message_templates.render_within_segments(
+            'disease_alert', language, self.max_segments, 'treatment',
+            crop_name=crop_name, disease_name=disease_name, confidence=confidence, treatment=treatment
+        )
     
     def send_disease_alert(self, user_phone, crop_name, disease_name, confidence, treatment, language='hi'):
         """
@@ -202,54 +169,15 @@ Smart Crop Care Assistant"""
             logger.info(f"Disease Alert (Mock): {user_phone} - {disease_name}")
             return {'status': 'success', 'message_id': 'mock_789', 'method': 'mock'}
         
-        try:
-            if language == 'hi':
-                formatted_message = (
-                    f"""🔍 रोग पहचान
-
-फसल: {crop_name}
-रोग: {disease_name}
-सटीकता: {confidence:.0f}%
-
-उपचार: {treatment}
-
-तुरंत कार्रवाई करें,
-स्मार���ट फसल देखभाल सहायक"""
-                )
-            else:
-                formatted_message = (
-                    f"""🔍 Disease Detection
-
-Crop: {crop_name}
-Disease: {disease_name}
-Confidence: {confidence:.0f}%
-
-Treatment: {treatment}
-
-Take immediate action,
-Smart Crop Care Assistant"""
-                )
-            
-            message = self.client.messages.create(
-                body=formatted_message,
-                from_=self.phone_number,
-                to=user_phone
-            )
-            
-            logger.info(f"Disease alert sent to {user_phone}, ID: {message.sid}")
-            return {
-                'status': 'success',
-                'message_id': message.sid,
-                'method': 'sms'
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to send disease alert to {user_phone}: {e}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'method': 'sms'
-            }
+        body = self.format_disease_alert(crop_name, disease_name, confidence, treatment, language)
+        return self._deliver(user_phone, body, 'Disease alert')
+    
+    def format_fertilizer_reminder(self, crop_name, fertilizer_type, quantity, language='hi'):
+        """Format fertilizer reminder message text."""
+        return message_templates.render(
+            'fertilizer_reminder', language,
+            crop_name=crop_name, fertilizer_type=fertilizer_type, quantity=quantity
+        )
     
     def send_fertilizer_reminder(self, user_phone, crop_name, fertilizer_type, quantity, language='hi'):
         """
@@ -269,108 +197,205 @@ Smart Crop Care Assistant"""
             logger.info(f"Fertilizer Reminder (Mock): {user_phone} - {fertilizer_type}")
             return {'status': 'success', 'message_id': 'mock_101', 'method': 'mock'}
         
-        try:
-            if language == 'hi':
-                formatted_message = (
-                    f"""🌱 खाद अनुस्मारक
-
-फसल: {crop_name}
-खाद: {fertilizer_type}
-मात्रा: {quantity}
-
-आज डालें,
-स्मार्ट फसल देखभाल सहायक"""
-                )
-            else:
-                formatted_message = (
-                    f"""🌱 Fertilizer Reminder
-
-Crop: {crop_name}
-Fertilizer: {fertilizer_type}
-Quantity: {quantity}
-
-Apply today,
-Smart Crop Care Assistant"""
-                )
+        body = self.format_fertilizer_reminder(crop_name, fertilizer_type, quantity, language)
+        return self._deliver(user_phone, body, 'Fertilizer reminder')
+    
+    def format_notification(self, notification):
+        """
+        Format the message text for a notification dictionary.
+        
+        Args:
+            notification (dict): Notification in send_bulk_notifications format
             
-            message = self.client.messages.create(
-                body=formatted_message,
-                from_=self.phone_number,
-                to=user_phone
+        Returns:
+            str: Message text, or None for unknown notification types
+        """
+        language = notification.get('language', 'hi')
+        
+        if notification['type'] == 'irrigation':
+            return self.format_irrigation_alert(notification['crop_name'], notification['message'], language)
+        elif notification['type'] == 'weather':
+            return self.format_weather_alert(notification['alert_type'], notification['message'], language)
+        elif notification['type'] == 'disease':
+            return self.format_disease_alert(
+                notification['crop_name'],
+                notification['disease_name'],
+                notification['confidence'],
+                notification['treatment'],
+                language
+            )
+        elif notification['type'] == 'fertilizer':
+            return self.format_fertilizer_reminder(
+                notification['crop_name'],
+                notification['fertilizer_type'],
+                notification['quantity'],
+                language
             )
+        elif notification['type'] == 'digest':
+            return self.format_irrigation_digest(notification['items'], language)
+        
+        return None
+    
+    def send_notification(self, notification):
+        """
+        Send a single notification dictionary through the matching send_* method.
+        
+        Args:
+            notification (dict): Notification in send_bulk_notifications format
             
-            logger.info(f"Fertilizer reminder sent to {user_phone}, ID: {message.sid}")
-            return {
-                'status': 'success',
-                'message_id': message.sid,
-                'method': 'sms'
-            }
+        Returns:
+            dict: Notification result
+        """
+        if notification['type'] == 'irrigation':
+            return self.send_irrigation_alert(
+                notification['phone'],
+                notification['crop_name'],
+                notification['message'],
+                notification.get('language', 'hi')
+            )
+        elif notification['type'] == 'weather':
+            return self.send_weather_alert(
+                notification['phone'],
+                notification['alert_type'],
+                notification['message'],
+                notification.get('language', 'hi')
+            )
+        elif notification['type'] == 'disease':
+            return self.send_disease_alert(
+                notification['phone'],
+                notification['crop_name'],
+                notification['disease_name'],
+                notification['confidence'],
+                notification['treatment'],
+                notification.get('language', 'hi')
+            )
+        elif notification['type'] == 'fertilizer':
+            return self.send_fertilizer_reminder(
+                notification['phone'],
+                notification['crop_name'],
+                notification['fertilizer_type'],
+                notification['quantity'],
+                notification.get('language', 'hi')
+            )
+        elif notification['type'] == 'digest':
+            return self.send_irrigation_digest(
+                notification['phone'],
+                notification['items'],
+                notification.get('language', 'hi')
+            )
+        
+        return {'status': 'error', 'error': 'Unknown notification type'}
+    
+    def iter_bulk_notifications(self, notifications, concurrency=None, rate_per_second=None):
+        """
+        Send notifications concurrently, yielding results as they complete.
+        
+        At most `concurrency` messages are in flight at once, and sends are
+        paced by a token bucket when `rate_per_second` is set.
+        
+        Args:
+            notifications (list): List of notification dictionaries
+            concurrency (int): Worker threads (default: NOTIFICATION_BULK_CONCURRENCY or 8)
+            rate_per_second (float): Maximum sends per second (default: NOTIFICATION_BULK_RATE, unlimited)
             
-        except Exception as e:
-            logger.error(f"Failed to send fertilizer reminder to {user_phone}: {e}")
-            return {
-                'status': 'error',
-                'error': str(e),
-                'method': 'sms'
-            }
+        Yields:
+            tuple: (index in notifications, result dict)
+        """
+        from app.services.notification_queue import TokenBucket
+        
+        if concurrency is None:
+            concurrency = self.bulk_concurrency
+        if rate_per_second is None:
+            rate_per_second = self.bulk_rate
+        
+        bucket = TokenBucket(rate_per_second) if rate_per_second else None
+        
+        def send(notification):
+            if bucket:
+                bucket.acquire()
+            try:
+                return self.send_notification(notification)
+            except Exception as e:
+                logger.error(f"Error sending bulk notification: {e}")
+                return {'status': 'error', 'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            pending = {}
+            items = iter(enumerate(notifications))
+            
+            # Keep a bounded window of futures so huge lists do not queue up in memory
+            for index, notification in islice(items, concurrency * 2):
+                pending[executor.submit(send, notification)] = index
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    yield index, future.result()
+                
+                for index, notification in islice(items, len(done)):
+                    pending[executor.submit(send, notification)] = index
     
-    def send_bulk_notifications(self, notifications):
+    def send_bulk_notifications(self, notifications, concurrency=None, rate_per_second=None, progress_callback=None):
         """
         Send multiple notifications in bulk.
         
         Args:
             notifications (list): List of notification dictionaries
+            concurrency (int): Worker threads for concurrent sending
+            rate_per_second (float): Maximum sends per second
+            progress_callback (callable): Called as progress_callback(results, index, result)
+                after each notification completes, with the running summary
             
         Returns:
-            dict: Summary of sent notifications
+            dict: Summary of sent notifications, details in input order
         """
         results = {
             'total': len(notifications),
             'sent': 0,
             'failed': 0,
-            'details': []
+            'details': [None] * len(notifications)
         }
         
-        for notification in notifications:
-            if notification['type'] == 'irrigation':
-                result = self.send_irrigation_alert(
-                    notification['phone'],
-                    notification['crop_name'],
-                    notification['message'],
-                    notification.get('language', 'hi')
-                )
-            elif notification['type'] == 'weather':
-                result = self.send_weather_alert(
-                    notification['phone'],
-                    notification['alert_type'],
-                    notification['message'],
-                    notification.get('language', 'hi')
-                )
-            elif notification['type'] == 'disease':
-                result = self.send_disease_alert(
-                    notification['phone'],
-                    notification['crop_name'],
-                    notification['disease_name'],
-                    notification['confidence'],
-                    notification['treatment'],
-                    notification.get('language', 'hi')
-                )
-            elif notification['type'] == 'fertilizer':
-                result = self.send_fertilizer_reminder(
-                    notification['phone'],
-                    notification['crop_name'],
-                    notification['fertilizer_type'],
-                    notification['quantity'],
-                    notification.get('language', 'hi')
-                )
-            else:
-                result = {'status': 'error', 'error': 'Unknown notification type'}
-            
-            results['details'].append(result)
+        for index, result in self.iter_bulk_notifications(notifications, concurrency, rate_per_second):
+            results['details'][index] = result
             
             if result['status'] == 'success':
                 results['sent'] += 1
             else:
                 results['failed'] += 1
+            
+            if progress_callback:
+                progress_callback(results, index, result)
         
-        return results
\ No newline at end of file
+        return results
+    
+    def _deliver(self, phone_number, body, label):
+        """Send a formatted message through Twilio."""
+        try:
+            params = {
+                'body': body,
+                'from_': self.phone_number,
+                'to': phone_number
+            }
+            if self.status_callback_url:
+                params['status_callback'] = self.status_callback_url
+            
+            message = self.client.messages.create(**params)
+            segments = count_sms_segments(body)['segments']
+            
+            logger.info(f"{label} sent successfully to {phone_number}, ID: {message.sid}, segments: {segments}")
+            return {
+                'status': 'success',
+                'message_id': message.sid,
+                'method': 'sms',
+                'segments': segments
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to send {label} to {phone_number}: {e}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'method': 'sms'
+            }
@@ -0,0 +1,166 @@
+"""
+Pagination Service - Keyset (cursor) pagination for long, time-ordered lists
+
+Pages are selected with a WHERE condition on the last row seen instead of
+OFFSET, so every page is one index range read of per_page + 1 rows however
+deep the user has scrolled.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import and_, or_
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+def encode_cursor(values):
+    """Encode sort key values as an opaque URL-safe cursor."""
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor back into typed sort key values.
+    
+    Args:
+        cursor (str): Cursor from encode_cursor
+        columns (list): Sort columns, used to restore date and datetime values
+    
+    Returns:
+        list: Sort key values
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+    
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None:
+            try:
+                value = _restore_value(value, column.type.python_type)
+            except (TypeError, ValueError):
+                raise ValueError('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+def _restore_value(value, python_type):
+    """Convert one decoded JSON value to the column's Python type, raising TypeError on a mismatch."""
+    if python_type in (datetime, date):
+        if not isinstance(value, str):
+            raise TypeError(f'Expected an ISO date string, got {type(value).__name__}')
+        return python_type.fromisoformat(value)
+    if python_type in (int, float, Decimal):
+        # bool is an int subclass, but never a valid sort key value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f'Expected a number, got {type(value).__name__}')
+        if python_type is int and not isinstance(value, int):
+            raise TypeError('Expected an integer')
+        return python_type(value)
+    if not isinstance(value, python_type):
+        raise TypeError(f'Expected {python_type.__name__}, got {type(value).__name__}')
+    return value
+
+def _after(columns, values, descending):
+    """Build the condition for rows after values in (column, ...) order."""
+    conditions = []
+    for index, column in enumerate(columns):
+        equal = [earlier == value for earlier, value in zip(columns[:index], values[:index])]
+        beyond = column < values[index] if descending else column > values[index]
+        conditions.append(and_(*equal, beyond))
+    return or_(*conditions)
+
+class KeysetPage:
+    """One page of a keyset-paginated query."""
+    
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def to_dict(self, serialize):
+        """Convert the page to a JSON response body using serialize(item)."""
+        return {
+            'items': [serialize(item) for item in self.items],
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+
+def keyset_paginate(query, columns, cursor=None, before=None, per_page=DEFAULT_PER_PAGE, descending=True):
+    """
+    Fetch one page of a query ordered by a unique sort key.
+    
+    Args:
+        query: SQLAlchemy Query already filtered to the rows to page through
+        columns (list): Sort key columns, ending with a unique column (e.g. [detected_at, id])
+        cursor (str): Return rows after this cursor (next page)
+        before (str): Return rows before this cursor (previous page)
+        per_page (int): Rows per page, capped at MAX_PER_PAGE
+        descending (bool): Newest first
+    
+    Returns:
+        KeysetPage: Page items with cursors for the neighbouring pages
+    
+    Raises:
+        ValueError: If a cursor is malformed
+    """
+    per_page = max(1, min(per_page or DEFAULT_PER_PAGE, MAX_PER_PAGE))
+    backwards = before is not None
+    
+    # Reading backwards walks the index in the opposite direction, then the page is flipped
+    forward_descending = descending != backwards
+    if backwards:
+        query = query.filter(_after(columns, decode_cursor(before, columns), forward_descending))
+    elif cursor is not None:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), forward_descending))
+    
+    order = [column.desc() if forward_descending else column.asc() for column in columns]
+    rows = query.order_by(None).order_by(*order).limit(per_page + 1).all()
+    
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    
+    def key(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+    
+    if not rows:
+        return KeysetPage([], per_page)
+    
+    if backwards:
+        return KeysetPage(rows, per_page, next_cursor=key(rows[-1]), prev_cursor=key(rows[0]) if has_more else None)
+    
+    return KeysetPage(
+        rows, per_page,
+        next_cursor=key(rows[-1]) if has_more else None,
+        prev_cursor=key(rows[0]) if cursor is not None else None
+    )
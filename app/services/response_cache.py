@@ -0,0 +1,137 @@
+"""
+Response Cache Service - Per-user caching of chart API responses with ETags
+
+Chart bodies are cached per user, endpoint, URL arguments, locale and day,
+under the user's data version (app.models.stats.UserDataVersion). Every
+transaction that changes the user's farms, crops, activities or disease
+detections advances that version in the database, so entries built by any
+process expire for all processes when the write commits, including writes
+from batch jobs. In read_replica views (applied outside cached_chart_response)
+the version and the body are both read from the replica, version first: the
+version bump commits with the data, so a lagging replica caches its bodies
+under its own older version and never under a newer one. Every response
+carries a strong ETag over its body, so a dashboard poll with a matching
+If-None-Match gets a bodyless 304.
+"""
+
+import hashlib
+from datetime import date
+from functools import wraps
+from flask import current_app, request
+from flask_babel import get_locale
+from flask_login import current_user
+from sqlalchemy.orm import Session
+from app import db
+from app.models.user import User
+from app.models.farm import Farm
+from app.models.crop import Crop, Activity, DiseaseDetection
+from app.models.stats import UserDataVersion
+from app.services.cache import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHART_CACHE_TTL = 60
+
+_response_cache = TTLCache(ttl_seconds=DEFAULT_CHART_CACHE_TTL)
+
+def user_data_version(user_id):
+    """Get the data version that chart cache entries for a user are built on (from the replica in read_replica views)."""
+    return UserDataVersion.get(db.session.connection(), user_id)
+
+def mark_users_changed(session, user_ids):
+    """
+    Record users whose chart data changed; their versions advance at the end of the flush.
+    
+    Args:
+        session: Session the change was made in
+        user_ids (iterable): Owner user IDs (None values are ignored)
+    """
+    pending = session.info.setdefault('chart_user_ids', set())
+    pending.update(user_id for user_id in user_ids if user_id is not None)
+
+def _cache_key(user_id):
+    args = tuple(sorted(request.args.items(multi=True)))
+    view_args = tuple(sorted((request.view_args or {}).items()))
+    return (
+        request.endpoint, user_id, view_args, args, str(get_locale()),
+        date.today().isoformat(), user_data_version(user_id)
+    )
+
+def cached_chart_response(view):
+    """
+    Cache a chart view's JSON body per user and answer If-None-Match with 304.
+    
+    Must be applied inside login_required and, for replica reads, inside
+    read_replica so the version in the key comes from the same database as the
+    body. CHART_CACHE_TTL_SECONDS sets the lifetime (0 disables caching; ETags
+    are still sent).
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        # Off by default under test, where every test reuses user IDs in a fresh database
+        default = 0 if current_app.testing else DEFAULT_CHART_CACHE_TTL
+        ttl = current_app.config.get('CHART_CACHE_TTL_SECONDS', default)
+        key = _cache_key(current_user.id)
+        
+        cached = _response_cache.get(key) if ttl > 0 else None
+        if cached is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, response.mimetype, hashlib.sha256(body).hexdigest()[:32])
+            if ttl > 0:
+                _response_cache.set(key, cached, ttl)
+        
+        body, mimetype, etag = cached
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        # Clients may keep the body but must revalidate before reusing it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    return wrapped
+
+def _farm_owner_ids(connection, farm_ids):
+    farm_ids = [farm_id for farm_id in set(farm_ids) if farm_id is not None]
+    if not farm_ids:
+        return []
+    return connection.execute(
+        db.select(Farm.user_id).where(Farm.id.in_(farm_ids))
+    ).scalars().all()
+
+@db.event.listens_for(Farm, 'after_insert')
+@db.event.listens_for(Farm, 'after_update')
+@db.event.listens_for(Farm, 'after_delete')
+def _farm_changed(mapper, connection, farm):
+    history = db.inspect(farm).attrs.user_id.history
+    mark_users_changed(db.inspect(farm).session, [farm.user_id, *history.deleted])
+
+@db.event.listens_for(Crop, 'after_insert')
+@db.event.listens_for(Crop, 'after_update')
+@db.event.listens_for(Crop, 'after_delete')
+def _crop_changed(mapper, connection, crop):
+    history = db.inspect(crop).attrs.farm_id.history
+    mark_users_changed(db.inspect(crop).session, _farm_owner_ids(connection, [crop.farm_id, *history.deleted]))
+
+@db.event.listens_for(Activity, 'after_insert')
+@db.event.listens_for(Activity, 'after_update')
+@db.event.listens_for(Activity, 'after_delete')
+@db.event.listens_for(DiseaseDetection, 'after_insert')
+@db.event.listens_for(DiseaseDetection, 'after_update')
+@db.event.listens_for(DiseaseDetection, 'after_delete')
+def _crop_record_changed(mapper, connection, target):
+    history = db.inspect(target).attrs.user_id.history
+    mark_users_changed(db.inspect(target).session, [target.user_id, *history.deleted])
+
+@db.event.listens_for(Session, 'after_flush')
+def _bump_versions(session, flush_context):
+    user_ids = session.info.pop('chart_user_ids', None)
+    if user_ids:
+        # Users deleted in this flush already had their version row removed
+        deleted = {obj.id for obj in session.deleted if isinstance(obj, User)}
+        UserDataVersion.bump(session.connection(), user_ids - deleted)
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('chart_user_ids', None)
@@ -0,0 +1,100 @@
+"""
+Serializer Service - Bulk JSON serialization of farms and crops with preloaded aggregates
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import select, func
+from app import db
+from app.models.crop import Crop
+from app.services.stage_timeline import get_stage_table
+import logging
+
+try:
+    import orjson
+except ImportError:  # Optional fast path; the standard library encoder is used otherwise
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def load_farm_crop_stats(farm_ids):
+    """
+    Get active crop count and area for many farms with one grouped query.
+    
+    Args:
+        farm_ids (iterable): Farm IDs
+    
+    Returns:
+        dict: Farm ID -> (active crop count, total crop area); farms without
+            active crops map to (0, 0.0)
+    """
+    farm_ids = list(set(farm_ids))
+    stats = {farm_id: (0, 0.0) for farm_id in farm_ids}
+    if not farm_ids:
+        return stats
+    
+    rows = db.session.execute(
+        select(Crop.farm_id, func.count(Crop.id), func.sum(Crop.area_acres))
+        .where(Crop.farm_id.in_(farm_ids), Crop.status == 'active')
+        .group_by(Crop.farm_id)
+    )
+    for farm_id, count, area in rows:
+        stats[farm_id] = (count, float(area) if area else 0.0)
+    
+    return stats
+
+def serialize_farms(farms):
+    """
+    Serialize farms with the same shape as Farm.to_dict using one aggregate query.
+    
+    Args:
+        farms (list): Farm objects
+    
+    Returns:
+        list: Farm dicts
+    """
+    stats = load_farm_crop_stats(farm.id for farm in farms)
+    return [farm.to_dict(crop_stats=stats[farm.id]) for farm in farms]
+
+def serialize_crops(crops):
+    """
+    Serialize crops with the same shape as Crop.to_dict using the precomputed stage tables.
+    
+    Args:
+        crops (list): Crop objects
+    
+    Returns:
+        list: Crop dicts
+    """
+    return [crop.to_dict(stage_table=get_stage_table(crop.crop_type)) for crop in crops]
+
+def _default(value):
+    """Encode the non-JSON types that appear in API payloads."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'tolist'):  # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload):
+    """
+    Encode a payload as compact UTF-8 JSON bytes.
+    
+    Uses orjson when it is installed and falls back to the standard library
+    encoder; both produce the same document (ISO dates, unescaped Hindi text).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError as e:
+            logger.error(f"orjson could not encode payload, falling back to json: {e}")
+    
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Build a JSON response through the fast encoder (used by the chart APIs)."""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,188 @@
+"""
+Stage Timeline Service - Growth stage boundaries precomputed from the GrowthStage table
+
+Every crop type's stages are loaded once per process into immutable
+StageTable objects (one query for all crop types), so finding a crop's
+current stage, water need or full stage timeline needs no database access.
+Tables are dropped when GrowthStage or CropInfo rows change.
+"""
+
+from bisect import bisect_right
+from datetime import date
+import threading
+from flask import current_app, has_app_context
+from app import db
+from app.models.crop_data import CropInfo, GrowthStage
+from app.translations_helper import GROWTH_STAGE_TRANSLATIONS
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAGE_COLORS = ['#10B981', '#059669', '#047857', '#065F46', '#064E3B']
+FINAL_STAGE_COLOR = '#FCD34D'
+EXTENSION_KEY = 'stage_tables'
+
+_lock = threading.Lock()
+
+class Stage:
+    """One growth stage; attribute names match GrowthStage."""
+    
+    __slots__ = ('stage_name', 'stage_description_hi', 'start_day', 'end_day', 'water_requirement_mm_day')
+    
+    def __init__(self, stage_name, stage_description_hi, start_day, end_day, water_requirement_mm_day):
+        self.stage_name = stage_name
+        self.stage_description_hi = stage_description_hi
+        self.start_day = start_day
+        self.end_day = end_day
+        self.water_requirement_mm_day = water_requirement_mm_day
+
+class StageTable:
+    """Ordered stage boundaries of one crop type."""
+    
+    def __init__(self, crop_type, stages):
+        self.crop_type = crop_type
+        self.stages = tuple(stages)
+        self._starts = [stage.start_day for stage in self.stages]
+        self._labels = {}
+    
+    def __len__(self):
+        return len(self.stages)
+    
+    def current_stage(self, days_planted):
+        """Get the stage covering days_planted, or None outside every stage."""
+        index = bisect_right(self._starts, days_planted) - 1
+        if index >= 0 and days_planted <= self.stages[index].end_day:
+            return self.stages[index]
+        return None
+    
+    def labels(self, locale):
+        """Get the stage display names for a locale (computed once per locale)."""
+        labels = self._labels.get(locale)
+        if labels is None:
+            labels = []
+            for stage in self.stages:
+                translated = GROWTH_STAGE_TRANSLATIONS.get(stage.stage_name, {}).get(locale)
+                if locale == 'hi' and stage.stage_description_hi:
+                    translated = stage.stage_description_hi
+                labels.append(translated or stage.stage_name.replace('_', ' ').title())
+            self._labels[locale] = labels = tuple(labels)
+        return labels
+    
+    def timeline(self, days_planted, locale='hi'):
+        """
+        Get every stage with its completion state for a crop's age.
+        
+        Args:
+            days_planted (int): Days since planting
+            locale (str): Language for the stage names
+        
+        Returns:
+            list: Stage dicts (key, name, start_day, days, color, current, completed, progress)
+        """
+        labels = self.labels(locale)
+        last = len(self.stages) - 1
+        timeline = []
+        for index, stage in enumerate(self.stages):
+            completed = days_planted > stage.end_day
+            current = stage.start_day <= days_planted <= stage.end_day
+            if completed:
+                progress = 100
+            elif current:
+                span = max(1, stage.end_day - stage.start_day + 1)
+                progress = round((days_planted - stage.start_day + 1) / span * 100, 1)
+            else:
+                progress = 0
+            timeline.append({
+                'key': stage.stage_name,
+                'name': labels[index],
+                'start_day': stage.start_day,
+                'days': stage.end_day,
+                'color': FINAL_STAGE_COLOR if index == last else STAGE_COLORS[index % len(STAGE_COLORS)],
+                'current': current,
+                'completed': completed,
+                'progress': progress
+            })
+        return timeline
+
+EMPTY_TABLE = StageTable(None, [])
+
+def _load_stage_tables():
+    """Build the stage tables of all crop types with one query."""
+    rows = db.session.execute(
+        db.select(
+            CropInfo.name, GrowthStage.stage_name, GrowthStage.stage_description_hi,
+            GrowthStage.start_day, GrowthStage.end_day, GrowthStage.water_requirement_mm_day
+        ).join(GrowthStage, GrowthStage.crop_info_id == CropInfo.id)
+        .order_by(CropInfo.name, GrowthStage.start_day)
+    )
+    
+    stages = {}
+    for name, stage_name, description_hi, start_day, end_day, water in rows:
+        stages.setdefault(name, []).append(Stage(
+            stage_name, description_hi, start_day, end_day,
+            float(water) if water is not None else None
+        ))
+    
+    tables = {name: StageTable(name, crop_stages) for name, crop_stages in stages.items()}
+    logger.info(f"Loaded growth stage tables for {len(tables)} crop types")
+    return tables
+
+def get_stage_tables():
+    """Get the stage tables of all crop types, loading them on first use."""
+    tables = current_app.extensions.get(EXTENSION_KEY)
+    if tables is None:
+        with _lock:
+            tables = current_app.extensions.get(EXTENSION_KEY)
+            if tables is None:
+                tables = current_app.extensions[EXTENSION_KEY] = _load_stage_tables()
+    return tables
+
+def get_stage_table(crop_type):
+    """
+    Get the stage table of a crop type.
+    
+    Args:
+        crop_type (str): Crop type name (any case)
+    
+    Returns:
+        StageTable: Table; empty for crop types without stages
+    """
+    if not crop_type:
+        return EMPTY_TABLE
+    return get_stage_tables().get(crop_type.lower(), EMPTY_TABLE)
+
+def crop_timeline(crop, locale='hi', today=None):
+    """
+    Get the stage timeline payload of one crop.
+    
+    Args:
+        crop (Crop): Crop
+        locale (str): Language for the stage names
+        today (date): Day to compute the crop's age for
+    
+    Returns:
+        dict: Crop id, planting date, age and stage timeline
+    """
+    today = today or date.today()
+    days_planted = (today - crop.planting_date).days if crop.planting_date else 0
+    stages = get_stage_table(crop.crop_type).timeline(days_planted, locale) if crop.planting_date else []
+    return {
+        'crop_id': crop.id,
+        'crop_type': crop.crop_type,
+        'planting_date': crop.planting_date.isoformat() if crop.planting_date else None,
+        'days_planted': days_planted,
+        'stages': stages
+    }
+
+def invalidate_stage_tables():
+    """Drop the loaded stage tables so the next lookup reloads them."""
+    if has_app_context():
+        current_app.extensions.pop(EXTENSION_KEY, None)
+
+@db.event.listens_for(GrowthStage, 'after_insert')
+@db.event.listens_for(GrowthStage, 'after_update')
+@db.event.listens_for(GrowthStage, 'after_delete')
+@db.event.listens_for(CropInfo, 'after_update')
+@db.event.listens_for(CropInfo, 'after_delete')
+def _stages_changed(mapper, connection, target):
+    invalidate_stage_tables()
@@ -0,0 +1,129 @@
+"""
+User Context Service - Per-request user context
+
+The logged-in user, their farm IDs and the farm/active-crop counts shown on
+every page are loaded once per request with a single query and kept on g.
+Nothing is cached across requests, so changes made by other processes are
+seen on the next request; mapper events drop the request's context when the
+user's profile, farms or crops change during the request.
+"""
+
+from flask import g, has_app_context
+from sqlalchemy import and_, func
+from app import db
+from app.models.user import User
+from app.models.farm import Farm
+from app.models.crop import Crop
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserContext:
+    """The current user with the farm summary shared by every page."""
+    
+    def __init__(self, user, farm_ids, active_crops_count):
+        self.user = user
+        self.user_id = user.id
+        self.farm_ids = farm_ids
+        self.farms_count = len(farm_ids)
+        self.active_crops_count = active_crops_count
+
+def _query_summary(user_id):
+    """Load the user row, farm IDs and active crop count in one query."""
+    rows = db.session.query(User, Farm.id, func.count(Crop.id)).outerjoin(
+        Farm, Farm.user_id == User.id
+    ).outerjoin(
+        Crop, and_(Crop.farm_id == Farm.id, Crop.status == 'active')
+    ).filter(User.id == user_id).group_by(User.id, Farm.id).all()
+    
+    if not rows:
+        return None, None
+    
+    user = rows[0][0]
+    summary = {
+        'farm_ids': sorted(farm_id for _, farm_id, _ in rows if farm_id is not None),
+        'active_crops_count': sum(count for _, _, count in rows)
+    }
+    return user, summary
+
+def load_user_context(user_id):
+    """
+    Get the user context for a user, loading it at most once per request.
+    
+    Args:
+        user_id (int): User ID
+    
+    Returns:
+        UserContext: Context, or None if the user does not exist
+    """
+    context = g.get('user_context')
+    if context is not None and context.user_id == user_id:
+        return context
+    
+    user, summary = _query_summary(user_id)
+    if user is None:
+        return None
+    
+    context = UserContext(user, summary['farm_ids'], summary['active_crops_count'])
+    g.user_context = context
+    return context
+
+def current_user_context(user_id):
+    """Get this request's context for user_id if one was loaded."""
+    if not has_app_context():
+        return None
+    context = g.get('user_context')
+    if context is not None and context.user_id == user_id:
+        return context
+    return None
+
+def invalidate_user(user_id):
+    """Drop the per-request context for a user."""
+    if has_app_context():
+        context = g.get('user_context')
+        if context is not None and context.user_id == user_id:
+            g.pop('user_context')
+
+def _context_loaded():
+    return has_app_context() and g.get('user_context') is not None
+
+def _mark_changed(user_ids):
+    for user_id in user_ids:
+        if user_id is not None:
+            invalidate_user(user_id)
+
+def _farm_owner_ids(connection, farm_ids):
+    farm_ids = [farm_id for farm_id in set(farm_ids) if farm_id is not None]
+    if not farm_ids:
+        return []
+    return connection.execute(
+        db.select(Farm.user_id).where(Farm.id.in_(farm_ids))
+    ).scalars().all()
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, user):
+    _mark_changed([user.id])
+
+@db.event.listens_for(Farm, 'after_insert')
+@db.event.listens_for(Farm, 'after_update')
+@db.event.listens_for(Farm, 'after_delete')
+def _farm_changed(mapper, connection, farm):
+    history = db.inspect(farm).attrs.user_id.history
+    _mark_changed([farm.user_id, *history.deleted])
+
+@db.event.listens_for(Crop, 'after_insert')
+@db.event.listens_for(Crop, 'after_delete')
+def _crop_added_or_removed(mapper, connection, crop):
+    if not _context_loaded():
+        return
+    _mark_changed(_farm_owner_ids(connection, [crop.farm_id]))
+
+@db.event.listens_for(Crop, 'after_update')
+def _crop_changed(mapper, connection, crop):
+    state = db.inspect(crop)
+    farm_history = state.attrs.farm_id.history
+    if not _context_loaded() or not (farm_history.has_changes() or state.attrs.status.history.has_changes()):
+        return
+    _mark_changed(_farm_owner_ids(connection, [crop.farm_id, *farm_history.deleted]))
+
@@ -5,16 +5,55 @@ Weather Service - Integration with OpenWeatherMap API
 import requests
 from datetime import datetime, timedelta
 from flask import current_app
+from app.services.cache import TTLCache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Default weather grid resolution in degrees (~11 km at Indian latitudes)
+DEFAULT_GRID_RESOLUTION = 0.1
+
+# Irrigation weather analysis shared by all farms in the same grid cell
+_cell_analysis_cache = TTLCache(ttl_seconds=1800)
+
+# Hourly forecasts shared by all farms in the same grid cell
+_cell_hourly_cache = TTLCache(ttl_seconds=1800)
+
+def grid_cell(latitude, longitude, resolution=DEFAULT_GRID_RESOLUTION):
+    """
+    Snap coordinates to the centre of their weather grid cell.
+    
+    Args:
+        latitude (float): Location latitude
+        longitude (float): Location longitude
+        resolution (float): Cell size in degrees
+        
+    Returns:
+        tuple: (latitude, longitude) of the cell centre
+    """
+    def snap(value):
+        return round((int(float(value) // resolution) + 0.5) * resolution, 4)
+    
+    return (snap(latitude), snap(longitude))
+
+def grid_cell_key(latitude, longitude, resolution=DEFAULT_GRID_RESOLUTION):
+    """Get the string key of a grid cell, as stored on farms for spatial lookups."""
+    cell_latitude, cell_longitude = grid_cell(latitude, longitude, resolution)
+    return f"{cell_latitude:.4f},{cell_longitude:.4f}"
+
+def parse_grid_cell_key(key):
+    """Get the (latitude, longitude) cell centre from a grid cell key."""
+    latitude, longitude = key.split(',')
+    return (float(latitude), float(longitude))
+
 class WeatherService:
     """Service for fetching weather data from OpenWeatherMap."""
     
     def __init__(self):
         self.api_key = current_app.config.get('OPENWEATHER_API_KEY')
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.grid_resolution = current_app.config.get('WEATHER_GRID_RESOLUTION', DEFAULT_GRID_RESOLUTION)
+        self.cache_ttl = current_app.config.get('WEATHER_CACHE_TTL', 1800)
         
         if not self.api_key:
             logger.warning("OpenWeatherMap API key not configured")
@@ -95,6 +134,67 @@ class WeatherService:
             logger.error(f"Weather forecast service error: {e}")
             return self._get_mock_forecast_data(days)
     
+    def get_hourly_forecast(self, latitude, longitude, hours=48):
+        """
+        Get an hourly forecast for the grid cell containing the coordinates.
+        
+        The 3-hourly forecast is interpolated to hourly steps: temperature,
+        humidity and wind linearly, rain spread evenly over its 3-hour interval.
+        
+        Args:
+            latitude (float): Location latitude
+            longitude (float): Location longitude
+            hours (int): Number of hours starting from the next full hour
+            
+        Returns:
+            list: Hourly forecast dicts, or an empty list if unavailable
+        """
+        cell = self.get_grid_cell(latitude, longitude)
+        return _cell_hourly_cache.get_or_set(
+            (cell, self.grid_resolution, hours),
+            lambda: self._build_hourly_forecast(cell[0], cell[1], hours),
+            self.cache_ttl
+        ) or []
+    
+    def _build_hourly_forecast(self, latitude, longitude, hours):
+        """Interpolate the 3-hourly forecast into hourly steps."""
+        forecast = self.get_forecast(latitude, longitude, days=(hours // 24) + 1)
+        points = forecast['forecasts'] if forecast else []
+        if not points:
+            return None
+        
+        start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        hourly = []
+        index = 0
+        
+        for hour in range(hours):
+            moment = start + timedelta(hours=hour)
+            
+            # Advance to the forecast interval containing this hour
+            while index + 1 < len(points) and points[index + 1]['datetime'] <= moment:
+                index += 1
+            
+            current = points[index]
+            following = points[index + 1] if index + 1 < len(points) else current
+            span = (following['datetime'] - current['datetime']).total_seconds()
+            weight = 0.0
+            if span > 0:
+                weight = min(1.0, max(0.0, (moment - current['datetime']).total_seconds() / span))
+            
+            def interpolate(key):
+                return current[key] + (following[key] - current[key]) * weight
+            
+            hourly.append({
+                'datetime': moment,
+                'temperature': round(interpolate('temperature'), 1),
+                'humidity': round(interpolate('humidity'), 1),
+                'wind_speed': round(interpolate('wind_speed'), 2),
+                'rain_mm': current['rain_3h'] / 3,
+                'rain_probability': current['rain_probability']
+            })
+        
+        return hourly
+    
     def _format_current_weather(self, data):
         """Format current weather data from API response."""
         try:
@@ -197,13 +297,29 @@ class WeatherService:
             'updated_at': datetime.now()
         }
     
+    def get_grid_cell(self, latitude, longitude):
+        """Get the weather grid cell for given coordinates."""
+        return grid_cell(latitude, longitude, self.grid_resolution)
+    
     def analyze_irrigation_conditions(self, latitude, longitude):
         """
         Analyze weather conditions for irrigation recommendations.
         
+        Farms in the same grid cell share one analysis, so the weather API
+        is called once per cell rather than once per farm or crop.
+        
         Returns:
             dict: Irrigation analysis results
         """
+        cell = self.get_grid_cell(latitude, longitude)
+        return _cell_analysis_cache.get_or_set(
+            (cell, self.grid_resolution),
+            lambda: self._analyze_irrigation_conditions(cell[0], cell[1]),
+            self.cache_ttl
+        )
+    
+    def _analyze_irrigation_conditions(self, latitude, longitude):
+        """Analyze weather conditions for a single location without caching."""
         current_weather = self.get_current_weather(latitude, longitude)
         forecast = self.get_forecast(latitude, longitude, days=3)
         
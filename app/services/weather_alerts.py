@@ -0,0 +1,247 @@
+"""
+Weather Alert Service - Evaluates forecasts per grid cell and fans alerts out to farmers
+"""
+
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models.farm import Farm
+from app.models.user import User
+from app.services.weather import WeatherService, parse_grid_cell_key
+from app.services.message_templates import message_templates
+from app.services.notifications import NotificationService
+from app.services.notification_queue import notification_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hours of forecast evaluated after each refresh
+ALERT_HORIZON_HOURS = 48
+
+# Rolling window used for rainfall totals
+RAIN_WINDOW_HOURS = 24
+
+# Alert thresholds (IMD heavy rain / heat wave / ground frost / strong wind levels)
+DEFAULT_ALERT_THRESHOLDS = {
+    'heavy_rain_mm_24h': 64.5,
+    'heat_max_temperature': 40.0,
+    'frost_min_temperature': 3.0,
+    'wind_speed_kmh': 50.0
+}
+
+# Alert kind -> (icon type used by NotificationService, message template)
+ALERT_KINDS = {
+    'heavy_rain': ('rain', 'weather_heavy_rain'),
+    'heat': ('heat', 'weather_heat'),
+    'frost': ('frost', 'weather_frost'),
+    'wind': ('wind', 'weather_wind')
+}
+
+# Cells per farm lookup query
+CELL_CHUNK_SIZE = 500
+
+class WeatherAlertService:
+    """Service that turns per-cell forecasts into personalized weather alerts."""
+    
+    def __init__(self, weather_service=None):
+        self.weather_service = weather_service or WeatherService()
+        self.thresholds = dict(DEFAULT_ALERT_THRESHOLDS)
+        self.thresholds.update(current_app.config.get('WEATHER_ALERT_THRESHOLDS') or {})
+        self.fetch_concurrency = current_app.config.get('WEATHER_ALERT_FETCH_CONCURRENCY', 8)
+        self.enqueue_batch_size = current_app.config.get('WEATHER_ALERT_ENQUEUE_BATCH', 1000)
+    
+    def get_active_cells(self):
+        """Get the grid cells that contain at least one active farmer's farm."""
+        return list(db.session.scalars(
+            select(Farm.grid_cell).distinct()
+            .join(User, User.id == Farm.user_id)
+            .where(Farm.grid_cell.isnot(None), User.is_active.is_(True))
+        ))
+    
+    def fetch_cell_forecasts(self, cells, hours=ALERT_HORIZON_HOURS):
+        """
+        Fetch hourly forecasts for many cells, one request per cell.
+        
+        Args:
+            cells (list): Grid cell keys
+            hours (int): Forecast horizon
+        
+        Returns:
+            dict: Grid cell key -> hourly forecast list (cells without data are left out)
+        """
+        def fetch(cell):
+            latitude, longitude = parse_grid_cell_key(cell)
+            return self.weather_service.get_hourly_forecast(latitude, longitude, hours)
+        
+        forecasts = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.fetch_concurrency)) as executor:
+            for cell, hourly in zip(cells, executor.map(fetch, cells)):
+                if len(hourly) >= hours:
+                    forecasts[cell] = hourly[:hours]
+        
+        return forecasts
+    
+    def evaluate_cells(self, forecasts):
+        """
+        Evaluate alert thresholds for all cells at once.
+        
+        Forecasts are stacked into (cells x hours) arrays so every threshold is
+        one vectorized comparison over the whole run instead of a loop per farm.
+        
+        Args:
+            forecasts (dict): Grid cell key -> hourly forecast list of equal length
+        
+        Returns:
+            dict: Grid cell key -> list of alerts (kind, value, start datetime)
+        """
+        if not forecasts:
+            return {}
+        
+        cells = list(forecasts)
+        hours = len(forecasts[cells[0]])
+        times = [point['datetime'] for point in forecasts[cells[0]]]
+        
+        temperature = np.array([[point['temperature'] for point in forecasts[cell]] for cell in cells], dtype=float)
+        rain = np.array([[point['rain_mm'] for point in forecasts[cell]] for cell in cells], dtype=float)
+        wind_kmh = np.array([[point['wind_speed'] for point in forecasts[cell]] for cell in cells], dtype=float) * 3.6
+        
+        # Rolling 24-hour rainfall from a prefix sum over hours
+        window = min(RAIN_WINDOW_HOURS, hours)
+        cumulative = np.concatenate([np.zeros((len(cells), 1)), np.cumsum(rain, axis=1)], axis=1)
+        rain_totals = cumulative[:, window:] - cumulative[:, :-window]
+        
+        checks = {
+            'heavy_rain': (rain_totals.max(axis=1), rain_totals.argmax(axis=1),
+                           lambda value: value >= self.thresholds['heavy_rain_mm_24h']),
+            'heat': (temperature.max(axis=1), temperature.argmax(axis=1),
+                     lambda value: value >= self.thresholds['heat_max_temperature']),
+            'frost': (temperature.min(axis=1), temperature.argmin(axis=1),
+                      lambda value: value <= self.thresholds['frost_min_temperature']),
+            'wind': (wind_kmh.max(axis=1), wind_kmh.argmax(axis=1),
+                     lambda value: value >= self.thresholds['wind_speed_kmh'])
+        }
+        
+        alerts = {}
+        for kind, (values, hour_index, triggered) in checks.items():
+            for index in np.flatnonzero(triggered(values)):
+                alerts.setdefault(cells[index], []).append({
+                    'kind': kind,
+                    'value': float(values[index]),
+                    'start': times[int(hour_index[index])]
+                })
+        
+        return alerts
+    
+    def iter_recipients(self, cells):
+        """
+        Yield active farmers with farms in the given cells.
+        
+        Args:
+            cells (list): Grid cell keys
+        
+        Yields:
+            dict: user_id, phone, language, grid_cell and farm_names
+        """
+        for start in range(0, len(cells), CELL_CHUNK_SIZE):
+            rows = db.session.execute(
+                select(User.id, User.phone, User.preferred_language, Farm.grid_cell, Farm.farm_name)
+                .join(Farm, Farm.user_id == User.id)
+                .where(Farm.grid_cell.in_(cells[start:start + CELL_CHUNK_SIZE]), User.is_active.is_(True))
+                .order_by(User.id, Farm.grid_cell, Farm.id)
+            )
+            
+            recipients = {}
+            for user_id, phone, language, cell, farm_name in rows:
+                recipient = recipients.setdefault((user_id, cell), {
+                    'user_id': user_id,
+                    'phone': phone,
+                    'language': language or 'hi',
+                    'grid_cell': cell,
+                    'farm_names': []
+                })
+                recipient['farm_names'].append(farm_name)
+            
+            yield from recipients.values()
+    
+    def build_alert_entry(self, recipient, alert, notification_service):
+        """Build the outbox entry for one farmer and one alert."""
+        alert_type, template = ALERT_KINDS[alert['kind']]
+        language = recipient['language']
+        
+        message = message_templates.render(
+            template, language,
+            farm_names=', '.join(recipient['farm_names']),
+            value=alert['value'],
+            start=alert['start'].strftime('%d/%m %H:%M')
+        )
+        
+        return {
+            'recipient': recipient['phone'],
+            'body': notification_service.format_weather_alert(alert_type, message, language),
+            'notification_type': 'weather',
+            'user_id': recipient['user_id'],
+            'language': language,
+            # One alert per farmer, grid cell, kind and day, however often the forecast is refreshed;
+            # farms of the same farmer in other alerted cells get their own alert
+            'idempotency_key': (
+                f"weather-alert:{recipient['user_id']}:{recipient['grid_cell']}:"
+                f"{alert['kind']}:{alert['start'].date().isoformat()}"
+            )
+        }
+    
+    def run(self, cells=None):
+        """
+        Evaluate the latest forecast and queue alerts for every affected farmer.
+        
+        Args:
+            cells (list): Grid cell keys to evaluate (default: all cells with active farms)
+        
+        Returns:
+            dict: Run summary
+        """
+        started = time.perf_counter()
+        cells = self.get_active_cells() if cells is None else list(cells)
+        
+        alerts = self.evaluate_cells(self.fetch_cell_forecasts(cells))
+        notification_service = NotificationService()
+        
+        summary = {
+            'cells_evaluated': len(cells),
+            'cells_alerted': len(alerts),
+            'alerts_built': 0,
+            'alerts_queued': 0
+        }
+        
+        batch = []
+        for recipient in self.iter_recipients(list(alerts)):
+            for alert in alerts[recipient['grid_cell']]:
+                batch.append(self.build_alert_entry(recipient, alert, notification_service))
+            
+            if len(batch) >= self.enqueue_batch_size:
+                summary['alerts_queued'] += self._enqueue(batch)
+                summary['alerts_built'] += len(batch)
+                batch = []
+        
+        if batch:
+            summary['alerts_queued'] += self._enqueue(batch)
+            summary['alerts_built'] += len(batch)
+        
+        summary['duplicates_skipped'] = summary['alerts_built'] - summary['alerts_queued']
+        summary['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+        summary['run_at'] = datetime.now().isoformat()
+        
+        logger.info(f"Weather alert run: {summary}")
+        return summary
+    
+    def _enqueue(self, batch):
+        """Queue a batch of alerts, skipping ones already queued or sent."""
+        try:
+            return len(notification_queue.enqueue_many(batch))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error queueing weather alerts: {e}")
+            return 0
@@ -0,0 +1,377 @@
+"""
+Yield Estimation Service - Crop yield estimates from a fitted, serialized model
+
+Estimates come from a linear model of log yield per acre over crop type,
+area, stage progress, water-stress days from irrigation history and disease
+detections. The model is fitted offline (python batch.py train-yield, see
+app.services.yield_training) and stored as JSON coefficients, so serving
+needs only numpy and scores every crop of a request with one matrix product.
+Crop types the model was not fitted on, or a missing model file, fall back
+to the regional baseline table. Forecast heat during heat-sensitive stages
+lowers an estimate as a separate adjustment, since there is no stored
+weather history to fit it on.
+"""
+
+import json
+import math
+import os
+import threading
+from datetime import date
+import numpy as np
+from flask import current_app
+from app import db
+from app.models.crop import Activity, DiseaseDetection
+from app.services.stage_timeline import get_stage_table
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bundled model file; YIELD_MODEL_PATH overrides it
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'yield_model.json')
+MODEL_FORMAT_VERSION = 1
+
+# Regional yield per acre in the crop's display unit, used without a fitted model
+BASELINE_YIELD_PER_ACRE = {
+    'wheat': {'min': 20, 'avg': 25, 'max': 30},
+    'rice': {'min': 30, 'avg': 35, 'max': 40},
+    'sugarcane': {'min': 400, 'avg': 500, 'max': 600},
+    'corn': {'min': 25, 'avg': 30, 'max': 35},
+    'cotton': {'min': 15, 'avg': 20, 'max': 25}
+}
+DEFAULT_BASELINE_CROP = 'wheat'
+
+# Display unit per crop type: (label, kg per unit)
+YIELD_UNITS = {'sugarcane': ('टन', 1000.0)}
+DEFAULT_YIELD_UNIT = ('क्विंटल', 100.0)
+
+# Numeric model features in column order; one-hot crop type columns follow
+BASE_FEATURES = ('log_area', 'progress', 'water_stress_share', 'diseased_detections', 'max_disease_confidence')
+
+# Dry days after an irrigation (or planting) before each further day counts as water stress
+WATER_STRESS_GAP_DAYS = 10
+DEFAULT_SEASON_DAYS = 120
+MAX_DISEASED_DETECTIONS = 5
+
+# z-score of the 10th/90th percentiles used for the pessimistic/optimistic estimates
+INTERVAL_Z = 1.2816
+
+# Forecast heat adjustment for crops in heat-sensitive stages
+HEAT_STRESS_TEMPERATURE = 35.0
+HEAT_SENSITIVE_STAGES = {'flowering', 'grain_filling'}
+HEAT_STRESS_PENALTY_PER_HOUR = 0.002
+MAX_HEAT_STRESS_PENALTY = 0.1
+
+class YieldModel:
+    """Fitted linear model of log(kg per acre) over BASE_FEATURES and crop type."""
+    
+    def __init__(self, crop_types, coefficients, intercept, residual_std, samples=0, trained_at=None):
+        self.crop_types = tuple(crop_types)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.residual_std = float(residual_std)
+        self.samples = samples
+        self.trained_at = trained_at
+        self._type_index = {crop_type: index for index, crop_type in enumerate(self.crop_types)}
+        
+        if len(self.coefficients) != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} coefficients, got {len(self.coefficients)}")
+    
+    @property
+    def feature_names(self):
+        return list(BASE_FEATURES) + [f'crop_type={crop_type}' for crop_type in self.crop_types]
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a model from its serialized form."""
+        if data.get('version') != MODEL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported yield model version {data.get('version')}")
+        if data.get('base_features') != list(BASE_FEATURES):
+            raise ValueError("Yield model was fitted on different features")
+        return cls(
+            data['crop_types'], data['coefficients'], data['intercept'], data['residual_std'],
+            samples=data.get('samples', 0), trained_at=data.get('trained_at')
+        )
+    
+    def to_dict(self):
+        """Get the serialized form of the model."""
+        return {
+            'version': MODEL_FORMAT_VERSION,
+            'base_features': list(BASE_FEATURES),
+            'crop_types': list(self.crop_types),
+            'coefficients': self.coefficients.tolist(),
+            'intercept': self.intercept,
+            'residual_std': self.residual_std,
+            'samples': self.samples,
+            'trained_at': self.trained_at
+        }
+    
+    def covers(self, crop_type):
+        """Check whether the model was fitted on a crop type."""
+        return crop_type in self._type_index
+    
+    def design_matrix(self, features, crop_types):
+        """
+        Append one-hot crop type columns to a base feature matrix.
+        
+        Args:
+            features (ndarray): n x len(BASE_FEATURES) matrix
+            crop_types (list): Lowercase crop type of each row
+        
+        Returns:
+            ndarray: n x len(feature_names) matrix
+        """
+        one_hot = np.zeros((len(crop_types), len(self.crop_types)))
+        for row, crop_type in enumerate(crop_types):
+            column = self._type_index.get(crop_type)
+            if column is not None:
+                one_hot[row, column] = 1.0
+        return np.hstack([features, one_hot])
+    
+    def predict_log(self, features, crop_types):
+        """Get the predicted log(kg per acre) of every row."""
+        return self.design_matrix(features, crop_types) @ self.coefficients + self.intercept
+
+_models = {}
+_models_lock = threading.Lock()
+
+def load_yield_model(path=None):
+    """
+    Get the fitted yield model, reloading it when its file changes.
+    
+    Args:
+        path (str): Model file; YIELD_MODEL_PATH or the bundled file by default
+    
+    Returns:
+        YieldModel: Model, or None if no usable model file exists
+    """
+    path = path or current_app.config.get('YIELD_MODEL_PATH') or MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    cached = _models.get(path)
+    if cached is None or cached[0] != mtime:
+        with _models_lock:
+            cached = _models.get(path)
+            if cached is None or cached[0] != mtime:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        model = YieldModel.from_dict(json.load(f))
+                    logger.info(f"Loaded yield model for {len(model.crop_types)} crop types from {path}")
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.error(f"Error loading yield model from {path}: {e}")
+                    model = None
+                cached = _models[path] = (mtime, model)
+    return cached[1]
+
+def season_days(crop):
+    """Get the length of a crop's season from its stage table or expected harvest date."""
+    table = get_stage_table(crop.crop_type)
+    if len(table):
+        return table.stages[-1].end_day
+    if crop.expected_harvest_date and crop.planting_date and crop.expected_harvest_date > crop.planting_date:
+        return (crop.expected_harvest_date - crop.planting_date).days
+    return DEFAULT_SEASON_DAYS
+
+def _irrigation_days(crop_ids):
+    rows = db.session.execute(
+        db.select(Activity.crop_id, Activity.completed_date).where(
+            Activity.crop_id.in_(crop_ids),
+            Activity.activity_type == 'irrigation',
+            Activity.status == 'completed',
+            Activity.completed_date.isnot(None)
+        )
+    )
+    days = {}
+    for crop_id, completed_date in rows:
+        days.setdefault(crop_id, []).append(completed_date.toordinal())
+    return {crop_id: np.sort(np.array(ordinals)) for crop_id, ordinals in days.items()}
+
+def _disease_detections(crop_ids):
+    rows = db.session.execute(
+        db.select(DiseaseDetection.crop_id, DiseaseDetection.detected_at, DiseaseDetection.confidence_score).where(
+            DiseaseDetection.crop_id.in_(crop_ids),
+            DiseaseDetection.is_healthy.is_(False)
+        )
+    )
+    detections = {}
+    for crop_id, detected_at, confidence in rows:
+        if detected_at is None:
+            continue
+        entry = detections.setdefault(crop_id, ([], []))
+        entry[0].append(detected_at.date().toordinal())
+        entry[1].append(float(confidence) if confidence is not None else 0.0)
+    return {crop_id: (np.array(days), np.array(confidences)) for crop_id, (days, confidences) in detections.items()}
+
+def water_stress_days(planted, as_of, irrigations):
+    """
+    Count dry days beyond WATER_STRESS_GAP_DAYS between planting and a day.
+    
+    Args:
+        planted (int): Planting date ordinal
+        as_of (int): Last day ordinal
+        irrigations (ndarray): Sorted completed irrigation date ordinals
+    
+    Returns:
+        int: Water-stress days
+    """
+    if as_of <= planted:
+        return 0
+    events = irrigations[(irrigations > planted) & (irrigations <= as_of)]
+    gaps = np.diff(np.concatenate(([planted], events, [as_of])))
+    return int(np.clip(gaps - WATER_STRESS_GAP_DAYS, 0, None).sum())
+
+def build_features(crops, as_of):
+    """
+    Build the base feature matrix of many crops with two queries.
+    
+    Args:
+        crops (list): Crop objects (a crop may repeat with different days)
+        as_of (date or list): Day the features are computed for, per crop or for all
+    
+    Returns:
+        tuple: (n x len(BASE_FEATURES) ndarray, list of per-crop detail dicts)
+    """
+    if isinstance(as_of, date):
+        as_of = [as_of] * len(crops)
+    crop_ids = list({crop.id for crop in crops})
+    irrigations = _irrigation_days(crop_ids) if crop_ids else {}
+    detections = _disease_detections(crop_ids) if crop_ids else {}
+    no_events = np.array([], dtype=int)
+    
+    features = np.zeros((len(crops), len(BASE_FEATURES)))
+    details = []
+    for row, (crop, day) in enumerate(zip(crops, as_of)):
+        planted = crop.planting_date.toordinal()
+        last = max(planted, day.toordinal())
+        days_planted = last - planted
+        season = season_days(crop)
+        progress = min(1.0, days_planted / season) if season else 1.0
+        stress_days = water_stress_days(planted, last, irrigations.get(crop.id, no_events))
+        
+        detection_days, confidences = detections.get(crop.id, (no_events, no_events))
+        seen = detection_days <= last
+        diseased = int(seen.sum())
+        max_confidence = float(confidences[seen].max()) if diseased else 0.0
+        
+        features[row] = (
+            math.log1p(float(crop.area_acres)),
+            progress,
+            stress_days / days_planted if days_planted else 0.0,
+            min(diseased, MAX_DISEASED_DETECTIONS),
+            max_confidence
+        )
+        details.append({
+            'days_planted': days_planted,
+            'season_days': season,
+            'progress': progress,
+            'water_stress_days': stress_days,
+            'diseased_detections': diseased
+        })
+    return features, details
+
+def _heat_stress_hours(crops, details):
+    """Count forecast heat hours for crops currently in a heat-sensitive stage."""
+    from app.services.weather import WeatherService
+    
+    hours = np.zeros(len(crops))
+    sensitive = []
+    for row, crop in enumerate(crops):
+        stage = get_stage_table(crop.crop_type).current_stage(details[row]['days_planted'])
+        farm = crop.farm
+        if stage and stage.stage_name in HEAT_SENSITIVE_STAGES and farm.latitude is not None and farm.longitude is not None:
+            sensitive.append(row)
+    if not sensitive:
+        return hours
+    
+    weather_service = WeatherService()
+    for row in sensitive:
+        farm = crops[row].farm
+        # Hourly forecasts are cached per grid cell, so neighbouring farms share one fetch
+        forecast = weather_service.get_hourly_forecast(float(farm.latitude), float(farm.longitude))
+        hours[row] = sum(1 for hour in forecast if hour['temperature'] >= HEAT_STRESS_TEMPERATURE)
+    return hours
+
+def estimate_yields(crops, today=None, weather=True):
+    """
+    Estimate the yield of many crops, scoring all model-covered crops at once.
+    
+    Args:
+        crops (list): Crop objects
+        today (date): Day the estimates are made on
+        weather (bool): Apply the forecast heat adjustment
+    
+    Returns:
+        dict: Crop ID -> estimate dict (unit, per_acre, predictions, progress,
+            season_days, source, factors)
+    """
+    if not crops:
+        return {}
+    
+    today = today or date.today()
+    features, details = build_features(crops, today)
+    crop_types = [crop.crop_type.lower() for crop in crops]
+    unit_kg = np.array([YIELD_UNITS.get(crop_type, DEFAULT_YIELD_UNIT)[1] for crop_type in crop_types])
+    
+    # Baseline first, then overwrite the rows the model covers: kg per acre (low, mid, high)
+    baseline = [BASELINE_YIELD_PER_ACRE.get(crop_type, BASELINE_YIELD_PER_ACRE[DEFAULT_BASELINE_CROP])
+                for crop_type in crop_types]
+    per_acre = np.array([[entry['min'], entry['avg'], entry['max']] for entry in baseline], dtype=float) * unit_kg[:, None]
+    from_model = np.zeros(len(crops), dtype=bool)
+    
+    model = load_yield_model()
+    if model is not None:
+        from_model = np.array([model.covers(crop_type) for crop_type in crop_types])
+        if from_model.any():
+            rows = np.flatnonzero(from_model)
+            mean = model.predict_log(features[rows], [crop_types[row] for row in rows])
+            spread = INTERVAL_Z * model.residual_std
+            per_acre[rows] = np.exp(np.column_stack([mean - spread, mean, mean + spread]))
+    
+    heat_hours = _heat_stress_hours(crops, details) if weather else np.zeros(len(crops))
+    per_acre *= (1.0 - np.minimum(MAX_HEAT_STRESS_PENALTY, heat_hours * HEAT_STRESS_PENALTY_PER_HOUR))[:, None]
+    
+    areas = np.array([float(crop.area_acres) for crop in crops])
+    totals = per_acre * areas[:, None] / unit_kg[:, None]
+    
+    estimates = {}
+    for row, crop in enumerate(crops):
+        low, mid, high = totals[row]
+        detail = details[row]
+        estimates[crop.id] = {
+            'unit': YIELD_UNITS.get(crop_types[row], DEFAULT_YIELD_UNIT)[0],
+            'per_acre': round(per_acre[row, 1] / unit_kg[row], 1),
+            'predictions': {
+                'pessimistic': round(low, 1),
+                'realistic': round(mid, 1),
+                'optimistic': round(high, 1)
+            },
+            'progress': round(detail['progress'] * 100, 1),
+            'season_days': detail['season_days'],
+            'source': 'model' if from_model[row] else 'baseline',
+            'factors': {
+                'water_stress_days': detail['water_stress_days'],
+                'diseased_detections': detail['diseased_detections'],
+                'heat_stress_hours': int(heat_hours[row])
+            }
+        }
+    return estimates
+
+def monthly_projection(estimate, months=6):
+    """
+    Get the realistic yield expected to have developed at the start of each coming month.
+    
+    Args:
+        estimate (dict): Estimate from estimate_yields
+        months (int): Number of months
+    
+    Returns:
+        list: Yield per month in the estimate's unit
+    """
+    monthly_step = 30 / estimate['season_days'] * 100 if estimate['season_days'] else 100
+    realistic = estimate['predictions']['realistic']
+    return [
+        round(realistic * min(100, estimate['progress'] + month * monthly_step) / 100, 1)
+        for month in range(months)
+    ]
@@ -0,0 +1,136 @@
+"""
+Yield Training - Offline fitting of the yield estimation model
+
+Fits the model served by app.services.yield_estimation on harvested crops
+whose harvesting activity recorded a quantity (e.g. "18 quintal"). Every
+crop contributes one row per TRAINING_PROGRESS_POINTS, with features
+computed as of that point of its season, so the model learns to estimate the
+final yield at any stage. scikit-learn is imported only here, never by the
+web process. Run with: python batch.py train-yield
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from app import db
+from app.models.crop import Crop, Activity
+from app.services.yield_estimation import YieldModel, BASE_FEATURES, MODEL_PATH, build_features
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRAINING_PROGRESS_POINTS = (0.25, 0.5, 0.75, 1.0)
+MIN_TRAINING_CROPS = 20
+DEFAULT_RIDGE_ALPHA = 1.0
+
+def harvested_yields():
+    """
+    Get the recorded harvest of every harvested crop.
+    
+    Returns:
+        list: (crop, harvest date, harvested kg) tuples
+    """
+    rows = db.session.execute(
+        db.select(Activity.crop_id, func.max(Activity.completed_date), func.sum(Activity.quantity_value))
+        .join(Crop, Crop.id == Activity.crop_id)
+        .where(
+            Crop.status == 'harvested',
+            Activity.activity_type == 'harvesting',
+            Activity.status == 'completed',
+            Activity.completed_date.isnot(None),
+            Activity.quantity_unit == 'kg',
+            Activity.quantity_value > 0
+        )
+        .group_by(Activity.crop_id)
+    ).all()
+    if not rows:
+        return []
+    
+    crops = {crop.id: crop for crop in Crop.query.filter(Crop.id.in_([row[0] for row in rows]))}
+    return [
+        (crops[crop_id], harvest_date, harvested_kg)
+        for crop_id, harvest_date, harvested_kg in rows
+        if harvest_date > crops[crop_id].planting_date
+    ]
+
+def build_training_set():
+    """
+    Build the training rows of all harvested crops.
+    
+    Returns:
+        tuple: (base feature matrix, lowercase crop types, log kg per acre targets, crop count)
+    """
+    harvests = harvested_yields()
+    crops, as_of, targets = [], [], []
+    for crop, harvest_date, harvested_kg in harvests:
+        season = (harvest_date - crop.planting_date).days
+        target = math.log(harvested_kg / float(crop.area_acres))
+        for point in TRAINING_PROGRESS_POINTS:
+            crops.append(crop)
+            as_of.append(crop.planting_date + timedelta(days=round(season * point)))
+            targets.append(target)
+    
+    features, _ = build_features(crops, as_of)
+    return features, [crop.crop_type.lower() for crop in crops], np.array(targets), len(harvests)
+
+def train_yield_model(output_path=None, alpha=DEFAULT_RIDGE_ALPHA, min_crops=MIN_TRAINING_CROPS):
+    """
+    Fit the yield model on harvested crops and write it for serving.
+    
+    Args:
+        output_path (str): Model file (default: the bundled model path)
+        alpha (float): Ridge regularization strength
+        min_crops (int): Fewest harvested crops to fit on
+    
+    Returns:
+        dict: Summary with crop and sample counts, crop types, fit quality and elapsed time
+    
+    Raises:
+        ValueError: If fewer than min_crops harvested crops recorded a yield
+    """
+    from sklearn.linear_model import Ridge
+    
+    started = time.time()
+    output_path = output_path or MODEL_PATH
+    features, crop_types, targets, crop_count = build_training_set()
+    if crop_count < min_crops:
+        raise ValueError(f"Need at least {min_crops} harvested crops with a recorded yield, found {crop_count}")
+    
+    # Fit on the design matrix of a placeholder model so column order matches serving
+    fitted_types = sorted(set(crop_types))
+    layout = YieldModel(fitted_types, np.zeros(len(BASE_FEATURES) + len(fitted_types)), 0.0, 0.0)
+    design = layout.design_matrix(features, crop_types)
+    regression = Ridge(alpha=alpha).fit(design, targets)
+    
+    residuals = targets - regression.predict(design)
+    degrees_of_freedom = max(1, len(targets) - design.shape[1] - 1)
+    model = YieldModel(
+        fitted_types, regression.coef_, regression.intercept_,
+        math.sqrt(float(residuals @ residuals) / degrees_of_freedom),
+        samples=len(targets), trained_at=datetime.utcnow().isoformat()
+    )
+    
+    # Write then rename so serving processes never read a half-written file
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f'{output_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(model.to_dict(), f, indent=2)
+    os.replace(temp_path, output_path)
+    
+    summary = {
+        'crops': crop_count,
+        'samples': len(targets),
+        'crop_types': fitted_types,
+        'r2': round(float(regression.score(design, targets)), 3),
+        'residual_std': round(model.residual_std, 4),
+        'output': output_path,
+        'elapsed_seconds': round(time.time() - started, 2)
+    }
+    logger.info(f"Yield model trained: {summary}")
+    return summary
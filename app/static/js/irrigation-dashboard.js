@@ -157,6 +157,11 @@ function createScheduleCard(item) {
                                 सुझाया गया पानी: <span class="font-semibold text-blue-600">${item.water_amount_mm}मिमी</span>
                             </p>
                         ` : ''}
+                        ${item.timing ? `
+                            <p class="text-sm text-gray-600 mt-1">
+                                सबसे अच्छा समय: <span class="font-semibold text-blue-600">${item.timing.recommended_time}</span>
+                            </p>
+                        ` : ''}
                     </div>
                 </div>
                 <div class="ml-4 flex flex-col space-y-2">
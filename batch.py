@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Smart Crop Care Assistant - Batch Jobs Entry Point
+Run scheduled jobs (e.g. from cron) outside the web server.
+
+Examples:
+    python batch.py advisory --state "Uttar Pradesh" --output advisories.csv
+    python batch.py advisory --bbox 26.0,80.0,27.5,82.0 --format parquet --output advisories.parquet
+    python batch.py notification-worker --workers 8
+    python batch.py weather-alerts
+    python batch.py flush-digests
+    python batch.py build-gazetteer --input villages.csv
+    python batch.py regenerate-activities --crop-type wheat
+    python batch.py rebuild-stats --user 42
+    python batch.py train-yield --output app/data/yield_model.json
+"""
+
+import argparse
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+from app import create_app
+
+# Load environment variables from .env file
+load_dotenv()
+
+def parse_bbox(value):
+    """Parse a min_lat,min_lon,max_lat,max_lon bounding box."""
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("bbox must be four comma-separated numbers")
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("bbox must be min_lat,min_lon,max_lat,max_lon")
+    return tuple(parts)
+
+def run_advisory(args):
+    """Write tomorrow's irrigation advisories for all active crops in a region."""
+    from app.services.advisory_batch import AdvisoryBatchService, ADVISORY_WRITERS
+    
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+    writer = ADVISORY_WRITERS[output_format](args.output)
+    
+    try:
+        service = AdvisoryBatchService(chunk_size=args.chunk_size)
+        summary = service.run(
+            writer,
+            state=args.state,
+            bbox=args.bbox,
+            only_irrigate=args.only_irrigate
+        )
+    finally:
+        writer.close()
+    
+    print(f"✅ {summary['rows_written']} advisories written to {args.output} "
+          f"({summary['crops_processed']} crops in {summary['elapsed_seconds']}s, "
+          f"{summary['rows_per_second']} rows/sec)")
+    return 0
+
+def run_notification_worker(args):
+    """Run the outbox delivery worker pool until interrupted."""
+    import time
+    from flask import current_app
+    from app.services.notification_queue import DeliveryWorkerPool
+    
+    pool = DeliveryWorkerPool(
+        current_app._get_current_object(),
+        workers=args.workers,
+        batch_size=args.batch_size
+    )
+    
+    if args.once:
+        delivered = pool.drain()
+        print(f"✅ {delivered} notifications processed")
+        return 0
+    
+    pool.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping notification workers...")
+        pool.stop()
+    return 0
+
+def run_weather_alerts(args):
+    """Evaluate the latest forecast per grid cell and queue alerts for affected farmers."""
+    from app.services.weather_alerts import WeatherAlertService
+    
+    cells = args.cells.split(';') if args.cells else None
+    summary = WeatherAlertService().run(cells=cells)
+    
+    print(f"✅ {summary['alerts_queued']} weather alerts queued "
+          f"({summary['cells_alerted']}/{summary['cells_evaluated']} cells alerted, "
+          f"{summary['duplicates_skipped']} already sent, {summary['elapsed_seconds']}s)")
+    return 0
+
+def run_flush_digests(args):
+    """Merge buffered notices into one digest SMS per user and queue them."""
+    from app.services.digests import DigestService
+    
+    summary = DigestService().flush(force=args.force)
+    
+    print(f"✅ {summary['digests_queued']} digests queued for {summary['users']} users "
+          f"({summary['notices']} notices, {summary['elapsed_seconds']}s)")
+    return 0
+
+def run_build_gazetteer(args):
+    """Rebuild the offline gazetteer files from a places CSV."""
+    from app.services.gazetteer import build_gazetteer_from_csv, GAZETTEER_DIR
+    
+    output = args.output or GAZETTEER_DIR
+    places = build_gazetteer_from_csv(args.input, output)
+    
+    print(f"✅ {places} places indexed into {output}")
+    return 0
+
+def run_regenerate_activities(args):
+    """Create missing template activities for all active crops of a type."""
+    from app.services.activity_templates import ActivityTemplateService
+    
+    summary = ActivityTemplateService().regenerate_for_crop_type(
+        args.crop_type,
+        chunk_size=args.chunk_size,
+        progress_callback=lambda progress: logging.info(
+            f"{progress['crops_processed']} crops processed, {progress['activities_created']} activities created"
+        )
+    )
+    
+    print(f"✅ {summary['activities_created']} activities created for "
+          f"{summary['crops_processed']} {summary['crop_type']} crops in {summary['elapsed_seconds']}s")
+    return 0
+
+def run_rebuild_stats(args):
+    """Recompute dashboard stat counters from the source tables."""
+    from app import db
+    from app.models.user import User
+    from app.services.dashboard_stats import rebuild_user_stats
+    
+    user_ids = args.user or db.session.scalars(db.select(User.id).order_by(User.id)).all()
+    rebuilt = rebuild_user_stats(user_ids)
+    
+    print(f"✅ Dashboard stats rebuilt for {rebuilt} users")
+    return 0
+
+def run_train_yield(args):
+    """Fit the yield estimation model on harvested crops and write it for serving."""
+    from app.services.yield_training import train_yield_model
+    
+    try:
+        summary = train_yield_model(args.output, alpha=args.alpha, min_crops=args.min_crops)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    print(f"✅ Yield model fitted on {summary['crops']} crops ({summary['samples']} samples, "
+          f"R² {summary['r2']}) and written to {summary['output']} in {summary['elapsed_seconds']}s")
+    return 0
+
+def build_parser():
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(description='Smart Crop Care Assistant batch jobs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    advisory = subparsers.add_parser('advisory', help='Export irrigation advisories for a region')
+    advisory.add_argument('--output', required=True, help='Output file path (.csv or .parquet)')
+    advisory.add_argument('--format', choices=['csv', 'parquet'], help='Output format (default: from file extension)')
+    advisory.add_argument('--state', help='Only include farmers from this state')
+    advisory.add_argument('--bbox', type=parse_bbox, help='Farm bounding box: min_lat,min_lon,max_lat,max_lon')
+    advisory.add_argument('--only-irrigate', action='store_true', help='Only export crops that should be irrigated')
+    advisory.add_argument('--chunk-size', type=int, default=500, help='Crops fetched per database round-trip')
+    advisory.set_defaults(handler=run_advisory)
+    
+    worker = subparsers.add_parser('notification-worker', help='Deliver queued SMS notifications')
+    worker.add_argument('--workers', type=int, default=4, help='Number of delivery threads')
+    worker.add_argument('--batch-size', type=int, default=50, help='Rows claimed per worker round-trip')
+    worker.add_argument('--once', action='store_true', help='Deliver everything currently due, then exit')
+    worker.set_defaults(handler=run_notification_worker)
+    
+    alerts = subparsers.add_parser('weather-alerts', help='Queue weather alerts after a forecast refresh')
+    alerts.add_argument('--cells', help='Only evaluate these grid cells, e.g. "28.6500,77.2500;26.8500,80.9500"')
+    alerts.set_defaults(handler=run_weather_alerts)
+    
+    digests = subparsers.add_parser('flush-digests', help='Send buffered notices as one digest SMS per user')
+    digests.add_argument('--force', action='store_true', help='Also flush the current, still open window')
+    digests.set_defaults(handler=run_flush_digests)
+    
+    gazetteer = subparsers.add_parser('build-gazetteer', help='Build the offline place search index')
+    gazetteer.add_argument('--input', required=True,
+                           help='CSV with kind,name_en,name_hi,district,district_hi,state,state_hi,latitude,longitude,population')
+    gazetteer.add_argument('--output', help='Output directory (default: app/data/gazetteer)')
+    gazetteer.set_defaults(handler=run_build_gazetteer)
+    
+    regenerate = subparsers.add_parser('regenerate-activities', help='Create missing template activities for a crop type')
+    regenerate.add_argument('--crop-type', required=True, help='Crop type, e.g. wheat')
+    regenerate.add_argument('--chunk-size', type=int, default=500, help='Crops processed per transaction')
+    regenerate.set_defaults(handler=run_regenerate_activities)
+    
+    stats = subparsers.add_parser('rebuild-stats', help='Recompute dashboard stat counters')
+    stats.add_argument('--user', type=int, action='append', help='Only rebuild this user (repeatable)')
+    stats.set_defaults(handler=run_rebuild_stats)
+    
+    train_yield = subparsers.add_parser('train-yield', help='Fit the yield estimation model on harvested crops')
+    train_yield.add_argument('--output', help='Model file (default: app/data/yield_model.json)')
+    train_yield.add_argument('--alpha', type=float, default=1.0, help='Ridge regularization strength')
+    train_yield.add_argument('--min-crops', type=int, default=20, help='Fewest harvested crops to fit on')
+    train_yield.set_defaults(handler=run_train_yield)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    
+    app = create_app(os.getenv('FLASK_CONFIG') or 'default')
+    with app.app_context():
+        return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Add normalized activity quantity and irrigation daily rollups
+
+Revision ID: 3f9a2c7d81b4
+Revises: 6553b7b6e1e5
+Create Date: 2026-10-19 09:12:41.226114
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Frozen copy of app.models.crop.parse_quantity as of this revision, so the
+# backfill stays the same when units are added to the application later
+QUANTITY_UNITS = {
+    'mm': ('mm', 1.0),
+    'cm': ('mm', 10.0),
+    'kg/acre': ('kg/acre', 1.0),
+    'g/acre': ('kg/acre', 0.001),
+    'kg': ('kg', 1.0),
+    'g': ('kg', 0.001),
+    'l/acre': ('l/acre', 1.0),
+    'ml/acre': ('l/acre', 0.001),
+    'l': ('l', 1.0),
+    'ml': ('l', 0.001),
+}
+
+QUANTITY_PATTERN = re.compile(
+    r'(?P<low>\d+(?:\.\d+)?)\s*(?:-\s*(?P<high>\d+(?:\.\d+)?))?\s*(?P<unit>[a-z]+(?:\s*/\s*acre)?)?',
+    re.IGNORECASE
+)
+
+
+def parse_quantity(quantity):
+    if not quantity:
+        return None, None
+
+    match = QUANTITY_PATTERN.search(quantity)
+    if not match or not match.group('unit'):
+        return None, None
+
+    unit = re.sub(r'\s+', '', match.group('unit').lower())
+    if unit not in QUANTITY_UNITS:
+        return None, None
+
+    value = float(match.group('low'))
+    if match.group('high'):
+        value = (value + float(match.group('high'))) / 2
+
+    normalized_unit, multiplier = QUANTITY_UNITS[unit]
+    return round(value * multiplier, 3), normalized_unit
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a2c7d81b4'
+down_revision = '6553b7b6e1e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_value', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('quantity_unit', sa.String(length=20), nullable=True))
+
+    op.create_table('irrigation_daily_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('farm_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('water_mm', sa.Float(), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('farm_id', 'day', name='uq_irrigation_rollup_farm_day')
+    )
+
+    # Backfill numeric quantities from the free-text quantity column
+    connection = op.get_bind()
+    activities = sa.table('activities',
+        sa.column('id', sa.Integer),
+        sa.column('quantity', sa.String),
+        sa.column('quantity_value', sa.Float),
+        sa.column('quantity_unit', sa.String)
+    )
+
+    updates = []
+    for activity_id, quantity in connection.execute(
+        sa.select(activities.c.id, activities.c.quantity).where(activities.c.quantity.isnot(None))
+    ):
+        value, unit = parse_quantity(quantity)
+        if value is not None:
+            updates.append({'activity_id': activity_id, 'value': value, 'unit': unit})
+
+    if updates:
+        connection.execute(
+            activities.update()
+            .where(activities.c.id == sa.bindparam('activity_id'))
+            .values(quantity_value=sa.bindparam('value'), quantity_unit=sa.bindparam('unit')),
+            updates
+        )
+
+    # Build daily rollups from completed irrigation history
+    op.execute("""
+        INSERT INTO irrigation_daily_rollups (farm_id, day, water_mm, events)
+        SELECT crops.farm_id,
+               activities.completed_date,
+               COALESCE(SUM(CASE WHEN activities.quantity_unit = 'mm' THEN activities.quantity_value ELSE 0 END), 0),
+               COUNT(activities.id)
+        FROM activities
+        JOIN crops ON crops.id = activities.crop_id
+        WHERE activities.activity_type = 'irrigation'
+          AND activities.status = 'completed'
+          AND activities.completed_date IS NOT NULL
+        GROUP BY crops.farm_id, activities.completed_date
+    """)
+
+
+def downgrade():
+    op.drop_table('irrigation_daily_rollups')
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_column('quantity_unit')
+        batch_op.drop_column('quantity_value')
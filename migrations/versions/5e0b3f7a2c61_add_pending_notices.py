@@ -0,0 +1,43 @@
+"""Add pending notices for digest SMS
+
+Revision ID: 5e0b3f7a2c61
+Revises: d4e7a1c96b28
+Create Date: 2026-10-19 16:58:41.207735
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b3f7a2c61'
+down_revision = 'd4e7a1c96b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_notices',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notice_type', sa.String(length=30), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('dedupe_key', sa.String(length=128), nullable=True),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('digest_key', sa.String(length=128), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedupe_key')
+    )
+    with op.batch_alter_table('pending_notices', schema=None) as batch_op:
+        batch_op.create_index('ix_pending_notices_digest_window', ['digest_key', 'window_start'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pending_notices_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('pending_notices', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pending_notices_user_id'))
+        batch_op.drop_index('ix_pending_notices_digest_window')
+
+    op.drop_table('pending_notices')
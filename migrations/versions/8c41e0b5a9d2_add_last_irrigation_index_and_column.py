@@ -0,0 +1,47 @@
+"""Add last irrigation composite index and denormalized crop column
+
+Revision ID: 8c41e0b5a9d2
+Revises: 3f9a2c7d81b4
+Create Date: 2026-10-19 11:03:27.518902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e0b5a9d2'
+down_revision = '3f9a2c7d81b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_activities_crop_type_status_completed',
+            ['crop_id', 'activity_type', 'status', 'completed_date'],
+            unique=False
+        )
+
+    with op.batch_alter_table('crops', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_irrigated_on', sa.Date(), nullable=True))
+
+    # Backfill from completed irrigation history (served by the new index)
+    op.execute("""
+        UPDATE crops SET last_irrigated_on = (
+            SELECT MAX(activities.completed_date)
+            FROM activities
+            WHERE activities.crop_id = crops.id
+              AND activities.activity_type = 'irrigation'
+              AND activities.status = 'completed'
+        )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('crops', schema=None) as batch_op:
+        batch_op.drop_column('last_irrigated_on')
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_crop_type_status_completed')
@@ -0,0 +1,65 @@
+"""Add geohash spatial index to farms
+
+Revision ID: 9a6c2e4f1d37
+Revises: 5e0b3f7a2c61
+Create Date: 2026-10-19 18:21:14.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6c2e4f1d37'
+down_revision = '5e0b3f7a2c61'
+branch_labels = None
+depends_on = None
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def geohash_encode(latitude, longitude):
+    ranges = [[-180.0, 180.0], [-90.0, 90.0]]  # Bits alternate longitude, latitude
+    values = [float(longitude), float(latitude)]
+    chars = []
+    bits = 0
+
+    for bit_index in range(GEOHASH_PRECISION * 5):
+        target = ranges[bit_index % 2]
+        middle = (target[0] + target[1]) / 2
+        if values[bit_index % 2] >= middle:
+            bits = (bits << 1) | 1
+            target[0] = middle
+        else:
+            bits <<= 1
+            target[1] = middle
+        if bit_index % 5 == 4:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+
+    return ''.join(chars)
+
+
+def upgrade():
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index(batch_op.f('ix_farms_geohash'), ['geohash'], unique=False)
+
+    connection = op.get_bind()
+    farms = connection.execute(sa.text(
+        "SELECT id, latitude, longitude FROM farms WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+
+    updates = [
+        {'id': farm_id, 'geohash': geohash_encode(latitude, longitude)}
+        for farm_id, latitude, longitude in farms
+    ]
+    if updates:
+        connection.execute(sa.text("UPDATE farms SET geohash = :geohash WHERE id = :id"), updates)
+
+
+def downgrade():
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_farms_geohash'))
+        batch_op.drop_column('geohash')
@@ -0,0 +1,122 @@
+"""Add per-user dashboard stat counters
+
+Revision ID: a7d3c9e5b210
+Revises: f2a6d8b1c094
+Create Date: 2026-10-19 23:05:14.518203
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c9e5b210'
+down_revision = 'f2a6d8b1c094'
+branch_labels = None
+depends_on = None
+
+UNDATED = date(1970, 1, 1)
+
+
+def upgrade():
+    op.create_table('user_stat_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('metric', sa.String(length=20), nullable=False),
+        sa.Column('key', sa.String(length=50), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'metric', 'key', 'day', name='uq_user_stat_counters')
+    )
+
+    counters = sa.table('user_stat_counters',
+        sa.column('user_id', sa.Integer),
+        sa.column('metric', sa.String),
+        sa.column('key', sa.String),
+        sa.column('day', sa.Date),
+        sa.column('count', sa.Integer),
+        sa.column('total', sa.Float)
+    )
+    farms = sa.table('farms', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer))
+    crops = sa.table('crops',
+        sa.column('id', sa.Integer),
+        sa.column('farm_id', sa.Integer),
+        sa.column('crop_type', sa.String),
+        sa.column('status', sa.String),
+        sa.column('area_acres', sa.Numeric)
+    )
+    activities = sa.table('activities',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('activity_type', sa.String),
+        sa.column('status', sa.String),
+        sa.column('scheduled_date', sa.Date),
+        sa.column('completed_date', sa.Date)
+    )
+    detections = sa.table('disease_detections',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('is_healthy', sa.Boolean)
+    )
+
+    undated = sa.literal(UNDATED, sa.Date)
+    columns = ['user_id', 'metric', 'key', 'day', 'count', 'total']
+
+    def backfill(select):
+        op.execute(counters.insert().from_select(columns, select))
+
+    backfill(
+        sa.select(farms.c.user_id, sa.literal('farms'), sa.literal(''), undated,
+                  sa.func.count(farms.c.id), sa.literal(0.0))
+        .group_by(farms.c.user_id)
+    )
+    backfill(
+        sa.select(farms.c.user_id, sa.literal('active_crops'), crops.c.crop_type, undated,
+                  sa.func.count(crops.c.id), sa.func.coalesce(sa.func.sum(crops.c.area_acres), 0))
+        .select_from(crops.join(farms, farms.c.id == crops.c.farm_id))
+        .where(crops.c.status == 'active')
+        .group_by(farms.c.user_id, crops.c.crop_type)
+    )
+
+    owned = activities.c.user_id.isnot(None)
+    backfill(
+        sa.select(activities.c.user_id, sa.literal('activities'), sa.func.coalesce(activities.c.status, ''), undated,
+                  sa.func.count(activities.c.id), sa.literal(0.0))
+        .where(owned)
+        .group_by(activities.c.user_id, activities.c.status)
+    )
+    backfill(
+        sa.select(activities.c.user_id, sa.literal('scheduled'), activities.c.activity_type, activities.c.scheduled_date,
+                  sa.func.count(activities.c.id), sa.literal(0.0))
+        .where(owned, activities.c.scheduled_date.isnot(None))
+        .group_by(activities.c.user_id, activities.c.activity_type, activities.c.scheduled_date)
+    )
+    backfill(
+        sa.select(activities.c.user_id, sa.literal('pending'), activities.c.activity_type, activities.c.scheduled_date,
+                  sa.func.count(activities.c.id), sa.literal(0.0))
+        .where(owned, activities.c.status == 'pending', activities.c.scheduled_date.isnot(None))
+        .group_by(activities.c.user_id, activities.c.activity_type, activities.c.scheduled_date)
+    )
+    backfill(
+        sa.select(activities.c.user_id, sa.literal('completed'), activities.c.activity_type, activities.c.completed_date,
+                  sa.func.count(activities.c.id), sa.literal(0.0))
+        .where(owned, activities.c.status == 'completed', activities.c.completed_date.isnot(None))
+        .group_by(activities.c.user_id, activities.c.activity_type, activities.c.completed_date)
+    )
+
+    health = sa.case((detections.c.is_healthy == sa.true(), 'healthy'), else_='diseased')
+    backfill(
+        sa.select(detections.c.user_id, sa.literal('detections'), health, undated,
+                  sa.func.count(detections.c.id), sa.literal(0.0))
+        .where(detections.c.user_id.isnot(None))
+        .group_by(detections.c.user_id, health)
+    )
+
+
+def downgrade():
+    op.drop_table('user_stat_counters')
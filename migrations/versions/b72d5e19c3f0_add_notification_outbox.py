@@ -0,0 +1,56 @@
+"""Add notification outbox
+
+Revision ID: b72d5e19c3f0
+Revises: 8c41e0b5a9d2
+Create Date: 2026-10-19 13:47:05.904411
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b72d5e19c3f0'
+down_revision = '8c41e0b5a9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=128), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('recipient', sa.String(length=20), nullable=False),
+        sa.Column('provider', sa.String(length=20), nullable=False),
+        sa.Column('notification_type', sa.String(length=30), nullable=True),
+        sa.Column('language', sa.String(length=10), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=64), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('provider_message_id', sa.String(length=64), nullable=True),
+        sa.Column('delivery_status', sa.String(length=20), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key')
+    )
+    with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_outbox_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notification_outbox_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_notification_outbox_provider_message_id'), ['provider_message_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_outbox', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_provider_message_id'))
+        batch_op.drop_index(batch_op.f('ix_notification_outbox_user_id'))
+        batch_op.drop_index('ix_notification_outbox_status_next_attempt')
+
+    op.drop_table('notification_outbox')
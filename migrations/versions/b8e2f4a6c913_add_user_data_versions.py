@@ -0,0 +1,29 @@
+"""Add per-user chart data versions
+
+Revision ID: b8e2f4a6c913
+Revises: a7d3c9e5b210
+Create Date: 2026-10-20 10:12:41.307516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f4a6c913'
+down_revision = 'a7d3c9e5b210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_data_versions',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_data_versions')
@@ -0,0 +1,45 @@
+"""Add composite indexes for user-scoped activity and detection joins
+
+Revision ID: c5f19a3e7d42
+Revises: e3b8d05f6a19
+Create Date: 2026-10-19 21:04:13.527811
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f19a3e7d42'
+down_revision = 'e3b8d05f6a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_farms_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('crops', schema=None) as batch_op:
+        batch_op.create_index('ix_crops_farm_id_status', ['farm_id', 'status'], unique=False)
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index('ix_activities_crop_id_status_scheduled_date', ['crop_id', 'status', 'scheduled_date'], unique=False)
+        batch_op.create_index('ix_activities_crop_id_scheduled_date', ['crop_id', 'scheduled_date'], unique=False)
+
+    with op.batch_alter_table('disease_detections', schema=None) as batch_op:
+        batch_op.create_index('ix_disease_detections_crop_id_detected_at', ['crop_id', 'detected_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('disease_detections', schema=None) as batch_op:
+        batch_op.drop_index('ix_disease_detections_crop_id_detected_at')
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_crop_id_scheduled_date')
+        batch_op.drop_index('ix_activities_crop_id_status_scheduled_date')
+
+    with op.batch_alter_table('crops', schema=None) as batch_op:
+        batch_op.drop_index('ix_crops_farm_id_status')
+
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_farms_user_id'))
@@ -0,0 +1,34 @@
+"""Use byte collation for the farm geohash
+
+Revision ID: d1c7e3a9f052
+Revises: b8e2f4a6c913
+Create Date: 2026-10-20 14:03:18.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1c7e3a9f052'
+down_revision = 'b8e2f4a6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Geohash cell lookups are range scans; the index must sort by bytes for
+    # every value in [cell, next cell) to be contiguous. SQLite already does.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('farms', 'geohash',
+            existing_type=sa.String(length=12),
+            type_=sa.String(length=12, collation='C'),
+            existing_nullable=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('farms', 'geohash',
+            existing_type=sa.String(length=12, collation='C'),
+            type_=sa.String(length=12),
+            existing_nullable=True)
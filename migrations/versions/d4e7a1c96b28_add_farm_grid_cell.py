@@ -0,0 +1,50 @@
+"""Add weather grid cell key to farms
+
+Revision ID: d4e7a1c96b28
+Revises: b72d5e19c3f0
+Create Date: 2026-10-19 15:42:08.316027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7a1c96b28'
+down_revision = 'b72d5e19c3f0'
+branch_labels = None
+depends_on = None
+
+# Must match WEATHER_GRID_RESOLUTION; farms are re-keyed on save if it changes
+GRID_RESOLUTION = 0.1
+
+
+def grid_cell_key(latitude, longitude):
+    def snap(value):
+        return round((int(float(value) // GRID_RESOLUTION) + 0.5) * GRID_RESOLUTION, 4)
+
+    return f"{snap(latitude):.4f},{snap(longitude):.4f}"
+
+
+def upgrade():
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('grid_cell', sa.String(length=24), nullable=True))
+        batch_op.create_index(batch_op.f('ix_farms_grid_cell'), ['grid_cell'], unique=False)
+
+    connection = op.get_bind()
+    farms = connection.execute(sa.text(
+        "SELECT id, latitude, longitude FROM farms WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+
+    updates = [
+        {'id': farm_id, 'grid_cell': grid_cell_key(latitude, longitude)}
+        for farm_id, latitude, longitude in farms
+    ]
+    if updates:
+        connection.execute(sa.text("UPDATE farms SET grid_cell = :grid_cell WHERE id = :id"), updates)
+
+
+def downgrade():
+    with op.batch_alter_table('farms', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_farms_grid_cell'))
+        batch_op.drop_column('grid_cell')
@@ -0,0 +1,28 @@
+"""Add template key with unique constraint to activities
+
+Revision ID: e3b8d05f6a19
+Revises: 9a6c2e4f1d37
+Create Date: 2026-10-19 19:36:52.118470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b8d05f6a19'
+down_revision = '9a6c2e4f1d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_activities_crop_template', ['crop_id', 'template_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_activities_crop_template', type_='unique')
+        batch_op.drop_column('template_key')
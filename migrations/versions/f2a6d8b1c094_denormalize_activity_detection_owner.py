@@ -0,0 +1,59 @@
+"""Denormalize farm_id and user_id onto activities and disease detections
+
+Revision ID: f2a6d8b1c094
+Revises: c5f19a3e7d42
+Create Date: 2026-10-19 21:48:37.902415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8b1c094'
+down_revision = 'c5f19a3e7d42'
+branch_labels = None
+depends_on = None
+
+TABLES = ('activities', 'disease_detections')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('farm_id', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_farm_id_farms', 'farms', ['farm_id'], ['id'])
+            batch_op.create_foreign_key(f'fk_{table}_user_id_users', 'users', ['user_id'], ['id'])
+
+    # Correlated subqueries work on both SQLite and PostgreSQL
+    for table in TABLES:
+        op.execute(
+            f"UPDATE {table} SET "
+            f"farm_id = (SELECT crops.farm_id FROM crops WHERE crops.id = {table}.crop_id), "
+            f"user_id = (SELECT farms.user_id FROM crops JOIN farms ON farms.id = crops.farm_id "
+            f"WHERE crops.id = {table}.crop_id)"
+        )
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index('ix_activities_user_status_scheduled_date', ['user_id', 'status', 'scheduled_date'], unique=False)
+        batch_op.create_index('ix_activities_user_scheduled_date', ['user_id', 'scheduled_date'], unique=False)
+
+    with op.batch_alter_table('disease_detections', schema=None) as batch_op:
+        batch_op.create_index('ix_disease_detections_user_detected_at', ['user_id', 'detected_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('disease_detections', schema=None) as batch_op:
+        batch_op.drop_index('ix_disease_detections_user_detected_at')
+
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_user_scheduled_date')
+        batch_op.drop_index('ix_activities_user_status_scheduled_date')
+
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_user_id_users', type_='foreignkey')
+            batch_op.drop_constraint(f'fk_{table}_farm_id_farms', type_='foreignkey')
+            batch_op.drop_column('user_id')
+            batch_op.drop_column('farm_id')
@@ -129,6 +129,19 @@ class TestFarmModel:
             
             assert not farm_no_location.is_location_set()
             assert farm_no_location.get_location() is None
+            assert farm_no_location.grid_cell is None
+    
+    def test_farm_grid_cell_follows_location(self, app, test_farm):
+        """Test the weather grid cell key is kept in sync with the location."""
+        with app.app_context():
+            farm = db.session.get(Farm, test_farm)
+            assert farm.grid_cell == '28.6500,77.2500'
+            
+            farm.latitude = 26.8467
+            farm.longitude = 80.9462
+            db.session.commit()
+            
+            assert farm.grid_cell == '26.8500,80.9500'
     
     def test_farm_area_calculations(self, app, test_farm):
         """Test farm area calculations."""
@@ -319,6 +332,123 @@ class TestActivityModel:
             assert activity.status == 'completed'
             assert activity.completed_date == date.today()
             assert activity.notes == 'Irrigation completed successfully'
+    
+    def test_irrigation_completion_updates_crop(self, app, test_crop):
+        """Test completing an irrigation records the crop's last irrigation date."""
+        with app.app_context():
+            crop = db.session.get(Crop, test_crop)
+            assert crop.last_irrigated_on is None
+            
+            activity = Activity(
+                crop_id=test_crop,  # test_crop is now an ID
+                activity_type='irrigation',
+                quantity='30mm',
+                scheduled_date=date.today()
+            )
+            db.session.add(activity)
+            db.session.commit()
+            activity.mark_completed()
+            
+            assert crop.last_irrigated_on == date.today()
+            assert crop.to_dict()['last_irrigated_on'] == date.today().isoformat()
+    
+    def test_completing_twice_records_irrigation_once(self, app, test_crop):
+        """Test completing an already completed irrigation does not count it again."""
+        with app.app_context():
+            from app.models.crop import IrrigationDailyRollup
+            
+            activity = Activity(
+                crop_id=test_crop,  # test_crop is now an ID
+                activity_type='irrigation',
+                quantity='25mm',
+                scheduled_date=date.today()
+            )
+            db.session.add(activity)
+            db.session.commit()
+            
+            activity.mark_completed()
+            activity.mark_completed('Checked again')
+            
+            rollup = IrrigationDailyRollup.query.one()
+            assert rollup.events == 1
+            assert rollup.water_mm == 25.0
+            assert activity.notes == 'Checked again'
+    
+    def test_irrigations_on_one_day_share_a_rollup(self, app, test_crop):
+        """Test irrigations completed on the same farm and day add up in one rollup row."""
+        with app.app_context():
+            from app.models.crop import IrrigationDailyRollup
+            
+            activities = [
+                Activity(crop_id=test_crop, activity_type='irrigation', quantity=quantity, scheduled_date=date.today())
+                for quantity in ('25mm', '2cm', None)
+            ]
+            db.session.add_all(activities)
+            db.session.commit()
+            for activity in activities:
+                activity.mark_completed()
+            
+            rollup = IrrigationDailyRollup.query.one()
+            assert rollup.events == 3
+            assert rollup.water_mm == 45.0
+    
+    def test_activity_quantity_normalization(self, app, test_crop):
+        """Test numeric quantity columns are derived from quantity text."""
+        with app.app_context():
+            activity = Activity(
+                crop_id=test_crop,  # test_crop is now an ID
+                activity_type='irrigation',
+                quantity='2-3cm depth',
+                scheduled_date=date.today()
+            )
+            
+            assert activity.quantity_value == 25.0
+            assert activity.quantity_unit == 'mm'
+            
+            activity.quantity = '50kg/acre'
+            assert activity.quantity_value == 50.0
+            assert activity.quantity_unit == 'kg/acre'
+            
+            activity.quantity = 'as needed'
+            assert activity.quantity_value is None
+            assert activity.quantity_unit is None
+    
+    def test_bulk_insert_counts_only_rows_not_skipped(self, app, test_crop):
+        """Test rows skipped on a unique conflict are not counted as inserted."""
+        with app.app_context():
+            row = {'crop_id': test_crop, 'activity_type': 'irrigation', 'scheduled_date': date.today(),
+                   'template_key': 'irrigation:0'}
+            assert Activity.bulk_insert([row], ignore_conflicts=True) == 1
+            db.session.commit()
+            
+            second = dict(row, template_key='irrigation:1')
+            assert Activity.bulk_insert([dict(row), second], ignore_conflicts=True) == 1
+            db.session.commit()
+            assert Activity.query.filter_by(crop_id=test_crop).count() == 2
+    
+    def test_owner_ids_follow_crop(self, app, test_user, test_crop):
+        """Test denormalized farm_id and user_id are set on insert and follow crop moves."""
+        with app.app_context():
+            crop = db.session.get(Crop, test_crop)
+            activity = Activity(crop_id=crop.id, activity_type='weeding', scheduled_date=date.today())
+            detection = DiseaseDetection(crop_id=crop.id, image_path='leaf.jpg', is_healthy=True)
+            db.session.add_all([activity, detection])
+            Activity.bulk_insert([{'crop_id': crop.id, 'activity_type': 'fertilizer', 'scheduled_date': date.today()}])
+            db.session.commit()
+            
+            assert (activity.farm_id, activity.user_id) == (crop.farm_id, test_user)
+            assert (detection.farm_id, detection.user_id) == (crop.farm_id, test_user)
+            bulk_activity = Activity.query.filter_by(crop_id=crop.id, activity_type='fertilizer').one()
+            assert (bulk_activity.farm_id, bulk_activity.user_id) == (crop.farm_id, test_user)
+            
+            other_farm = Farm(user_id=test_user, farm_name='Second Farm', area_acres=3.0)
+            db.session.add(other_farm)
+            db.session.commit()
+            crop.farm_id = other_farm.id
+            db.session.commit()
+            
+            assert {a.farm_id for a in Activity.query.filter_by(crop_id=crop.id)} == {other_farm.id}
+            assert db.session.get(DiseaseDetection, detection.id).farm_id == other_farm.id
 
 class TestDiseaseDetectionModel:
     """Test DiseaseDetection model functionality."""
@@ -0,0 +1,134 @@
+"""
+Query plan regression tests for the hot user-scoped joins
+
+Each hot query is explained on SQLite (and on PostgreSQL when
+TEST_POSTGRES_URL is set); a full table scan of a hot table fails the test.
+"""
+
+import pytest
+import json
+import os
+from datetime import date, timedelta
+from sqlalchemy import select, func, create_engine, text
+from app.models.farm import Farm
+from app.models.crop import Crop, Activity, DiseaseDetection
+from app import db
+
+USER_ID = 1
+FARM_ID = 1
+CROP_ID = 1
+TODAY = date(2024, 6, 1)
+
+HOT_TABLES = {'farms', 'crops', 'activities', 'disease_detections'}
+
+# Mirrors the queries issued by the dashboard, crop, chart and disease history routes
+HOT_QUERIES = {
+    'user_farms': lambda: select(Farm).where(Farm.user_id == USER_ID),
+    'active_crops': lambda: select(Crop).where(Crop.farm_id == FARM_ID, Crop.status == 'active'),
+    'todays_activities': lambda: select(Activity).where(
+        Activity.user_id == USER_ID, Activity.scheduled_date == TODAY, Activity.status == 'pending'
+    ),
+    'overdue_activities': lambda: select(Activity).where(
+        Activity.user_id == USER_ID, Activity.scheduled_date < TODAY, Activity.status == 'pending'
+    ),
+    'activity_status_counts': lambda: select(Activity.status, func.count(Activity.id))
+        .where(Activity.user_id == USER_ID).group_by(Activity.status),
+    'recent_activities_by_type': lambda: select(Activity.activity_type, func.count(Activity.id))
+        .where(Activity.user_id == USER_ID, Activity.scheduled_date >= TODAY - timedelta(days=180))
+        .group_by(Activity.activity_type),
+    'crop_activities_page': lambda: select(Activity).where(Activity.crop_id == CROP_ID)
+        .order_by(Activity.scheduled_date.desc()).limit(10),
+    'activity_timeline': lambda: select(Activity).where(
+        Activity.crop_id == CROP_ID, Activity.scheduled_date >= TODAY - timedelta(days=90)
+    ).order_by(Activity.scheduled_date),
+    'crop_distribution': lambda: select(Crop.crop_type, func.count(Crop.id), func.sum(Crop.area_acres))
+        .join(Farm, Farm.id == Crop.farm_id)
+        .where(Farm.user_id == USER_ID, Crop.status == 'active').group_by(Crop.crop_type),
+    'disease_history': lambda: select(DiseaseDetection).where(DiseaseDetection.user_id == USER_ID)
+        .order_by(DiseaseDetection.detected_at.desc()),
+    'healthy_detection_count': lambda: select(func.count(DiseaseDetection.id)).where(
+        DiseaseDetection.user_id == USER_ID, DiseaseDetection.is_healthy.is_(True)
+    ),
+}
+
+# User-scoped queries served by the denormalized user_id without joins
+SINGLE_TABLE_QUERIES = [
+    'todays_activities', 'overdue_activities', 'activity_status_counts',
+    'recent_activities_by_type', 'disease_history', 'healthy_detection_count'
+]
+
+def compile_for(statement, connection):
+    """Compile a statement to driver SQL and parameters for a raw EXPLAIN."""
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+def sqlite_full_scans(connection, statement):
+    """Get the EXPLAIN QUERY PLAN lines that scan a hot table."""
+    sql, params = compile_for(statement, connection)
+    plan = [row[3] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params)]
+    scans = [line for line in plan if line.startswith('SCAN ') and line.split()[1] in HOT_TABLES]
+    return scans, plan
+
+def postgres_full_scans(connection, statement):
+    """Get the hot tables read by a Seq Scan node in the EXPLAIN plan."""
+    sql, params = compile_for(statement, connection)
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in HOT_TABLES:
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans, plan
+
+class TestSQLiteQueryPlans:
+    """Test hot queries use indexes on SQLite."""
+    
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_hot_query_uses_indexes(self, app, name):
+        """Test the query plan has no full scan of a hot table."""
+        with app.app_context():
+            scans, plan = sqlite_full_scans(db.session.connection(), HOT_QUERIES[name]())
+            assert not scans, f"{name} regressed to a full scan:\n" + '\n'.join(plan)
+    
+    @pytest.mark.parametrize('name', SINGLE_TABLE_QUERIES)
+    def test_user_scoped_query_is_single_index_search(self, app, name):
+        """Test user-scoped activity and detection queries read one index range."""
+        with app.app_context():
+            _, plan = sqlite_full_scans(db.session.connection(), HOT_QUERIES[name]())
+            searches = [line for line in plan if line.startswith('SEARCH ')]
+            assert len(searches) == 1, f"{name} is not a single index search:\n" + '\n'.join(plan)
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason='TEST_POSTGRES_URL not set')
+class TestPostgresQueryPlans:
+    """Test hot queries use indexes on PostgreSQL."""
+    
+    @pytest.fixture(scope='class')
+    def pg_connection(self):
+        """Create the schema in a throwaway PostgreSQL schema."""
+        engine = create_engine(os.environ['TEST_POSTGRES_URL'])
+        with engine.connect() as connection:
+            connection.execute(text('DROP SCHEMA IF EXISTS query_plans CASCADE'))
+            connection.execute(text('CREATE SCHEMA query_plans'))
+            connection.execute(text('SET search_path TO query_plans'))
+            db.metadata.create_all(connection)
+            # Tables are empty, so only forbid sequential scans where an index could be used
+            connection.execute(text('SET enable_seqscan = off'))
+            yield connection
+            connection.rollback()
+            connection.execute(text('DROP SCHEMA IF EXISTS query_plans CASCADE'))
+            connection.commit()
+        engine.dispose()
+    
+    @pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+    def test_hot_query_uses_indexes(self, pg_connection, name):
+        """Test the query plan has no sequential scan of a hot table."""
+        scans, plan = postgres_full_scans(pg_connection, HOT_QUERIES[name]())
+        assert not scans, f"{name} regressed to a sequential scan of {scans}:\n{json.dumps(plan, indent=2)}"
@@ -143,6 +143,20 @@ class TestFarmRoutes:
             farm = Farm.query.filter_by(farm_name='New Test Farm').first()
             assert farm is not None
             assert float(farm.area_acres) == 15.5
+    
+    def test_location_suggestions_from_gazetteer(self, client, app, test_user):
+        """Test location suggestions match Hindi and transliterated input."""
+        with app.app_context():
+            self.login_user(client)
+            
+            for query in ['लखनऊ', 'Lucknow', 'lakhnau']:
+                response = client.get('/farms/api/location-suggestions', query_string={'q': query})
+                suggestions = json.loads(response.data)
+                assert suggestions[0]['name_en'].startswith('Lucknow')
+                assert suggestions[0]['name'].startswith('लखनऊ')
+            
+            response = client.get('/farms/api/location-suggestions', query_string={'lat': 26.85, 'lon': 80.95})
+            assert json.loads(response.data)[0]['name_en'].startswith('Lucknow')
 
 class TestCropRoutes:
     """Test crop management routes."""
@@ -186,6 +200,38 @@ class TestCropRoutes:
             crop = Crop.query.filter_by(crop_type='rice', variety='Basmati Gold').first()
             assert crop is not None
             assert float(crop.area_acres) == 3.5
+    
+    def test_bulk_activities_form_and_csv(self, client, app, test_user, test_crop):
+        """Test bulk activity creation from selected crops and from a CSV upload."""
+        with app.app_context():
+            from app.models.crop import Activity
+            
+            self.login_user(client)
+            before = Activity.query.filter_by(crop_id=test_crop).count()
+            
+            response = client.post('/crops/bulk-activities', data={
+                'crop_ids': [str(test_crop), '999999'],
+                'activity_type': 'weeding',
+                'description': 'Weed removal',
+                'scheduled_date': '2030-01-15'
+            })
+            assert response.status_code == 302
+            assert Activity.query.filter_by(crop_id=test_crop).count() == before + 1
+            
+            csv_data = (
+                'crop_id,activity_type,scheduled_date,description,quantity\n'
+                f'{test_crop},fertilizer,2030-01-20,Urea top dressing,50kg/acre\n'
+                f'{test_crop},unknown,2030-01-21,,\n'
+                '999999,irrigation,2030-01-22,,\n'
+            ).encode('utf-8')
+            response = client.post('/crops/bulk-activities', data={
+                'activities_csv': (io.BytesIO(csv_data), 'activities.csv')
+            }, content_type='multipart/form-data')
+            assert response.status_code == 302
+            
+            activities = Activity.query.filter_by(crop_id=test_crop, activity_type='fertilizer').all()
+            assert [activity.quantity for activity in activities] == ['50kg/acre']
+            assert Activity.query.filter_by(crop_id=test_crop).count() == before + 2
 
 class TestAIRoutes:
     """Test AI/ML routes."""
@@ -224,10 +270,37 @@ class TestAIRoutes:
             'crop_id': '1'
         }
         
-        response = client.post('/ai/detect-disease', 
+        response = client.post('/ai/detect-disease',
                              data=data,
                              content_type='multipart/form-data')
         assert response.status_code == 302  # Redirect to login
+    
+    def test_disease_history_is_cursor_paginated(self, client, app, test_user, test_crop):
+        """Test disease history pages follow cursors in both views."""
+        with app.app_context():
+            from datetime import datetime, timedelta
+            from app.models.crop import DiseaseDetection
+            
+            for index in range(25):
+                db.session.add(DiseaseDetection(
+                    crop_id=test_crop, image_path=f'leaf_{index}.jpg', is_healthy=True,
+                    detected_at=datetime(2024, 6, 1) + timedelta(hours=index)
+                ))
+            db.session.commit()
+            
+            self.login_user(client)
+            
+            first = json.loads(client.get('/ai/api/disease-history?limit=20').data)
+            assert len(first['items']) == 20
+            assert first['items'][0]['image_path'] == 'leaf_24.jpg'
+            
+            second = json.loads(client.get(f"/ai/api/disease-history?limit=20&cursor={first['next_cursor']}").data)
+            assert [item['image_path'] for item in second['items']] == [f'leaf_{i}.jpg' for i in range(4, -1, -1)]
+            assert second['next_cursor'] is None
+            
+            response = client.get(f"/ai/disease-history?cursor={first['next_cursor']}")
+            assert response.status_code == 200
+            assert client.get('/ai/disease-history?cursor=garbage').status_code == 400
 
 class TestAPIEndpoints:
     """Test API endpoints."""
@@ -261,6 +334,88 @@ class TestAPIEndpoints:
             except json.JSONDecodeError:
                 # If not JSON, check if it's a redirect or error
                 assert response.status_code in [200, 302, 500]
+    
+    def test_schedule_all_urgent_sends_one_digest_right_away(self, client, app, test_user, test_crop):
+        """Test bulk irrigation scheduling sends its notices as one digest without waiting for the window."""
+        with app.app_context():
+            from app.models.crop import Activity
+            from app.models.notification import NotificationOutbox, PendingNotice
+            
+            app.config['NOTIFICATION_DIGEST_WINDOW_MINUTES'] = 1440
+            self.login_user(client)
+            
+            response = client.post('/irrigation/api/schedule-all-urgent')
+            
+            data = json.loads(response.data)
+            assert data['success']
+            assert data['scheduled_count'] == Activity.query.filter_by(crop_id=test_crop).count()
+            assert PendingNotice.query.filter_by(user_id=test_user).count() == data['scheduled_count']
+            assert PendingNotice.query.filter(PendingNotice.digest_key.is_(None)).count() == 0
+            
+            if data['scheduled_count']:
+                entries = NotificationOutbox.query.filter_by(user_id=test_user).all()
+                assert len(entries) == 1
+                assert entries[0].notification_type == 'digest'
+                assert entries[0].status == 'sent'
+    
+    def test_chart_responses_are_cached_with_etags(self, client, app, test_user, test_crop):
+        """Test chart polls revalidate with 304 until the crop's activities change."""
+        with app.app_context():
+            from datetime import date
+            from app.models.crop import Activity
+            from app.services.response_cache import _response_cache, user_data_version
+            
+            app.config['CHART_CACHE_TTL_SECONDS'] = 60
+            _response_cache.clear()
+            self.login_user(client)
+            url = f'/api/charts/activity-timeline/{test_crop}'
+            
+            response = client.get(url)
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+            
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+            
+            version = user_data_version(test_user)
+            db.session.add(Activity(crop_id=test_crop, activity_type='weeding', scheduled_date=date.today()))
+            db.session.commit()
+            # Stored in the database, so every process sees the new version
+            assert user_data_version(test_user) == version + 1
+            
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['ETag'] != etag
+            _response_cache.clear()
+    
+    def test_crop_growth_batch_matches_single_crop_timelines(self, client, app, test_user, test_crop):
+        """Test the batch growth endpoint serves every active crop's timeline at once."""
+        with app.app_context():
+            self.login_user(client)
+            
+            single = json.loads(client.get(f'/api/charts/crop-growth/{test_crop}').data)
+            assert single['days_planted'] == 30
+            assert [stage['current'] for stage in single['stages']].count(True) == 1
+            
+            batch = json.loads(client.get('/api/charts/crop-growth').data)
+            assert batch['count'] == 1
+            assert batch['crops'][0]['crop_id'] == test_crop
+            assert batch['crops'][0]['stages'] == single['stages']
+    
+    def test_yield_prediction_batch_matches_single_crop(self, client, app, test_user, test_crop):
+        """Test the batch yield endpoint serves the same estimate as the per-crop chart."""
+        with app.app_context():
+            self.login_user(client)
+            
+            single = json.loads(client.get(f'/api/charts/yield-prediction/{test_crop}').data)
+            assert single['source'] in ('model', 'baseline')
+            assert len(single['monthly_projection']['data']) == 6
+            
+            batch = json.loads(client.get('/api/charts/yield-prediction').data)
+            assert batch['count'] == 1
+            assert batch['crops'][0]['crop_id'] == test_crop
+            assert batch['crops'][0]['predictions'] == single['predictions']
 
 class TestErrorHandling:
     """Test error handling."""
@@ -156,6 +156,254 @@ class TestIrrigationService:
             if schedule:  # If there are crops to irrigate
                 assert 'crop_id' in schedule[0]
                 assert 'action' in schedule[0]
+    
+    def test_water_efficiency_report_windows(self, app, test_crop):
+        """Test water efficiency report aggregates completed irrigations."""
+        with app.app_context():
+            from app.models.crop import Activity
+            
+            crop = db.session.get(Crop, test_crop)
+            for quantity in ['25.5mm', '2-3cm depth']:
+                activity = Activity(
+                    crop_id=crop.id,
+                    activity_type='irrigation',
+                    quantity=quantity,
+                    scheduled_date=date.today()
+                )
+                db.session.add(activity)
+                db.session.commit()
+                activity.mark_completed()
+            
+            irrigation_service = IrrigationService()
+            report = irrigation_service.calculate_water_efficiency_report(crop.farm, window_days=7)
+            
+            assert report['window_days'] == 7
+            assert report['irrigation_events'] == 2
+            assert report['total_water_used_mm'] == 50.5
+            assert report['farm_area_acres'] == 5.0
+            
+            user_report = irrigation_service.calculate_user_water_efficiency_report(crop.farm.owner, window_days=90)
+            assert user_report['overall']['irrigation_events'] == 2
+            assert crop.farm_id in user_report['farms']
+    
+    def test_weather_analysis_shared_per_grid_cell(self, app):
+        """Test nearby farms reuse one weather analysis."""
+        with app.app_context():
+            weather_service = WeatherService()
+            
+            with patch.object(weather_service, '_analyze_irrigation_conditions', return_value={'rain_next_24h': 0}) as mock_analyze:
+                weather_service.analyze_irrigation_conditions(12.3412, 76.6101)
+                weather_service.analyze_irrigation_conditions(12.3455, 76.6149)
+                
+                assert mock_analyze.call_count == 1
+
+class TestWeatherAlertService:
+    """Test weather alert fan-out."""
+    
+    def test_heavy_rain_alert_queued_once_per_farmer(self, app, test_farm):
+        """Test a heavy rain cell alerts its farmers once, however often the run repeats."""
+        with app.app_context():
+            from datetime import timedelta
+            from app.services.weather_alerts import WeatherAlertService
+            from app.models.notification import NotificationOutbox
+            
+            start = datetime.now().replace(minute=0, second=0, microsecond=0)
+            
+            def hourly_forecast(latitude, longitude, hours):
+                rain = 5.0 if (latitude, longitude) == (28.65, 77.25) else 0.0
+                return [
+                    {'datetime': start + timedelta(hours=hour), 'temperature': 30.0, 'humidity': 70.0,
+                     'wind_speed': 3.0, 'rain_mm': rain, 'rain_probability': 90}
+                    for hour in range(hours)
+                ]
+            
+            weather_service = WeatherService()
+            with patch.object(weather_service, 'get_hourly_forecast', side_effect=hourly_forecast):
+                alert_service = WeatherAlertService(weather_service)
+                first = alert_service.run(cells=['28.6500,77.2500', '26.8500,80.9500'])
+                second = alert_service.run(cells=['28.6500,77.2500', '26.8500,80.9500'])
+            
+            assert first['cells_evaluated'] == 2
+            assert first['cells_alerted'] == 1
+            assert first['alerts_queued'] == 1
+            assert second['alerts_queued'] == 0
+            assert second['duplicates_skipped'] == 1
+            
+            entry = NotificationOutbox.query.filter_by(notification_type='weather').one()
+            assert 'Test Farm' in entry.body
+            assert entry.body.startswith('🌧️')
+    
+    def test_farms_in_two_alerted_cells_each_get_an_alert(self, app, test_farm):
+        """Test a farmer with farms in two alerted cells gets one alert per cell."""
+        with app.app_context():
+            from datetime import timedelta
+            from app.services.weather_alerts import WeatherAlertService
+            from app.models.notification import NotificationOutbox
+            
+            farm = db.session.get(Farm, test_farm)
+            db.session.add(Farm(user_id=farm.user_id, farm_name='Lucknow Farm', area_acres=2.0,
+                                latitude=26.86, longitude=80.96))
+            db.session.commit()
+            
+            start = datetime.now().replace(minute=0, second=0, microsecond=0)
+            forecast = [
+                {'datetime': start + timedelta(hours=hour), 'temperature': 30.0, 'humidity': 70.0,
+                 'wind_speed': 3.0, 'rain_mm': 5.0, 'rain_probability': 90}
+                for hour in range(48)
+            ]
+            
+            weather_service = WeatherService()
+            with patch.object(weather_service, 'get_hourly_forecast', return_value=forecast):
+                summary = WeatherAlertService(weather_service).run(cells=['28.6500,77.2500', '26.8500,80.9500'])
+            
+            assert summary['alerts_queued'] == 2
+            bodies = [entry.body for entry in NotificationOutbox.query.filter_by(notification_type='weather')]
+            assert any('Test Farm' in body for body in bodies)
+            assert any('Lucknow Farm' in body for body in bodies)
+
+class TestFarmSpatialService:
+    """Test geohash-indexed farm location queries."""
+    
+    def test_nearest_and_radius_queries(self, app, test_user, test_farm):
+        """Test nearest and radius queries match brute-force distances."""
+        with app.app_context():
+            from app.services.geo import FarmSpatialService, haversine_km, geohash_encode
+            
+            offsets = [(0.01, 0.0), (0.05, 0.05), (0.3, -0.2), (1.5, 1.0), (-0.02, 0.03)]
+            for index, (d_lat, d_lon) in enumerate(offsets):
+                db.session.add(Farm(
+                    user_id=test_user, farm_name=f'Farm {index}', area_acres=2.0,
+                    latitude=28.6139 + d_lat, longitude=77.2090 + d_lon
+                ))
+            db.session.commit()
+            
+            farm = db.session.get(Farm, test_farm)
+            assert farm.geohash == geohash_encode(28.6139, 77.2090)
+            
+            spatial_service = FarmSpatialService()
+            all_farms = Farm.query.all()
+            expected = sorted(all_farms, key=lambda f: haversine_km(28.62, 77.21, f.latitude, f.longitude))
+            
+            nearest = spatial_service.nearest_farms(28.62, 77.21, limit=3)
+            assert [f.id for _, f in nearest] == [f.id for f in expected[:3]]
+            
+            in_radius = spatial_service.farms_in_radius(28.62, 77.21, 10)
+            assert {f.id for _, f in in_radius} == {
+                f.id for f in all_farms if haversine_km(28.62, 77.21, f.latitude, f.longitude) <= 10
+            }
+            
+            assert test_farm in [f.id for f in spatial_service.farms_in_grid_cell(farm.grid_cell)]
+    
+    def test_prefix_upper_bound_stays_in_geohash_alphabet(self, app):
+        """Test cell bounds increment within the alphabet and carry past 'z'."""
+        from app.services.geo import GeoHashIndex, prefix_upper_bound
+        
+        assert prefix_upper_bound('ttn') == 'ttp'
+        assert prefix_upper_bound('tt9') == 'ttb'
+        assert prefix_upper_bound('tuz') == 'tv'
+        assert prefix_upper_bound('zz') is None
+        
+        index = GeoHashIndex([(28.6139, 77.2090, 'delhi'), (89.99, 179.99, 'corner')], precision=5)
+        assert [item for _, _, item in index.in_cell('ttn')] == ['delhi']
+        assert [item for _, _, item in index.in_cell('zz')] == ['corner']
+
+class TestGazetteer:
+    """Test offline place search."""
+    
+    def test_districts_are_found_past_the_village_cap(self, app, tmp_path):
+        """Test a district still ranks first when more villages than the cap share its prefix."""
+        from app.services.gazetteer import Gazetteer, build_gazetteer, MAX_CANDIDATES
+        
+        place = {'name_hi': 'गाँव', 'district': 'Kanpur', 'district_hi': 'कानपुर', 'state': 'Uttar Pradesh',
+                 'state_hi': 'उत्तर प्रदेश', 'latitude': 26.45, 'longitude': 80.33}
+        rows = [dict(place, kind='village', name_en=f'Kaa {index:04d}', population=index)
+                for index in range(MAX_CANDIDATES + 50)]
+        rows.append(dict(place, kind='district', name_en='Kanpur', name_hi='कानपुर', population=100))
+        build_gazetteer(rows, str(tmp_path))
+        
+        results = Gazetteer(str(tmp_path)).search('K', limit=3)
+        assert results[0]['name_en'] == 'Kanpur'
+        assert all(result['kind'] == 'village' for result in results[1:])
+
+class TestIrrigationSlotService:
+    """Test IrrigationSlotService functionality."""
+    
+    def test_best_window_avoids_heat_and_rain(self, app):
+        """Test the optimizer prefers cool hours without rain right after."""
+        with app.app_context():
+            from datetime import timedelta
+            from app.services.irrigation_slots import IrrigationSlotService, CellSlotProfile
+            
+            start = datetime(2030, 1, 1, 0)
+            hourly = []
+            for hour in range(54):
+                moment = start + timedelta(hours=hour)
+                hot = 10 <= moment.hour <= 16
+                hourly.append({
+                    'datetime': moment,
+                    'temperature': 38 if hot else 22,
+                    'humidity': 30 if hot else 70,
+                    'wind_speed': 6 if hot else 1,
+                    # Heavy rain on the first evening
+                    'rain_mm': 10 if 19 <= hour <= 21 else 0,
+                    'rain_probability': 90
+                })
+            
+            profile = CellSlotProfile(hourly)
+            window = IrrigationSlotService().find_best_window(profile, 20)
+            
+            window_start = datetime.fromisoformat(window['window_start'])
+            assert window['duration_hours'] == 2
+            assert not (10 <= window_start.hour <= 16)
+            assert window['rain_after_mm'] == 0
+            assert window['adjusted_amount'] >= 20
+    
+    def test_farm_windows_share_one_cell_profile(self, app, test_farm):
+        """Test irrigate recommendations of a farm get windows from one scored forecast."""
+        with app.app_context():
+            from datetime import timedelta
+            from app.services.irrigation_slots import IrrigationSlotService, CellSlotProfile
+            
+            start = datetime(2030, 1, 1, 0)
+            profile = CellSlotProfile([{
+                'datetime': start + timedelta(hours=hour),
+                'temperature': 25, 'humidity': 60, 'wind_speed': 2,
+                'rain_mm': 0, 'rain_probability': 0
+            } for hour in range(54)])
+            
+            recommendations = [
+                {'crop_id': 1, 'action': 'irrigate', 'water_amount_mm': 20},
+                {'crop_id': 2, 'action': 'irrigate', 'water_amount_mm': 40},
+                {'crop_id': 3, 'action': 'skip', 'water_amount_mm': 0}
+            ]
+            farm = db.session.get(Farm, test_farm)
+            with patch.object(IrrigationSlotService, 'get_cell_profile', return_value=profile) as get_profile:
+                IrrigationService().add_irrigation_windows(farm, recommendations)
+            
+            assert get_profile.call_count == 1
+            assert recommendations[0]['timing']['duration_hours'] == 2
+            assert recommendations[1]['timing']['duration_hours'] == 4
+            assert 'timing' not in recommendations[2]
+
+class TestAdvisoryBatchService:
+    """Test AdvisoryBatchService functionality."""
+    
+    def test_advisory_batch_writes_csv(self, app, test_crop, tmp_path):
+        """Test region advisories are streamed to CSV."""
+        with app.app_context():
+            from app.services.advisory_batch import AdvisoryBatchService, CsvAdvisoryWriter
+            
+            output = tmp_path / 'advisories.csv'
+            writer = CsvAdvisoryWriter(str(output))
+            summary = AdvisoryBatchService(chunk_size=10).run(writer, state='Test State')
+            writer.close()
+            
+            assert summary['crops_processed'] == 1
+            assert summary['rows_written'] == 1
+            
+            lines = output.read_text(encoding='utf-8').splitlines()
+            assert lines[0].startswith('crop_id,farm_id')
+            assert lines[1].startswith(f'{test_crop},')
 
 class TestNotificationService:
     """Test NotificationService functionality."""
@@ -219,6 +467,137 @@ class TestNotificationService:
             
             # Should handle gracefully
             assert result is not None or result is None
+    
+    def test_send_bulk_notifications_concurrent(self, app):
+        """Test concurrent bulk sending keeps input order and streams progress."""
+        with app.app_context():
+            notification_service = NotificationService()
+            notifications = [
+                {'type': 'weather', 'phone': f'+91987654{i:04d}', 'alert_type': 'rain', 'message': 'Heavy rain'}
+                for i in range(20)
+            ] + [{'type': 'unknown', 'phone': '+919876543210'}]
+            
+            progress = []
+            results = notification_service.send_bulk_notifications(
+                notifications,
+                concurrency=4,
+                progress_callback=lambda summary, index, result: progress.append(summary['sent'] + summary['failed'])
+            )
+            
+            assert results['total'] == 21
+            assert results['sent'] == 20
+            assert results['failed'] == 1
+            assert results['details'][-1]['status'] == 'error'
+            assert progress == list(range(1, 22))
+    
+    def test_message_templates_render_and_count_segments(self, app):
+        """Test localized templates render and long alerts are trimmed to the segment limit."""
+        from app.services.message_templates import message_templates, count_sms_segments
+        
+        assert count_sms_segments('a' * 160) == {'encoding': 'GSM-7', 'units': 160, 'segments': 1}
+        assert count_sms_segments('a' * 161)['segments'] == 2
+        assert count_sms_segments('सिंचाई करें')['encoding'] == 'UCS-2'
+        
+        lines = message_templates.render_many('irrigation_digest_line', 'en', [
+            {'crop_name': 'Wheat', 'water_amount_mm': 25, 'priority': 'high'},
+            {'crop_name': 'Rice', 'water_amount_mm': 40, 'priority': 'medium'}
+        ])
+        assert lines == ['Wheat: 25mm (high)', 'Rice: 40mm (medium)']
+        
+        with app.app_context():
+            app.config['SMS_MAX_SEGMENTS'] = 2
+            notification_service = NotificationService()
+            body = notification_service.format_weather_alert('rain', 'भारी बारिश की संभावना। ' * 20, 'hi')
+            
+            assert body.startswith('🌧️ मौसम चेतावनी')
+            assert '...' in body
+            assert count_sms_segments(body)['segments'] <= 2
+
+class TestNotificationQueue:
+    """Test the durable notification outbox."""
+    
+    def test_enqueue_is_idempotent_and_delivered(self, app):
+        """Test queued notifications are delivered once per idempotency key."""
+        with app.app_context():
+            from app.services.notification_queue import notification_queue
+            
+            entry = notification_queue.enqueue('+919876543210', 'Test message', 'weather', idempotency_key='weather:test:1')
+            duplicate = notification_queue.enqueue('+919876543210', 'Test message', 'weather', idempotency_key='weather:test:1')
+            
+            assert entry is not None
+            assert duplicate is None
+            assert notification_queue.get_status('weather:test:1')['status'] == 'sent'
+    
+    def test_enqueue_many_skips_existing_keys_without_failing_the_batch(self, app):
+        """Test a batch containing an already queued key still queues its other entries."""
+        with app.app_context():
+            from app.services.notification_queue import notification_queue
+            
+            notification_queue.enqueue('+919876543210', 'First', 'weather', idempotency_key='weather:test:dup')
+            queued = notification_queue.enqueue_many([
+                {'recipient': '+919876543210', 'body': 'Again', 'notification_type': 'weather',
+                 'idempotency_key': 'weather:test:dup'},
+                {'recipient': '+919876543210', 'body': 'New', 'notification_type': 'weather',
+                 'idempotency_key': 'weather:test:new'}
+            ])
+            
+            assert queued == ['weather:test:new']
+            assert notification_queue.get_status('weather:test:new') is not None
+    
+    def test_failed_delivery_is_retried_with_backoff(self, app):
+        """Test failed deliveries are rescheduled until max attempts."""
+        with app.app_context():
+            from app.services.notification_queue import notification_queue, DeliveryWorkerPool
+            from app.models.notification import NotificationOutbox
+            
+            app.config['NOTIFICATION_QUEUE_SYNC'] = False
+            app.config['NOTIFICATION_INPROCESS_WORKERS'] = 0
+            notification_queue.enqueue('+919876543210', 'Retry me', 'weather', idempotency_key='weather:test:retry')
+            
+            with patch('app.services.notifications.NotificationService.send_sms',
+                       return_value={'status': 'error', 'error': 'timeout'}):
+                DeliveryWorkerPool(app, workers=1).drain()
+            
+            entry = NotificationOutbox.query.filter_by(idempotency_key='weather:test:retry').first()
+            assert entry.status == 'pending'
+            assert entry.attempts == 1
+            assert entry.last_error == 'timeout'
+            assert entry.next_attempt_at > datetime.utcnow()
+
+class TestDigestService:
+    """Test digest buffering and flushing."""
+    
+    def test_notices_merge_into_one_digest_per_user(self, app, test_user):
+        """Test buffered notices flush as one urgency-ordered digest within the segment limit."""
+        with app.app_context():
+            from app.services.digests import DigestService
+            from app.services.message_templates import count_sms_segments
+            from app.models.notification import NotificationOutbox, PendingNotice
+            
+            app.config['SMS_MAX_SEGMENTS'] = 3
+            digest_service = DigestService()
+            
+            notices = [
+                {'user_id': test_user, 'notice_type': 'irrigation',
+                 'params': {'crop_name': f'फसल {i}', 'water_amount_mm': 25}, 'dedupe_key': f'irrigation:{i}'}
+                for i in range(12)
+            ] + [{'user_id': test_user, 'notice_type': 'weather', 'params': {'message': 'कल भारी बारिश'}}]
+            
+            assert digest_service.add_many(notices) == 13
+            assert digest_service.add_many(notices[:1]) == 0  # Same dedupe key
+            
+            # Window still open: nothing is flushed unless forced
+            assert digest_service.flush()['digests_queued'] == 0
+            summary = digest_service.flush(force=True)
+            
+            assert summary['digests_queued'] == 1
+            assert summary['notices'] == 13
+            assert PendingNotice.query.filter(PendingNotice.digest_key.is_(None)).count() == 0
+            
+            body = NotificationOutbox.query.filter_by(notification_type='digest').one().body
+            assert body.index('कल भारी बारिश') < body.index('फसल 0')
+            assert 'और सूचनाएं' in body
+            assert count_sms_segments(body)['segments'] <= 3
 
 class TestActivityTemplateService:
     """Test ActivityTemplateService functionality."""
@@ -278,6 +657,31 @@ class TestActivityTemplateService:
             assert isinstance(activities, list)
             # Should return activities appropriate for flowering stage
     
+    def test_templates_are_indexed_immutable_and_hot_reloaded(self, app, tmp_path):
+        """Test the template store serves read-only templates and picks up file edits."""
+        import os
+        
+        path = tmp_path / 'templates.json'
+        template = {'stage': 'vegetative', 'days_after_planting': 20, 'activity_type': 'irrigation',
+                    'description': 'Irrigate', 'description_hi': 'सिंचाई करें', 'quantity': '30mm'}
+        path.write_text(json.dumps({'maize': [template]}), encoding='utf-8')
+        
+        with app.app_context():
+            app.config['ACTIVITY_TEMPLATES_PATH'] = str(path)
+            app.config['ACTIVITY_TEMPLATES_RELOAD_SECONDS'] = 0
+            template_service = ActivityTemplateService()
+            
+            stage_templates = template_service.get_activity_templates_for_stage('maize', 'vegetative')
+            assert stage_templates[0]['quantity'] == '30mm'
+            with pytest.raises(TypeError):
+                stage_templates[0]['quantity'] = '0mm'
+            
+            path.write_text(json.dumps({'maize': [template], 'millet': [dict(template, days_after_planting=10)]}),
+                            encoding='utf-8')
+            os.utime(path, (1, 1))  # Guarantee a different mtime
+            
+            assert len(ActivityTemplateService().get_crop_templates('millet')) == 1
+    
     def test_create_bulk_activities(self, app, test_crop):
         """Test bulk activity creation."""
         with app.app_context():
@@ -315,6 +719,338 @@ class TestActivityTemplateService:
                 activity_type='irrigation'
             ).first()
             assert irrigation_activity is not None
+    
+    def test_create_activities_from_template_is_idempotent(self, app, test_crop):
+        """Test template activities are created once, per crop and in bulk per crop type."""
+        with app.app_context():
+            from app.models.crop import Activity
+            
+            template_service = ActivityTemplateService()
+            crop = db.session.get(Crop, test_crop)
+            
+            created = template_service.create_activities_from_template(crop)
+            assert created == len(template_service.generate_crop_schedule(crop))
+            assert created > 0
+            assert template_service.create_activities_from_template(crop) == 0
+            
+            second_crop = Crop(
+                farm_id=crop.farm_id, crop_type='wheat', planting_date=date.today(), area_acres=1.0
+            )
+            db.session.add(second_crop)
+            db.session.commit()
+            
+            summary = template_service.regenerate_for_crop_type('wheat', chunk_size=1)
+            assert summary['crops_processed'] == 2
+            assert summary['activities_created'] == len(template_service.generate_crop_schedule(second_crop))
+            assert Activity.query.filter_by(crop_id=test_crop).count() == created
+            assert template_service.regenerate_for_crop_type('wheat')['activities_created'] == 0
+
+class TestSerializers:
+    """Test bulk serialization of farms and crops."""
+    
+    def test_bulk_serialization_matches_to_dict(self, app, test_farm, test_crop):
+        """Test bulk serializers emit the same shapes as the per-object methods."""
+        with app.app_context():
+            from app.services.serializers import serialize_farms, serialize_crops, dumps
+            
+            db.session.add(Crop(farm_id=test_farm, crop_type='mustard', area_acres=1.5,
+                                planting_date=date.today(), status='active'))
+            db.session.add(Farm(user_id=db.session.get(Farm, test_farm).user_id,
+                                farm_name='Empty Farm', area_acres=4.0))
+            db.session.commit()
+            
+            farms = Farm.query.order_by(Farm.id).all()
+            farm_dicts = serialize_farms(farms)
+            assert farm_dicts == [farm.to_dict() for farm in farms]
+            assert farm_dicts[0]['active_crops_count'] == 2
+            assert farm_dicts[0]['total_crops_area'] == 6.5
+            assert farm_dicts[1]['active_crops_count'] == 0
+            
+            crops = Crop.query.order_by(Crop.id).all()
+            crop_dicts = serialize_crops(crops)
+            assert crop_dicts == [crop.to_dict() for crop in crops]
+            assert crop_dicts[0]['growth_stage_info']['stage'] == 'tillering'
+            assert crop_dicts[0]['water_requirement'] == 4.0
+            assert crop_dicts[1]['growth_stage_info']['stage'] == 'unknown'
+            
+            payload = {'day': date(2024, 6, 1), 'label': 'तापमान'}
+            assert json.loads(dumps(payload)) == {'day': '2024-06-01', 'label': 'तापमान'}
+
+class TestKeysetPagination:
+    """Test cursor pagination over time-ordered rows."""
+    
+    def test_pages_cover_rows_in_order_across_ties(self, app, test_crop):
+        """Test walking forward and back visits every row once in (date, id) order."""
+        with app.app_context():
+            from datetime import timedelta
+            from app.models.crop import Activity
+            from app.services.pagination import keyset_paginate
+            
+            # Several activities share each date, so the id tie-breaker matters
+            Activity.bulk_insert([
+                {'crop_id': test_crop, 'activity_type': 'other', 'scheduled_date': date(2024, 1, 1) + timedelta(days=index // 3)}
+                for index in range(25)
+            ])
+            db.session.commit()
+            
+            query = Activity.query.filter(Activity.crop_id == test_crop)
+            columns = [Activity.scheduled_date, Activity.id]
+            expected = [a.id for a in query.order_by(Activity.scheduled_date.desc(), Activity.id.desc())]
+            
+            pages = [keyset_paginate(query, columns, per_page=10)]
+            while pages[-1].has_next:
+                pages.append(keyset_paginate(query, columns, cursor=pages[-1].next_cursor, per_page=10))
+            
+            assert [len(page) for page in pages] == [10, 10, 5]
+            assert [a.id for page in pages for a in page] == expected
+            assert not pages[0].has_prev
+            
+            previous = keyset_paginate(query, columns, before=pages[2].prev_cursor, per_page=10)
+            assert [a.id for a in previous] == [a.id for a in pages[1]]
+            
+            with pytest.raises(ValueError):
+                keyset_paginate(query, columns, cursor='not-a-cursor')
+    
+    def test_well_encoded_cursor_with_wrong_types_is_invalid(self, app):
+        """Test cursor values that do not match the column types raise ValueError."""
+        with app.app_context():
+            from app.models.crop import Activity
+            from app.services.pagination import decode_cursor, encode_cursor
+            
+            columns = [Activity.scheduled_date, Activity.id]
+            assert decode_cursor(encode_cursor([date(2024, 1, 1), 5]), columns) == [date(2024, 1, 1), 5]
+            
+            for values in ([123, 5], ['2024-01-01', {}], ['2024-01-01', '5'], ['2024-01-01', True], ['not-a-date', 5]):
+                with pytest.raises(ValueError):
+                    decode_cursor(encode_cursor(values), columns)
+
+class TestDatabaseEngine:
+    """Test database engine profiles and pool metrics."""
+    
+    def test_engine_profiles_by_backend(self):
+        """Test SQLite and PostgreSQL get their tuned engine options."""
+        from app.services.db_engine import engine_profile, TimedQueuePool
+        
+        assert engine_profile('sqlite://', {}) == {}
+        
+        sqlite_options = engine_profile('sqlite:////tmp/app.db', {'DATABASE_BUSY_TIMEOUT_MS': 8000})
+        assert sqlite_options['poolclass'] is TimedQueuePool
+        assert sqlite_options['connect_args']['timeout'] == 8
+        
+        pg_options = engine_profile('postgresql://user:pass@db/app', {'DATABASE_STATEMENT_TIMEOUT_MS': 5000})
+        assert pg_options['pool_pre_ping'] is True
+        assert pg_options['connect_args']['options'] == '-c statement_timeout=5000'
+    
+    def test_sqlite_connections_use_wal_and_report_pool_waits(self, tmp_path):
+        """Test file SQLite connections switch to WAL and checkouts are timed."""
+        from sqlalchemy import create_engine, event, text
+        from app.services.db_engine import engine_profile, pool_status, _set_sqlite_pragmas
+        
+        url = f"sqlite:///{tmp_path / 'engine.db'}"
+        engine = create_engine(url, **engine_profile(url, {}))
+        event.listen(engine, 'connect', _set_sqlite_pragmas(5000, wal=True))
+        
+        with engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        
+        status = pool_status({None: engine})['primary']
+        assert status['checkouts'] == 1
+        assert status['checked_out'] == 0
+        engine.dispose()
+
+class TestUserContext:
+    """Test the per-request user context."""
+    
+    def test_context_is_loaded_once_per_request_and_dropped_by_crop_changes(self, app, test_crop):
+        """Test a loaded context needs no further queries and drops when a crop is added."""
+        from flask import g
+        from sqlalchemy import event
+        from app.services.user_context import load_user_context
+        
+        with app.app_context():
+            crop = db.session.get(Crop, test_crop)
+            user_id = crop.farm.user_id
+            farm_id = crop.farm_id
+            
+            context = load_user_context(user_id)
+            assert context.farm_ids == [farm_id]
+            assert context.user.get_active_crops_count() == 1
+            
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                assert load_user_context(user_id) is context
+                assert context.user.get_farms_count() == 1
+                assert statements == []
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            
+            db.session.add(Crop(farm_id=farm_id, crop_type='rice', area_acres=1.0, planting_date=date.today()))
+            db.session.commit()
+            
+            assert g.get('user_context') is None
+            assert load_user_context(user_id).active_crops_count == 2
+
+class TestDashboardStats:
+    """Test the incrementally maintained dashboard stats snapshot."""
+    
+    def test_counters_follow_writes_and_match_rebuild(self, app, test_crop):
+        """Test inserts, updates, bulk inserts and deletes keep the counters exact."""
+        from datetime import timedelta
+        from app.models.crop import Activity, DiseaseDetection
+        from app.services.dashboard_stats import get_stats_snapshot, rebuild_user_stats
+        
+        with app.app_context():
+            crop = db.session.get(Crop, test_crop)
+            user_id = crop.farm.user_id
+            today = date.today()
+            
+            overdue = Activity(crop_id=crop.id, activity_type='irrigation', scheduled_date=today - timedelta(days=2))
+            due = Activity(crop_id=crop.id, activity_type='irrigation', scheduled_date=today)
+            weeding = Activity(crop_id=crop.id, activity_type='weeding', scheduled_date=today)
+            db.session.add_all([overdue, due, weeding, DiseaseDetection(crop_id=crop.id, image_path='leaf.jpg', is_healthy=True)])
+            db.session.commit()
+            Activity.bulk_insert([{'crop_id': crop.id, 'activity_type': 'fertilizer', 'scheduled_date': today}])
+            db.session.commit()
+            
+            overdue.mark_completed()
+            db.session.delete(weeding)
+            db.session.commit()
+            
+            snapshot = get_stats_snapshot(user_id)
+            assert snapshot.total_farms == 1
+            assert snapshot.crop_distribution == {'wheat': {'count': 1, 'area': 5.0}}
+            assert snapshot.activity_status == {'pending': 2, 'completed': 1}
+            assert snapshot.pending_today == 2
+            assert snapshot.pending_today_by_type == {'irrigation': 1, 'fertilizer': 1}
+            assert snapshot.overdue == 0
+            assert snapshot.activity_trend()[-1] == {'date': today.isoformat(), 'count': 1}
+            assert (snapshot.detections_total, snapshot.detections_healthy) == (1, 1)
+            
+            crop.status = 'harvested'
+            db.session.commit()
+            assert get_stats_snapshot(user_id).active_crops == 0
+            
+            incremental = vars(get_stats_snapshot(user_id))
+            rebuild_user_stats([user_id])
+            assert vars(get_stats_snapshot(user_id)) == incremental
+
+class TestStageTimeline:
+    """Test the precomputed growth stage tables and crop timelines."""
+    
+    def test_timeline_from_stage_table_and_reload_on_change(self, app, test_crop):
+        """Test stage lookup, timeline progress and invalidation when stages change."""
+        from datetime import timedelta
+        from app.models.crop_data import CropInfo, GrowthStage
+        from app.services.stage_timeline import get_stage_table, crop_timeline
+        
+        with app.app_context():
+            table = get_stage_table('Wheat')
+            assert len(table) == 6
+            assert table.current_stage(0).stage_name == 'germination'
+            assert table.current_stage(40).stage_name == 'tillering'
+            assert table.current_stage(141) is None
+            assert len(get_stage_table('mango')) == 0
+            
+            crop = db.session.get(Crop, test_crop)
+            timeline = crop_timeline(crop, 'hi')
+            assert timeline['days_planted'] == 30
+            stages = timeline['stages']
+            assert [stage['name'] for stage in stages][:2] == ['अंकुरण', 'कल्ले निकलना']
+            assert stages[0]['completed'] and stages[0]['progress'] == 100
+            assert stages[1]['current'] and stages[1]['progress'] == round(23 / 33 * 100, 1)
+            assert not any(stage['current'] or stage['completed'] for stage in stages[2:])
+            assert crop_timeline(crop, 'en')['stages'][1]['name'] != 'कल्ले निकलना'
+            assert crop.get_growth_stage_info()['stage'] == 'tillering'
+            
+            later = crop_timeline(crop, 'hi', today=crop.planting_date + timedelta(days=200))
+            assert all(stage['completed'] for stage in later['stages'])
+            
+            rice = CropInfo(name='rice', avg_harvest_days=150)
+            db.session.add(rice)
+            db.session.flush()
+            db.session.add(GrowthStage(crop_info_id=rice.id, stage_name='germination',
+                                       stage_description_hi='अंकुरण', start_day=0, end_day=10,
+                                       water_requirement_mm_day=5))
+            db.session.commit()
+            assert get_stage_table('rice').current_stage(5).water_requirement_mm_day == 5.0
+
+class TestYieldEstimation:
+    """Test yield estimates from the serialized model and the baseline fallback."""
+    
+    def test_model_scores_covered_crops_and_falls_back_to_baseline(self, app, test_farm, test_crop, tmp_path):
+        """Test one call scores model-covered crops and gives others the baseline."""
+        import math
+        from datetime import timedelta
+        from app.models.crop import Activity
+        from app.services.yield_estimation import YieldModel, BASE_FEATURES, estimate_yields, monthly_projection
+        
+        with app.app_context():
+            today = date.today()
+            app.config['YIELD_MODEL_PATH'] = str(tmp_path / 'missing.json')
+            crop = db.session.get(Crop, test_crop)
+            
+            baseline = estimate_yields([crop], today=today)[crop.id]
+            assert baseline['source'] == 'baseline'
+            assert baseline['unit'] == 'क्विंटल'
+            assert baseline['predictions'] == {'pessimistic': 100.0, 'realistic': 125.0, 'optimistic': 150.0}
+            assert baseline['factors']['water_stress_days'] == 20
+            assert baseline['progress'] == round(30 / 140 * 100, 1)
+            assert monthly_projection(baseline)[0] == round(125.0 * baseline['progress'] / 100, 1)
+            
+            db.session.add(Activity(crop_id=crop.id, activity_type='irrigation', scheduled_date=today - timedelta(days=20),
+                                    status='completed', completed_date=today - timedelta(days=20)))
+            mustard = Crop(farm_id=test_farm, crop_type='mustard', area_acres=1.5, planting_date=today)
+            db.session.add(mustard)
+            db.session.commit()
+            
+            # log(kg/acre) = log(2500) - water stress share
+            coefficients = [0.0] * len(BASE_FEATURES) + [0.0]
+            coefficients[BASE_FEATURES.index('water_stress_share')] = -1.0
+            model = YieldModel(['wheat'], coefficients, math.log(2500), 0.1)
+            app.config['YIELD_MODEL_PATH'] = str(tmp_path / 'yield_model.json')
+            with open(app.config['YIELD_MODEL_PATH'], 'w') as f:
+                json.dump(model.to_dict(), f)
+            
+            estimates = estimate_yields([crop, mustard], today=today)
+            assert estimates[crop.id]['source'] == 'model'
+            assert estimates[crop.id]['factors']['water_stress_days'] == 10
+            assert estimates[crop.id]['predictions']['realistic'] == round(25 * math.exp(-10 / 30) * 5, 1)
+            assert estimates[crop.id]['predictions']['pessimistic'] < estimates[crop.id]['predictions']['realistic']
+            assert estimates[mustard.id]['source'] == 'baseline'
+            assert estimates[mustard.id]['predictions']['realistic'] == 37.5
+    
+    def test_training_writes_a_servable_model(self, app, test_farm, tmp_path):
+        """Test the offline trainer fits harvested crops and the result loads for serving."""
+        pytest.importorskip('sklearn')
+        from datetime import timedelta
+        from app.models.crop import Activity
+        from app.services.yield_estimation import load_yield_model
+        from app.services.yield_training import train_yield_model
+        
+        with app.app_context():
+            today = date.today()
+            for index in range(4):
+                crop = Crop(farm_id=test_farm, crop_type='wheat', area_acres=2.0,
+                            planting_date=today - timedelta(days=130 + index), status='harvested')
+                db.session.add(crop)
+                db.session.flush()
+                harvest = Activity(crop_id=crop.id, activity_type='harvesting', quantity=f'{40 + index} quintal',
+                                   scheduled_date=today, status='completed', completed_date=today)
+                db.session.add(harvest)
+            db.session.commit()
+            assert harvest.quantity_value == 4300.0
+            
+            output = str(tmp_path / 'yield_model.json')
+            summary = train_yield_model(output, min_crops=4)
+            assert summary['crops'] == 4
+            assert summary['samples'] == 16
+            assert load_yield_model(output).covers('wheat')
+            
+            with pytest.raises(ValueError):
+                train_yield_model(output, min_crops=5)
 
 class TestServiceIntegration:
     """Test integration between services."""